@@ -0,0 +1,285 @@
+"""
+End-to-end API load benchmark against a mock OpenAI server.
+
+Starts the mock OpenAI server in-process and the API under uvicorn in a
+subprocess pointed at it, then runs the load scenarios:
+
+- single: sequential /analyze/complete requests
+- batch: sequential /analyze/batch requests of several images
+- concurrent: /analyze/complete requests from parallel clients
+
+Each scenario reports p50/p95/p99 latency, requests per second, errors and
+the peak RSS of the API process tree as JSON.
+
+With ``--api-workers N`` the API runs under the multi-worker launcher
+(``src.api.serve``) instead, to compare throughput across worker counts.
+
+Usage:
+    python benchmarks/bench_e2e.py --requests 50 --concurrency 8 --resolution 12 --latency 0.8
+    python benchmarks/bench_e2e.py --scenarios concurrent --concurrency 32 --api-workers 4
+"""
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.mock_openai_server import MockOpenAIServer, MockSettings
+from benchmarks.synthetic_images import encode_image, generate_plant_image, resolution_for
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _process_tree_rss(pid: int) -> int:
+    """Resident memory in bytes of a process and its descendants (Linux /proc)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+class RssMonitor:
+    """Sample the API process tree's RSS in the background and keep the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.supported = os.path.exists(f"/proc/{pid}/status")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _process_tree_rss(self.pid))
+            self._stop.wait(self.interval)
+
+    def reset(self):
+        self.peak = _process_tree_rss(self.pid) if self.supported else 0
+
+    def start(self):
+        if self.supported:
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+class ApiServer:
+    """The API under uvicorn (or the multi-worker launcher) in a subprocess."""
+
+    def __init__(self, openai_base_url: str, data_dir: str, workers: Optional[int] = None,
+                 api_workers: Optional[int] = None):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ)
+        env.update({
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_BASE_URL": openai_base_url,
+            "RESULT_STORE_PATH": os.path.join(data_dir, "results.db"),
+            "TRACING_EXPORTER": "none",
+        })
+        if workers:
+            env["PIPELINE_PREPROCESS_WORKERS"] = str(workers)
+        if api_workers:
+            env["SHARED_STATE_PATH"] = os.path.join(data_dir, "shared.db")
+            command = [sys.executable, "-m", "src.api.serve", "--workers", str(api_workers)]
+        else:
+            command = [sys.executable, "-m", "uvicorn", "src.api.main:app"]
+        self.process = subprocess.Popen(
+            command + ["--host", "127.0.0.1", "--port", str(self.port), "--log-level", "warning"],
+            cwd=str(ROOT), env=env
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"API server exited with code {self.process.returncode}")
+            try:
+                if httpx.get(f"{self.url}/health/live", timeout=1.0).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.2)
+        raise TimeoutError("API server did not start")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, requests: int) -> Dict[str, float]:
+    """Latency percentiles (ms), throughput and error count of a scenario."""
+    values = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "mean_ms": round(float(values.mean()), 1),
+        "rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "elapsed_seconds": round(elapsed, 3),
+    }
+
+
+def run_scenario(send: Callable[[httpx.Client], bool], requests: int, concurrency: int) -> Dict[str, float]:
+    """Run ``send`` ``requests`` times from ``concurrency`` clients."""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(client: httpx.Client):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            ok = send(client)
+        except httpx.HTTPError:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    with httpx.Client(timeout=300.0, limits=limits) as client:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: one(client), range(requests)))
+        elapsed = time.perf_counter() - start
+    return summarize(latencies, errors, elapsed, requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end API load benchmark")
+    parser.add_argument("--requests", type=int, default=30, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Clients in the concurrent scenario")
+    parser.add_argument("--batch-size", type=int, default=5, help="Images per /analyze/batch request")
+    parser.add_argument("--resolution", default="2", help="Image megapixels (0.3, 2, 12, 48) or WxH")
+    parser.add_argument("--format", default="jpg", help="Upload format (jpg, png, webp)")
+    parser.add_argument("--scenarios", default="single,batch,concurrent", help="Scenarios to run")
+    parser.add_argument("--latency", type=float, default=0.5, help="Mock model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Mock latency standard deviation")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Mock upstream error rate")
+    parser.add_argument("--error-status", type=int, default=500, help="Mock error status (429 for rate limits)")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with mock errors")
+    parser.add_argument("--healthy-rate", type=float, default=0.0, help="Fraction of healthy-plant mock completions")
+    parser.add_argument("--prompt-tokens", type=int, default=1100)
+    parser.add_argument("--completion-tokens", type=int, default=350)
+    parser.add_argument("--workers", type=int, default=None, help="Preprocessing processes in the API")
+    parser.add_argument("--api-workers", type=int, default=None,
+                        help="API worker processes (runs the API with src.api.serve)")
+    parser.add_argument("--output", default=None, help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    width, height = resolution_for(args.resolution)
+    image_bytes = encode_image(generate_plant_image(width, height, seed=1), args.format)
+    filename = f"plant.{args.format}"
+    content_type = "image/jpeg" if args.format == "jpg" else f"image/{args.format}"
+
+    def send_single(client: httpx.Client) -> bool:
+        response = client.post(f"{api.url}/analyze/complete",
+                               files={"file": (filename, image_bytes, content_type)})
+        return response.status_code == 200 and response.json().get("success", False)
+
+    def send_batch(client: httpx.Client) -> bool:
+        files = [("files", (f"plant_{i}.{args.format}", image_bytes, content_type))
+                 for i in range(args.batch_size)]
+        response = client.post(f"{api.url}/analyze/batch", files=files)
+        return response.status_code == 200 and response.json().get("failed_analyses", 1) == 0
+
+    scenarios = {
+        "single": (send_single, 1),
+        "batch": (send_batch, 1),
+        "concurrent": (send_single, args.concurrency),
+    }
+
+    settings = MockSettings(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        error_status=args.error_status, retry_after=args.retry_after,
+        healthy_rate=args.healthy_rate, prompt_tokens=args.prompt_tokens, completion_tokens=args.completion_tokens, seed=42
+    )
+    report = {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "batch_size": args.batch_size,
+            "api_workers": args.api_workers or 1,
+            "image": {"width": width, "height": height, "format": args.format, "bytes": len(image_bytes)},
+            "mock": {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate,
+                     "error_status": args.error_status, "retry_after": args.retry_after,
+                     "healthy_rate": args.healthy_rate},
+        },
+        "scenarios": {},
+    }
+
+    with MockOpenAIServer(settings=settings) as mock, tempfile.TemporaryDirectory() as data_dir:
+        api = ApiServer(mock.base_url, data_dir, args.workers, args.api_workers)
+        monitor = RssMonitor(api.process.pid)
+        try:
+            api.wait_ready()
+            monitor.start()
+            # Warm-up: spawns the preprocessing pool and opens upstream connections
+            run_scenario(send_single, 2, 1)
+
+            for name in args.scenarios.split(","):
+                send, concurrency = scenarios[name]
+                monitor.reset()
+                upstream_before = mock.request_count
+                result = run_scenario(send, args.requests, concurrency)
+                result["upstream_requests"] = mock.request_count - upstream_before
+                result["peak_rss_mb"] = round(monitor.peak / 1024 / 1024, 1) if monitor.supported else None
+                report["scenarios"][name] = result
+        finally:
+            monitor.stop()
+            api.stop()
+
+    if not monitor.supported:
+        # Without /proc, fall back to the largest terminated child's peak RSS (KB on Linux, bytes on macOS)
+        maxrss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        report["peak_rss_mb"] = round(maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(output, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Micro-benchmarks and regression gate for ImageProcessor stages.
+
+Decoding (``load_image``) runs over a matrix of input sizes and formats and
+``resize_image`` over the input sizes. The later stages (``enhance_image``,
+``_grabcut_background_removal``, ``_threshold_background_removal``,
+``get_image_info``) run on what they receive in the pipeline: the resized
+image. Each case records wall time (median and min over the repeats) and
+the peak traced allocation; the regression gate compares the fastest run
+of each case. tracemalloc sees Python and NumPy buffers, not
+Pillow's internal image memory.
+
+Usage:
+    python benchmarks/bench_image_processor.py                    # print results
+    python benchmarks/bench_image_processor.py --save-baseline    # record the baseline
+    python benchmarks/bench_image_processor.py --check            # fail on regressions
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_images import encode_image, generate_plant_image, resolution_for
+from src.core.image_processor import ImageProcessor
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "image_processor.json"
+
+# Cases faster than this are too noisy to gate on
+MIN_GATED_SECONDS = 0.002
+MIN_GATED_ALLOC_MB = 1.0
+
+
+def measure(func: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    """Time ``func`` over the repeats, then trace its allocations in one extra run."""
+    func()  # warm-up (lazy imports, caches)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_seconds": round(statistics.median(times), 6),
+        "min_seconds": round(min(times), 6),
+        "traced_peak_mb": round(peak / 1024 / 1024, 3),
+        "repeats": repeats,
+    }
+
+
+def run_matrix(resolutions: List[str], formats: List[str], repeats: int,
+               max_size: Optional[int] = None, skip_grabcut: bool = False) -> Dict[str, Dict[str, float]]:
+    """Benchmark every stage over the size/format matrix."""
+    processor = ImageProcessor(max_size=max_size)
+    cases: Dict[str, Dict[str, float]] = {}
+    resized_inputs = {}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for megapixels in resolutions:
+            width, height = resolution_for(megapixels)
+            source = generate_plant_image(width, height, seed=7)
+            # Fewer repeats for the largest inputs keeps a full run in minutes
+            size_repeats = max(1, repeats // 2) if width * height > 20_000_000 else repeats
+
+            for fmt in formats:
+                path = Path(temp_dir) / f"plant_{megapixels}mp.{fmt}"
+                path.write_bytes(encode_image(source, fmt))
+
+                def decode(path=str(path)):
+                    image = processor.load_image(path)
+                    image.load()
+                    return image
+
+                cases[f"load_image/{fmt}/{megapixels}mp"] = measure(decode, size_repeats)
+
+            cases[f"resize_image/{megapixels}mp"] = measure(lambda: processor.resize_image(source), size_repeats)
+            resized = processor.resize_image(source)
+            resized_inputs[f"{resized.width}x{resized.height}"] = resized
+
+        # Later stages see the resized image; inputs of the same size are benchmarked once
+        for size, image in resized_inputs.items():
+            opencv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            cases[f"enhance_image/{size}"] = measure(lambda: processor.enhance_image(image), repeats)
+            cases[f"threshold_background_removal/{size}"] = measure(
+                lambda: processor._threshold_background_removal(opencv_image), repeats
+            )
+            if not skip_grabcut:
+                cases[f"grabcut_background_removal/{size}"] = measure(
+                    lambda: processor._grabcut_background_removal(opencv_image), max(1, repeats // 2)
+                )
+            cases[f"get_image_info/{size}"] = measure(lambda: processor.get_image_info(image), repeats)
+
+    return cases
+
+
+def compare(cases: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """List cases slower or allocating more than the baseline by more than ``threshold``."""
+    regressions = []
+    for name, current in cases.items():
+        reference = baseline.get("cases", {}).get(name)
+        if not reference:
+            continue
+
+        # The fastest run is the least affected by other load on the machine
+        base_time = reference["min_seconds"]
+        if current["min_seconds"] > base_time * (1 + threshold) and \
+                current["min_seconds"] - base_time > MIN_GATED_SECONDS:
+            regressions.append(
+                f"{name}: {current['min_seconds'] * 1000:.1f} ms vs baseline {base_time * 1000:.1f} ms "
+                f"(+{(current['min_seconds'] / base_time - 1) * 100:.0f}%)"
+            )
+
+        base_alloc = reference["traced_peak_mb"]
+        if current["traced_peak_mb"] > base_alloc * (1 + threshold) and \
+                current["traced_peak_mb"] - base_alloc > MIN_GATED_ALLOC_MB:
+            regressions.append(
+                f"{name}: {current['traced_peak_mb']:.1f} MB traced vs baseline {base_alloc:.1f} MB"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ImageProcessor stages")
+    parser.add_argument("--resolutions", default="0.3,2,12,48", help="Megapixel labels or WxH sizes")
+    parser.add_argument("--formats", default="jpg,png,webp", help="Input formats for decoding")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--max-size", type=int, default=None, help="Resize target (defaults to MAX_IMAGE_SIZE)")
+    parser.add_argument("--skip-grabcut", action="store_true", help="Skip the slow GrabCut case")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown/allocation growth (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    cases = run_matrix(
+        args.resolutions.split(","), args.formats.split(","), args.repeats,
+        args.max_size, args.skip_grabcut
+    )
+    report = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor() or platform.machine()},
+        "cases": cases,
+    }
+    print(json.dumps(report, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {baseline_path}", file=sys.stderr)
+
+    if args.check:
+        if not baseline_path.exists():
+            print(f"No baseline at {baseline_path}; run with --save-baseline first", file=sys.stderr)
+            sys.exit(2)
+        regressions = compare(cases, json.loads(baseline_path.read_text(encoding="utf-8")), args.threshold)
+        if regressions:
+            print("Performance regressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
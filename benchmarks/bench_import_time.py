@@ -0,0 +1,184 @@
+"""
+Import-time benchmark and regression gate for CLI and API startup.
+
+Each case runs in a fresh interpreter with ``-X importtime`` and records the
+cumulative import time of the entry module (min and median over the
+repeats), its slowest direct imports, and which of the deferred heavy
+dependencies (OpenCV, NumPy, pandas, scikit-learn, the OpenAI SDK, pyarrow)
+were imported anyway. The ``cli_info`` case times ``python src/main.py --info``
+end to end, interpreter startup included.
+
+The gate fails when a deferred dependency is imported eagerly again, which
+doesn't depend on the machine, or when a case is slower than the baseline by
+more than the threshold.
+
+Usage:
+    python benchmarks/bench_import_time.py                    # print results
+    python benchmarks/bench_import_time.py --save-baseline    # record the baseline
+    python benchmarks/bench_import_time.py --check            # fail on regressions
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "import_time.json"
+
+# Imported on first use, never by importing the entry modules
+DEFERRED_MODULES = ("cv2", "numpy", "pandas", "sklearn", "joblib", "openai", "pyarrow")
+
+# Entry modules of the CLI, API and their shared core
+MODULE_CASES = {
+    "config": "src.utils.config",
+    "plant_analyzer": "src.core.plant_analyzer",
+    "api": "src.api.main",
+}
+
+# Differences below this are interpreter noise
+MIN_GATED_MS = 20.0
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Rows of ``-X importtime`` output: module, nesting depth and self/cumulative microseconds."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+        })
+    return rows
+
+
+def import_once(module: str) -> Dict[str, Any]:
+    """Import ``module`` in a fresh interpreter; time it and note its slowest imports and deferred modules loaded."""
+    code = (
+        f"import sys, json; import {module}; "
+        f"print(json.dumps([m for m in {DEFERRED_MODULES!r} if m in sys.modules]))"
+    )
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    rows = parse_importtime(completed.stderr)
+    index = max(i for i, row in enumerate(rows) if row["module"] == module and row["depth"] == 0)
+    # Nested imports are listed before the module that imported them
+    children = []
+    for row in reversed(rows[:index]):
+        if row["depth"] == 0:
+            break
+        if row["depth"] == 1:
+            children.append(row)
+    slowest = sorted(children, key=lambda row: row["cumulative_us"], reverse=True)[:5]
+    entry = rows[index]
+    return {
+        "ms": entry["cumulative_us"] / 1000,
+        "slowest": {row["module"]: round(row["cumulative_us"] / 1000, 1) for row in slowest},
+        "deferred_imported": json.loads(completed.stdout.strip().splitlines()[-1]),
+    }
+
+
+def cli_info_once() -> Dict[str, Any]:
+    """Wall time of ``python src/main.py --info``."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "src/main.py", "--info"],
+        cwd=ROOT, capture_output=True, check=True,
+        env={**os.environ, "PYTHONIOENCODING": "utf-8"}
+    )
+    return {"ms": (time.perf_counter() - start) * 1000}
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    times = [run["ms"] for run in runs]
+    case = {
+        "median_ms": round(statistics.median(times), 1),
+        "min_ms": round(min(times), 1),
+        "repeats": len(runs),
+    }
+    if "slowest" in runs[0]:
+        case["slowest"] = runs[0]["slowest"]
+        case["deferred_imported"] = sorted({m for run in runs for m in run["deferred_imported"]})
+    return case
+
+
+def run_cases(repeats: int) -> Dict[str, Dict[str, Any]]:
+    # One untimed run per case so bytecode caches are written before timing
+    cases = {}
+    for name, module in MODULE_CASES.items():
+        import_once(module)
+        cases[name] = summarize([import_once(module) for _ in range(repeats)])
+    cli_info_once()
+    cases["cli_info"] = summarize([cli_info_once() for _ in range(repeats)])
+    return cases
+
+
+def compare(cases: Dict[str, Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """List cases importing deferred modules, or slower than the baseline by more than ``threshold``."""
+    regressions = []
+    for name, current in cases.items():
+        if current.get("deferred_imported"):
+            regressions.append(f"{name}: imports {', '.join(current['deferred_imported'])} eagerly")
+
+        reference = baseline.get("cases", {}).get(name)
+        if not reference:
+            continue
+        # The fastest run is the least affected by other load on the machine
+        base_ms = reference["min_ms"]
+        if current["min_ms"] > base_ms * (1 + threshold) and current["min_ms"] - base_ms > MIN_GATED_MS:
+            regressions.append(
+                f"{name}: {current['min_ms']:.1f} ms vs baseline {base_ms:.1f} ms "
+                f"(+{(current['min_ms'] / base_ms - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLI and API import time")
+    parser.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per case")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on regressions against the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    report = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "processor": platform.processor() or platform.machine()},
+        "cases": run_cases(args.repeats),
+    }
+    print(json.dumps(report, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline saved to {baseline_path}", file=sys.stderr)
+
+    if args.check:
+        if not baseline_path.exists():
+            print(f"No baseline at {baseline_path}; run with --save-baseline first", file=sys.stderr)
+            sys.exit(2)
+        regressions = compare(report["cases"], json.loads(baseline_path.read_text(encoding="utf-8")),
+                              args.threshold)
+        if regressions:
+            print("Import time regressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
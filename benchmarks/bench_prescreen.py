@@ -0,0 +1,113 @@
+"""
+Inference latency of the local health pre-screen.
+
+Trains a pre-screen model on synthetic plant images (healthy leaves, and
+leaves with lesion spots), then times each step of a verdict on images as
+analysis sees them (decoded and resized): feature extraction, the
+classifier alone, and both together. Held-out accuracy on the synthetic
+set is reported as a sanity check, not as a measure of real-world quality.
+
+Usage:
+    python benchmarks/bench_prescreen.py
+    python benchmarks/bench_prescreen.py --images 100 --repeats 200 --output prescreen.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_images import generate_plant_image, resolution_for
+from src.core.image_processor import ImageProcessor
+from src.core.prescreen import PreScreenModel, extract_features
+
+
+def timings(func: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    """Median, p95 and min milliseconds of ``func`` over the repeats (after a warm-up)."""
+    func()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        "min_ms": round(times[0], 3),
+        "repeats": repeats,
+    }
+
+
+def labelled_images(count: int, resolution: str) -> List[tuple]:
+    """``count`` healthy and ``count`` diseased images, prepared as for analysis."""
+    processor = ImageProcessor()
+    width, height = resolution_for(resolution)
+    images = []
+    for seed in range(count):
+        for label, lesions in (("healthy", False), ("diseased", True)):
+            image = generate_plant_image(width, height, seed=seed, lesions=lesions)
+            images.append((processor.resize_image(image), label))
+    return images
+
+
+def run(count: int, resolution: str, repeats: int) -> Dict[str, Any]:
+    images = labelled_images(count, resolution)
+    features = [extract_features(image) for image, _ in images]
+    labels = [label for _, label in images]
+
+    # Train on every other pair, evaluate on the rest
+    train_idx = [i for i in range(len(images)) if (i // 2) % 2 == 0]
+    test_idx = [i for i in range(len(images)) if (i // 2) % 2 == 1]
+    start = time.perf_counter()
+    model = PreScreenModel.train([features[i] for i in train_idx], [labels[i] for i in train_idx])
+    train_seconds = time.perf_counter() - start
+    correct = sum(model.predict_features(features[i])["health_class"] == labels[i] for i in test_idx)
+
+    image = images[0][0]
+    vector = features[0]
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "input_size": f"{image.width}x{image.height}",
+        "training": {
+            "samples": len(train_idx),
+            "seconds": round(train_seconds, 3),
+            "holdout_accuracy": round(correct / len(test_idx), 4),
+        },
+        "cases": {
+            "extract_features": timings(lambda: extract_features(image), repeats),
+            "predict_features": timings(lambda: model.predict_features(vector), repeats),
+            "predict": timings(lambda: model.predict(image), repeats),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local health pre-screen")
+    parser.add_argument("--images", type=int, default=40, help="Synthetic images per class")
+    parser.add_argument("--resolution", default="12", help="Source megapixels before resizing (or WxH)")
+    parser.add_argument("--repeats", type=int, default=100, help="Timed runs per case")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.images, args.resolution, args.repeats)
+
+    training = results["training"]
+    print(f"Input {results['input_size']}; trained on {training['samples']} images in "
+          f"{training['seconds']:.2f}s, held-out accuracy {training['holdout_accuracy']:.1%}")
+    print(f"{'case':<20} {'median ms':>10} {'p95 ms':>10} {'min ms':>10}")
+    for name, case in results["cases"].items():
+        print(f"{name:<20} {case['median_ms']:>10.3f} {case['p95_ms']:>10.3f} {case['min_ms']:>10.3f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
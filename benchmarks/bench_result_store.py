@@ -0,0 +1,84 @@
+"""
+Benchmark result write throughput: legacy JSON files vs the SQLite result store.
+
+Usage:
+    python benchmarks/bench_result_store.py --results 5000 --writers 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.bench_serialization import build_result
+from src.core.result_store import ResultStore
+
+
+def legacy_save(result: dict, output_dir: str, index: int) -> str:
+    """Write one result the way the old save_analysis_result did."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Index suffix avoids the same-second overwrite so file counts stay comparable
+    filepath = os.path.join(output_dir, f"plant_analysis_{timestamp}_{index}.json")
+    result["saved_at"] = datetime.now().isoformat()
+    with open(filepath, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return filepath
+
+
+def run_writers(write, total: int, writers: int) -> float:
+    """Run ``write(index)`` for every index across a thread pool; return elapsed seconds."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers) as pool:
+        list(pool.map(write, range(total)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark result store write throughput")
+    parser.add_argument("--results", type=int, default=5000, help="Results to write per scenario")
+    parser.add_argument("--writers", type=int, default=4, help="Concurrent writer threads")
+    parser.add_argument("--batch-sizes", type=str, default="1,16,64,256", help="Store batch sizes to test")
+    args = parser.parse_args()
+
+    results = [build_result(i) for i in range(args.results)]
+    report = {"results": args.results, "writers": args.writers, "scenarios": {}}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        legacy_dir = os.path.join(temp_dir, "legacy")
+        os.makedirs(legacy_dir)
+        elapsed = run_writers(lambda i: legacy_save(dict(results[i]), legacy_dir, i), args.results, args.writers)
+        report["scenarios"]["legacy_json_files"] = {
+            "seconds": round(elapsed, 3),
+            "writes_per_second": round(args.results / elapsed, 1),
+        }
+
+        for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+            store = ResultStore(
+                os.path.join(temp_dir, f"results_{batch_size}.db"),
+                batch_size=batch_size,
+                flush_interval=0,
+            )
+
+            def write(i, store=store):
+                store.save(results[i])
+
+            elapsed = run_writers(write, args.results, args.writers)
+            close_start = time.perf_counter()
+            store.close()  # commits the final partial batch
+            elapsed += time.perf_counter() - close_start
+            report["scenarios"][f"sqlite_batch_{batch_size}"] = {
+                "seconds": round(elapsed, 3),
+                "writes_per_second": round(args.results / elapsed, 1),
+            }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
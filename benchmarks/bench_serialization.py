@@ -0,0 +1,154 @@
+"""
+Benchmark JSON serialization latency for realistic batch analysis payloads.
+
+Compares FastAPI's default path (jsonable_encoder + stdlib json) with
+FastJSONResponse, and reports gzip/brotli compression cost and ratio.
+
+Usage:
+    python benchmarks/bench_serialization.py --files 10 --repeat 200
+"""
+import argparse
+import gzip
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from src.api.responses import dumps, brotli, orjson
+
+ANALYSIS_TEXT = """```json
+{
+  "1. NHẬN DẠNG CÂY": {
+    "Tên khoa học và tên thông thường": {"Tên khoa học": "Solanum lycopersicum", "Tên thông thường": "Cà chua"},
+    "Họ thực vật": "Solanaceae",
+    "Đặc điểm nhận dạng chính": "Lá kép lông chim, mép lá có răng cưa, thân có lông tơ",
+    "Độ tin cậy nhận dạng (%)": 92
+  },
+  "2. TÌNH TRẠNG SỨC KHỎE": {
+    "Tình trạng tổng thể": "Bệnh",
+    "Các dấu hiệu bệnh": "Đốm nâu có vòng đồng tâm trên lá già, lá vàng từ mép vào",
+    "Tên bệnh có thể": "Bệnh đốm vòng (Alternaria solani)",
+    "Mức độ nghiêm trọng": "Trung bình"
+  },
+  "4. KHUYẾN NGHỊ": {
+    "Biện pháp điều trị": "Cắt bỏ lá bệnh, phun thuốc gốc đồng hoặc Mancozeb 7-10 ngày/lần",
+    "Cách chăm sóc tối ưu": "Tưới gốc vào buổi sáng, tránh làm ướt lá, tỉa cành tạo độ thông thoáng"
+  }
+}
+```"""
+
+
+def build_result(index: int) -> dict:
+    """Build one analysis result shaped like PlantAnalysisResult.to_dict()."""
+    return {
+        "success": True,
+        "analysis_type": "complete",
+        "model_used": "GPT-4o",
+        "analysis_text": ANALYSIS_TEXT * 3,
+        "structured_data": {
+            "raw_analysis": ANALYSIS_TEXT * 3,
+            "summary": ANALYSIS_TEXT[:200] + "...",
+        },
+        "plant_type": "Solanum lycopersicum",
+        "health_status": "Bệnh đốm vòng",
+        "recommendations": [
+            "Cắt bỏ lá bệnh và tiêu hủy",
+            "Phun thuốc gốc đồng 7-10 ngày/lần",
+            "Tưới gốc vào buổi sáng",
+        ],
+        "image_info": {
+            "size": (1024, 768),
+            "mode": "RGB",
+            "format": None,
+            "has_transparency": False,
+            "estimated_file_size_kb": 2304,
+        },
+        "request_metadata": {
+            "filename": f"field_{index:04d}.jpg",
+            "file_size": 2_400_000,
+            "analysis_type": "complete",
+            "enhance_image": True,
+            "remove_background": False,
+        },
+    }
+
+
+def build_batch_payload(files: int) -> dict:
+    """Build a /analyze/batch response body."""
+    results = {f"field_{i:04d}.jpg": build_result(i) for i in range(files)}
+    return {
+        "batch_results": results,
+        "total_files": files,
+        "successful_analyses": files,
+        "failed_analyses": 0,
+    }
+
+
+def measure(func, repeat: int) -> dict:
+    """Time a callable and return latency statistics in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(samples[len(samples) // 2], 4),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark API response serialization")
+    parser.add_argument("--files", type=int, default=10, help="Results per batch payload")
+    parser.add_argument("--repeat", type=int, default=200, help="Iterations per measurement")
+    args = parser.parse_args()
+
+    payload = build_batch_payload(args.files)
+    body = dumps(payload)
+
+    report = {
+        "payload_files": args.files,
+        "payload_bytes": len(body),
+        "orjson_available": orjson is not None,
+        "brotli_available": brotli is not None,
+        "serialization": {
+            "fastapi_default": measure(
+                lambda: json.dumps(
+                    jsonable_encoder(payload), ensure_ascii=False, allow_nan=False,
+                    indent=None, separators=(",", ":")
+                ).encode("utf-8"),
+                args.repeat,
+            ),
+            "fast_json_stdlib": measure(lambda: dumps(payload, backend="json"), args.repeat),
+        },
+        "compression": {
+            "gzip": {
+                **measure(lambda: gzip.compress(body, compresslevel=6), args.repeat),
+                "compressed_bytes": len(gzip.compress(body, compresslevel=6)),
+            }
+        },
+    }
+
+    if orjson is not None:
+        report["serialization"]["fast_json_orjson"] = measure(
+            lambda: dumps(payload, backend="orjson"), args.repeat
+        )
+
+    if brotli is not None:
+        report["compression"]["brotli"] = {
+            **measure(lambda: brotli.compress(body, quality=4), args.repeat),
+            "compressed_bytes": len(brotli.compress(body, quality=4)),
+        }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Local stand-in for the OpenAI API, for benchmarks.
+
+Implements ``GET /v1/models`` and ``POST /v1/chat/completions`` (plain and
+streaming) with configurable latency, error rate and token counts. Point
+the application at it with ``OPENAI_BASE_URL=http://127.0.0.1:<port>/v1``.
+
+Usage:
+    python benchmarks/mock_openai_server.py --port 8999 --latency 0.8 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+MOCK_ANALYSIS = {
+    "plant_type": "Cà chua (Solanum lycopersicum)",
+    "health_status": "Bệnh đốm lá mức độ nhẹ",
+    "tên bệnh": "Đốm lá Septoria",
+    "recommendations": [
+        "Cắt bỏ lá bị bệnh",
+        "Tưới gốc, tránh làm ướt lá",
+        "Phun thuốc gốc đồng theo hướng dẫn",
+    ],
+    "độ tin cậy": 0.82,
+}
+
+MOCK_HEALTHY_ANALYSIS = {
+    "plant_type": "Cà chua (Solanum lycopersicum)",
+    "health_status": "Khỏe mạnh",
+    "recommendations": ["Duy trì chế độ tưới hiện tại"],
+    "độ tin cậy": 0.9,
+}
+
+
+@dataclass
+class MockSettings:
+    """Behaviour of the mock server."""
+
+    latency: float = 0.5
+    jitter: float = 0.1
+    error_rate: float = 0.0
+    error_status: int = 500
+    retry_after: Optional[float] = None
+    # Fraction of completions describing a healthy plant (routing first passes keep these)
+    healthy_rate: float = 0.0
+    prompt_tokens: int = 1100
+    completion_tokens: int = 350
+    stream_chunks: int = 20
+    seed: Optional[int] = None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def settings(self) -> MockSettings:
+        return self.server.settings
+
+    def _send_json(self, status: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": model, "object": "model", "owned_by": "mock"}
+                         for model in ("gpt-4o", "gpt-4o-mini")],
+            })
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+
+        self.server.record_request()
+        settings = self.settings
+        rng = self.server.rng
+        with self.server.rng_lock:
+            delay = max(0.0, rng.gauss(settings.latency, settings.jitter))
+            failed = rng.random() < settings.error_rate
+            healthy = rng.random() < settings.healthy_rate
+
+        if failed:
+            time.sleep(delay / 4)
+            error_type = "rate_limit_exceeded" if settings.error_status == 429 else "server_error"
+            headers = {}
+            if settings.retry_after is not None:
+                headers["retry-after-ms"] = str(int(settings.retry_after * 1000))
+            self._send_json(settings.error_status, {
+                "error": {"message": "Mock upstream error", "type": error_type}
+            }, headers)
+            return
+
+        analysis = dict(MOCK_HEALTHY_ANALYSIS if healthy else MOCK_ANALYSIS)
+        if "disease_detected" in json.dumps(request.get("messages", []), ensure_ascii=False):
+            # Triage fields requested by a tiered-routing first pass
+            analysis.update({"confidence": analysis["độ tin cậy"], "disease_detected": not healthy})
+        content = "```json\n" + json.dumps(analysis, ensure_ascii=False, indent=2) + "\n```"
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = request.get("model", "gpt-4o")
+
+        if request.get("stream"):
+            self._stream(completion_id, model, content, delay)
+            return
+
+        time.sleep(delay)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": settings.prompt_tokens,
+                "completion_tokens": settings.completion_tokens,
+                "total_tokens": settings.prompt_tokens + settings.completion_tokens,
+            },
+        })
+
+    def _stream(self, completion_id: str, model: str, content: str, delay: float):
+        """Send the completion as server-sent events spread over the latency."""
+        chunks = max(1, self.settings.stream_chunks)
+        size = max(1, len(content) // chunks)
+        pieces = [content[i:i + size] for i in range(0, len(content), size)]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        for piece in pieces:
+            time.sleep(delay / len(pieces))
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    """Threaded mock OpenAI server, usable as a context manager."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, settings: Optional[MockSettings] = None):
+        self.settings = settings or MockSettings()
+        self.rng = random.Random(self.settings.seed)
+        self.rng_lock = threading.Lock()
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        super().__init__((host, port), _Handler)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self):
+        with self._count_lock:
+            self.request_count += 1
+
+    def start(self) -> "MockOpenAIServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket."""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    parser.add_argument("--latency", type=float, default=0.5, help="Mean completion latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Latency standard deviation in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of completions that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failed completions")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with errors")
+    parser.add_argument("--healthy-rate", type=float, default=0.0, help="Fraction of healthy-plant completions")
+    parser.add_argument("--prompt-tokens", type=int, default=1100)
+    parser.add_argument("--completion-tokens", type=int, default=350)
+    parser.add_argument("--stream-chunks", type=int, default=20, help="Chunks per streamed completion")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    settings = MockSettings(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        error_status=args.error_status, retry_after=args.retry_after,
+        healthy_rate=args.healthy_rate, prompt_tokens=args.prompt_tokens,
+        completion_tokens=args.completion_tokens, stream_chunks=args.stream_chunks, seed=args.seed
+    )
+    server = MockOpenAIServer(args.host, args.port, settings)
+    print(f"Mock OpenAI server at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
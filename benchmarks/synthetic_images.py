@@ -0,0 +1,117 @@
+"""
+Deterministic synthetic plant images for benchmarks.
+
+Images are leaf-like green ellipses with brown lesion spots on a soil
+background, with per-pixel noise so they compress like photos rather than
+flat colour fields.
+
+Usage:
+    python benchmarks/synthetic_images.py --output data/bench_images --resolutions 0.3,2,12
+"""
+import argparse
+import io
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+# Megapixels -> (width, height) at a 4:3 aspect ratio
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "0.3": (640, 480),
+    "2": (1632, 1224),
+    "12": (4000, 3000),
+    "48": (8000, 6000),
+}
+
+FORMATS = ("jpg", "png", "webp")
+
+_PIL_FORMATS = {"jpg": "JPEG", "jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+
+
+def resolution_for(megapixels: str) -> Tuple[int, int]:
+    """Get the image size for a megapixel label ("0.3", "12", ...) or a WxH string."""
+    if megapixels in RESOLUTIONS:
+        return RESOLUTIONS[megapixels]
+    if "x" in megapixels:
+        width, height = megapixels.lower().split("x")
+        return int(width), int(height)
+    pixels = float(megapixels) * 1_000_000
+    width = int(math.sqrt(pixels * 4 / 3))
+    return width, int(width * 3 / 4)
+
+
+def generate_plant_image(width: int, height: int, seed: int = 0, lesions: bool = True) -> Image.Image:
+    """Generate a synthetic RGB plant photo (without lesion spots if ``lesions`` is False)."""
+    rng = np.random.default_rng(seed)
+
+    # Draw at a bounded working size, then scale; drawing 48 MP directly is slow
+    scale = min(1.0, 1600 / max(width, height))
+    work_w, work_h = max(1, int(width * scale)), max(1, int(height * scale))
+    image = Image.new("RGB", (work_w, work_h), (96, 72, 48))
+    draw = ImageDraw.Draw(image)
+
+    for _ in range(12):
+        cx, cy = rng.uniform(0.1, 0.9) * work_w, rng.uniform(0.1, 0.9) * work_h
+        rx, ry = rng.uniform(0.08, 0.2) * work_w, rng.uniform(0.04, 0.1) * work_h
+        green = (int(rng.integers(30, 80)), int(rng.integers(120, 200)), int(rng.integers(30, 80)))
+        draw.ellipse((cx - rx, cy - ry, cx + rx, cy + ry), fill=green)
+        # Lesions
+        count = int(rng.integers(0, 4))
+        for _ in range(count if lesions else 0):
+            lx, ly = cx + rng.uniform(-0.6, 0.6) * rx, cy + rng.uniform(-0.6, 0.6) * ry
+            lr = rng.uniform(0.05, 0.15) * ry
+            draw.ellipse((lx - lr, ly - lr, lx + lr, ly + lr), fill=(120, 80, 30))
+
+    image = image.filter(ImageFilter.GaussianBlur(radius=1.5))
+    if (work_w, work_h) != (width, height):
+        image = image.resize((width, height), Image.Resampling.BILINEAR)
+
+    # Sensor-like noise keeps compressed sizes realistic
+    pixels = np.asarray(image, dtype=np.int16)
+    noise = rng.integers(-12, 13, size=pixels.shape, dtype=np.int16)
+    return Image.fromarray(np.clip(pixels + noise, 0, 255).astype(np.uint8), "RGB")
+
+
+def encode_image(image: Image.Image, fmt: str, quality: int = 90) -> bytes:
+    """Encode an image to bytes in the given format (jpg, png, webp)."""
+    buffer = io.BytesIO()
+    pil_format = _PIL_FORMATS[fmt.lower()]
+    options = {"quality": quality} if pil_format in ("JPEG", "WEBP") else {}
+    image.save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
+
+
+def write_image_set(output_dir: str,
+                    resolutions: Iterable[str] = ("0.3", "2", "12"),
+                    formats: Iterable[str] = ("jpg",),
+                    seed: int = 0) -> List[Path]:
+    """Write one image per resolution and format; returns the file paths."""
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for megapixels in resolutions:
+        width, height = resolution_for(megapixels)
+        image = generate_plant_image(width, height, seed)
+        for fmt in formats:
+            path = output / f"plant_{megapixels}mp.{fmt}"
+            path.write_bytes(encode_image(image, fmt))
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic plant images")
+    parser.add_argument("--output", default="data/bench_images", help="Output directory")
+    parser.add_argument("--resolutions", default="0.3,2,12", help="Megapixel labels or WxH sizes")
+    parser.add_argument("--formats", default="jpg", help="Comma-separated formats (jpg,png,webp)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    for path in write_image_set(args.output, args.resolutions.split(","), args.formats.split(","), args.seed):
+        print(f"{path} ({path.stat().st_size / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
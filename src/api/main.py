@@ -1,14 +1,21 @@
 """
 FastAPI application for Plant Analysis AI.
 """
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, BackgroundTasks, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import FileResponse, Response
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime, timedelta
 from typing import Optional, List
+import asyncio
+import io
+import signal
 import tempfile
+import time
 import os
 import sys
 from pathlib import Path
+from PIL import Image
 
 # Add src to Python path
 current_dir = Path(__file__).parent
@@ -16,10 +23,26 @@ src_dir = current_dir.parent
 sys.path.insert(0, str(src_dir))
 sys.path.insert(0, str(src_dir.parent))
 
+from src.api.responses import FastJSONResponse, CompressionMiddleware
 from src.core.plant_analyzer import PlantAnalyzer
-from src.core.vector_db import get_vector_db, initialize_vector_db
+from src.core.openai_client import normalize_sections, sections_analysis_type
+from src.core.stages import AnalysisStages
+from src.core.health import UpstreamProber
+from src.core.prescreen import get_prescreen_model, prepare_for_features
+from src.core.rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE, get_request_scheduler
+from src.core.shared_state import get_shared_state
+from src.core.usage import (
+    BudgetExceededError, budget_status, check_budget, current_usage_key, key_allowed, usage_key
+)
+from src.core.exporter import export_results_snapshot
+from src.core.analytics import AnalyticsEngine
 from src.utils.helpers import save_analysis_result, get_project_info
-from src.utils.config import config
+from src.utils.config import Config, ConfigWatcher, config, reload_config, use_settings
+from src.utils.lazy import lazy_import
+from src.utils import metrics, tracing
+
+# The vector database client is imported and connected in the background after startup
+vector_db_module = lazy_import("src.core.vector_db")
 
 # Create FastAPI app
 app = FastAPI(
@@ -27,7 +50,8 @@ app = FastAPI(
     description="API cho phân tích cây trồng bằng hình ảnh sử dụng OpenAI",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -39,27 +63,159 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON payloads (batch results, record searches)
+if config.RESPONSE_COMPRESSION in ("gzip", "brotli"):
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=config.RESPONSE_COMPRESSION_MIN_SIZE,
+        preferred=config.RESPONSE_COMPRESSION
+    )
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Trace each request and return its trace id so slow requests can be looked up."""
+    with tracing.span(
+        f"{request.method} {request.url.path}",
+        **{"http.method": request.method, "http.target": request.url.path}
+    ):
+        response = await call_next(request)
+        tracing.set_attributes({"http.status_code": response.status_code})
+        trace_id = tracing.current_trace_id()
+        if trace_id:
+            response.headers[tracing.TRACE_ID_HEADER] = trace_id
+        return response
+
+@app.middleware("http")
+async def account_usage(request: Request, call_next):
+    """Account the model calls made for a request to its API key (X-API-Key header)."""
+    with usage_key(request.headers.get("X-API-Key")):
+        return await call_next(request)
+
+def _check_api_key():
+    """Refuse the request with 401 unless its API key is accepted (API_KEYS)."""
+    if not key_allowed(current_usage_key()):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-API-Key")
+
+async def _check_budget():
+    """Refuse the request with 401 for an unknown API key, or 429 when it has used up today's budget."""
+    _check_api_key()
+    try:
+        await run_in_threadpool(check_budget, current_usage_key())
+    except BudgetExceededError as e:
+        now = datetime.now()
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(int((tomorrow - now).total_seconds()) + 1)}
+        )
+
 # Global analyzer instance
 analyzer = None
 
+# Background vector database initialization, started on startup
+vector_db_ready: Optional[asyncio.Future] = None
+
+# Preprocessing process pool and model-call thread pool, created on first use
+analysis_stages: Optional[AnalysisStages] = None
+
+def _get_analysis_stages() -> AnalysisStages:
+    """Get the shared analysis stages, creating them on first use."""
+    global analysis_stages
+    if analysis_stages is None:
+        analysis_stages = AnalysisStages()
+    return analysis_stages
+
+started_at = time.monotonic()
+
+def _probe_upstreams() -> dict:
+    """Probe OpenAI and the vector database (run by the background prober, not per request)."""
+    if analyzer is None:
+        return {"success": False, "error": "Analyzer not initialized"}
+    
+    result = analyzer.test_connection()
+    vector_db = vector_db_module.get_vector_db()
+    result["vector_db_status"] = "connected" if vector_db and vector_db.is_available() else "disconnected"
+    return result
+
+# With several API workers, one probe per interval is shared by all of them
+upstream_prober = UpstreamProber(_probe_upstreams, shared_state=get_shared_state())
+
+# Reloads the settings when CONFIG_FILE changes (CONFIG_RELOAD_INTERVAL > 0)
+config_watcher = ConfigWatcher() if config.CONFIG_RELOAD_INTERVAL > 0 else None
+
 @app.on_event("startup")
 async def startup_event():
-    """Initialize the analyzer and vector database on startup."""
-    global analyzer
+    """Initialize the analyzer on startup and the vector database in the background."""
+    global analyzer, vector_db_ready
+    if tracing.setup_tracing():
+        print(f"✅ Tracing enabled ({config.TRACING_EXPORTER} exporter)")
+    if not config.API_KEYS and (config.DAILY_TOKEN_BUDGET or config.DAILY_COST_BUDGET_USD or config.DAILY_BUDGETS):
+        print("⚠️ API_KEYS is empty: daily budgets only track usage per X-API-Key value and can be bypassed")
+    
     try:
         analyzer = PlantAnalyzer()
         print("✅ Plant Analyzer initialized successfully")
-        
-        # Initialize ChromaDB
-        initialize_vector_db()  # Uses config values
-        vector_db = get_vector_db()
+    except Exception as e:
+        print(f"❌ Failed to initialize Plant Analyzer: {e}")
+    
+    if config.WORKER_WARMUP:
+        await asyncio.get_running_loop().run_in_executor(None, _warm_up_worker)
+    
+    # Connecting to ChromaDB can take seconds; serve requests (without vector
+    # DB context and record saving) until it is ready
+    vector_db_ready = asyncio.get_running_loop().run_in_executor(None, _initialize_vector_db)
+    upstream_prober.start()
+    
+    # `kill -HUP <pid>` reloads the settings without a restart
+    if hasattr(signal, "SIGHUP"):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_config)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Only the main thread's loop can handle signals (not e.g. a test client's)
+            pass
+    if config_watcher is not None:
+        config_watcher.start()
+
+def _warm_up_worker():
+    """Start the preprocessing processes and load what the first request would otherwise wait for."""
+    start = time.perf_counter()
+    try:
+        processes = _get_analysis_stages().warm_up()
+        # The model-call client, rate limiter and pre-screen model are otherwise loaded on first use
+        import openai  # noqa: F401
+        get_request_scheduler()
+        get_prescreen_model()
+        print(
+            f"✅ Worker {os.getpid()} warmed up in {time.perf_counter() - start:.1f}s "
+            f"({len(processes)} preprocessing processes)"
+        )
+    except Exception as e:
+        print(f"⚠️ Worker warm-up failed, dependencies will load on first use: {e}")
+
+def _initialize_vector_db():
+    """Import and connect the vector database client."""
+    try:
+        vector_db_module.initialize_vector_db()  # Uses config values
+        vector_db = vector_db_module.get_vector_db()
         if vector_db and vector_db.is_available():
             print("✅ ChromaDB vector database connected successfully")
         else:
             print("⚠️ ChromaDB not available - records will not be saved to vector database")
-            
     except Exception as e:
-        print(f"❌ Failed to initialize Plant Analyzer: {e}")
+        print(f"⚠️ Failed to initialize ChromaDB - records will not be saved to vector database: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the upstream prober, the config watcher and the analysis worker pools."""
+    global analysis_stages
+    upstream_prober.stop()
+    if config_watcher is not None:
+        config_watcher.stop()
+    tracing.shutdown_tracing()
+    if analysis_stages is not None:
+        analysis_stages.shutdown()
+        analysis_stages = None
 
 @app.get("/")
 async def root():
@@ -76,35 +232,51 @@ async def root():
             "analyze_plant": "/analyze/plant", 
             "analyze_disease": "/analyze/disease",
             "analyze_growth": "/analyze/growth",
+            "analyze_sections": "/analyze/sections",
             "analyze_batch": "/analyze/batch",
+            "analyze_multi": "/analyze/multi",
+            "analyze_lesions": "/analyze/lesions",
             "search_records": "/records/search",
+            "export_records": "/records/export",
             "get_record": "/records/{record_id}",
             "database_stats": "/records/stats",
+            "analytics": "/records/analytics",
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "health_details": "/health/details",
+            "metrics": "/metrics",
+            "usage": "/usage",
             "info": "/info"
         }
     }
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint."""
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests (no upstream calls)."""
+    return {
+        "status": "alive",
+        "uptime_seconds": round(time.monotonic() - started_at, 1)
+    }
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: the analyzer is initialized and upstreams were recently reachable."""
     global analyzer
     
     if analyzer is None:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=503,
             content={"status": "unhealthy", "message": "Analyzer not initialized"}
         )
     
     try:
-        # Test API connection
-        test_result = analyzer.test_connection()
+        # Served from the prober's cache; only probes when the result has expired
+        upstream = await run_in_threadpool(upstream_prober.check)
+        last_result = upstream["last_result"] or {}
+        vector_db_status = last_result.get("vector_db_status", "disconnected")
         
-        # Test ChromaDB connection
-        vector_db = get_vector_db()
-        vector_db_status = "connected" if vector_db and vector_db.is_available() else "disconnected"
-        
-        if test_result["success"]:
+        if upstream["healthy"]:
             return {
                 "status": "healthy",
                 "message": "API is running and OpenAI connection is working",
@@ -112,18 +284,19 @@ async def health_check():
                 "vector_db_status": vector_db_status
             }
         else:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=503,
                 content={
                     "status": "degraded", 
                     "message": "API is running but OpenAI connection failed",
                     "openai_status": "disconnected",
                     "vector_db_status": vector_db_status,
-                    "error": test_result.get("error")
+                    "circuit": upstream["circuit"],
+                    "error": upstream["last_error"]
                 }
             )
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=500,
             content={
                 "status": "unhealthy",
@@ -131,10 +304,86 @@ async def health_check():
             }
         )
 
+@app.get("/health")
+async def health_check():
+    """Health check endpoint (same as the readiness probe)."""
+    return await readiness_check()
+
+@app.get("/health/details")
+async def health_details():
+    """Diagnostics: cached upstream probe state, last probe latency, stage queues and rate limits."""
+    return {
+        "analyzer_initialized": analyzer is not None,
+        "uptime_seconds": round(time.monotonic() - started_at, 1),
+        "worker": {"pid": os.getpid(), "shared_state": config.SHARED_STATE_PATH or None},
+        "upstream": upstream_prober.status(),
+        "stages": analysis_stages.stats() if analysis_stages is not None else None,
+        "rate_limits": get_request_scheduler().stats(),
+        "prescreen": _prescreen_status(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def _prescreen_status() -> Optional[dict]:
+    model = get_prescreen_model()
+    return model.metadata if model is not None else None
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus metrics: stage latencies, tokens, cache hits, queue depth and in-flight analyses."""
+    try:
+        return Response(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/usage")
+async def get_usage():
+    """Today's tokens and cost for the caller's API key, against its daily budget."""
+    _check_api_key()
+    try:
+        return await run_in_threadpool(budget_status, current_usage_key())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/info")
 async def get_info():
-    """Get project and API information."""
-    return get_project_info()
+    """Get project and API information, including the upload limits clients should apply."""
+    info = get_project_info()
+    # Images larger than max_image_size are downscaled server-side anyway, so
+    # clients can resize and re-encode before uploading
+    info["upload"] = {
+        "max_image_size": config.MAX_IMAGE_SIZE,
+        "preferred_format": f"image/{config.UPLOAD_PREFERRED_FORMAT}",
+        "quality": config.UPLOAD_QUALITY,
+        "supported_formats": config.SUPPORTED_FORMATS
+    }
+    # Bounds of the per-request overrides accepted by the analyze endpoints
+    info["overrides"] = {
+        "max_image_size": {"min": min(config.MIN_REQUEST_IMAGE_SIZE, config.MAX_IMAGE_SIZE),
+                           "max": config.MAX_IMAGE_SIZE},
+        "detail": ["low", "high", "auto"],
+        "model": config.ALLOWED_MODELS,
+        "max_tokens": {analysis_type: config.max_tokens_for(analysis_type)
+                       for analysis_type in ("plant_identification", "disease_detection",
+                                             "growth_analysis", "complete")}
+    }
+    return info
+
+def analysis_overrides(
+    max_image_size: Optional[int] = Form(None),
+    detail: Optional[str] = Form(None),
+    model: Optional[str] = Form(None),
+    max_tokens: Optional[int] = Form(None)
+) -> dict:
+    """Per-request performance overrides given as form fields (checked by _request_settings)."""
+    overrides = {"max_image_size": max_image_size, "detail": detail, "model": model, "max_tokens": max_tokens}
+    return {name: value for name, value in overrides.items() if value is not None}
+
+def _request_settings(overrides: Optional[dict]) -> Config:
+    """The current settings with a request's overrides applied (400 if they aren't allowed)."""
+    try:
+        return config.with_overrides(**(overrides or {}))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/analyze/complete")
 async def analyze_complete(
@@ -142,17 +391,23 @@ async def analyze_complete(
     file: UploadFile = File(...),
     enhance_image: bool = Form(True),
     remove_background: bool = Form(False),
-    save_result: bool = Form(False)
+    save_result: bool = Form(False),
+    region: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    overrides: dict = Depends(analysis_overrides)
 ):
     """Perform complete plant analysis."""
-    return await _analyze_image(
+    return FastJSONResponse(await _analyze_image(
         file=file,
         analysis_type="complete",
         enhance_image=enhance_image,
         remove_background=remove_background,
         save_result=save_result,
-        background_tasks=background_tasks
-    )
+        background_tasks=background_tasks,
+        region=region,
+        tags=tags,
+        overrides=overrides
+    ))
 
 @app.post("/analyze/plant")
 async def analyze_plant_identification(
@@ -160,17 +415,23 @@ async def analyze_plant_identification(
     file: UploadFile = File(...),
     enhance_image: bool = Form(True),
     remove_background: bool = Form(False),
-    save_result: bool = Form(False)
+    save_result: bool = Form(False),
+    region: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    overrides: dict = Depends(analysis_overrides)
 ):
     """Perform plant identification analysis."""
-    return await _analyze_image(
+    return FastJSONResponse(await _analyze_image(
         file=file,
         analysis_type="plant_identification",
         enhance_image=enhance_image,
         remove_background=remove_background,
         save_result=save_result,
-        background_tasks=background_tasks
-    )
+        background_tasks=background_tasks,
+        region=region,
+        tags=tags,
+        overrides=overrides
+    ))
 
 @app.post("/analyze/disease")
 async def analyze_disease_detection(
@@ -178,17 +439,23 @@ async def analyze_disease_detection(
     file: UploadFile = File(...),
     enhance_image: bool = Form(True),
     remove_background: bool = Form(False),
-    save_result: bool = Form(False)
+    save_result: bool = Form(False),
+    region: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    overrides: dict = Depends(analysis_overrides)
 ):
     """Perform disease detection analysis."""
-    return await _analyze_image(
+    return FastJSONResponse(await _analyze_image(
         file=file,
         analysis_type="disease_detection",
         enhance_image=enhance_image,
         remove_background=remove_background,
         save_result=save_result,
-        background_tasks=background_tasks
-    )
+        background_tasks=background_tasks,
+        region=region,
+        tags=tags,
+        overrides=overrides
+    ))
 
 @app.post("/analyze/growth")
 async def analyze_growth_analysis(
@@ -196,32 +463,104 @@ async def analyze_growth_analysis(
     file: UploadFile = File(...),
     enhance_image: bool = Form(True),
     remove_background: bool = Form(False),
-    save_result: bool = Form(False)
+    save_result: bool = Form(False),
+    region: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    overrides: dict = Depends(analysis_overrides)
 ):
     """Perform growth analysis."""
-    return await _analyze_image(
+    return FastJSONResponse(await _analyze_image(
         file=file,
         analysis_type="growth_analysis",
         enhance_image=enhance_image,
         remove_background=remove_background,
         save_result=save_result,
-        background_tasks=background_tasks
-    )
+        background_tasks=background_tasks,
+        region=region,
+        tags=tags,
+        overrides=overrides
+    ))
 
-async def _analyze_image(
-    file: UploadFile,
-    analysis_type: str,
-    enhance_image: bool,
-    remove_background: bool,
-    save_result: bool,
-    background_tasks: BackgroundTasks
-) -> dict:
-    """Internal function to analyze images."""
-    global analyzer
+@app.post("/analyze/sections")
+async def analyze_sections(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    sections: str = Form(...),
+    enhance_image: bool = Form(True),
+    remove_background: bool = Form(False),
+    save_result: bool = Form(False),
+    region: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    overrides: dict = Depends(analysis_overrides)
+):
+    """Analyze only the requested sections (comma-separated) in one model call."""
+    try:
+        requested = normalize_sections(sections.split(","))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if analyzer is None:
-        raise HTTPException(status_code=503, detail="Analyzer not initialized")
+    return FastJSONResponse(await _analyze_image(
+        file=file,
+        analysis_type=sections_analysis_type(requested),
+        enhance_image=enhance_image,
+        remove_background=remove_background,
+        save_result=save_result,
+        background_tasks=background_tasks,
+        region=region,
+        tags=tags,
+        sections=requested,
+        overrides=overrides
+    ))
+
+@app.post("/analyze/lesions")
+async def analyze_lesions(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    enhance_image: bool = Form(True),
+    save_result: bool = Form(False),
+    region: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    overrides: dict = Depends(analysis_overrides)
+):
+    """Disease detection on a high-resolution image from full-resolution tiles of likely lesions."""
+    return FastJSONResponse(await _analyze_image(
+        file=file,
+        analysis_type="disease_detection",
+        enhance_image=enhance_image,
+        remove_background=False,
+        save_result=save_result,
+        background_tasks=background_tasks,
+        region=region,
+        tags=tags,
+        lesion_tiles=True,
+        overrides=overrides
+    ))
+
+@app.post("/prescreen")
+async def prescreen_image(file: UploadFile = File(...)):
+    """Instant provisional health verdict from the local pre-screen model (no OpenAI call)."""
+    model = get_prescreen_model()
+    if model is None:
+        raise HTTPException(status_code=503, detail="Pre-screen model not available")
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    content = await file.read()
     
+    def predict() -> dict:
+        image = Image.open(io.BytesIO(content))
+        # Let JPEG decode at reduced scale; the features only need a thumbnail
+        image.draft("RGB", (config.MAX_IMAGE_SIZE, config.MAX_IMAGE_SIZE))
+        return model.predict(prepare_for_features(image))
+    
+    try:
+        verdict = await run_in_threadpool(predict)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+    return {"provisional": True, **verdict}
+
+def _validate_upload(file: UploadFile) -> str:
+    """Check an uploaded file is a supported image; returns its extension."""
     # Validate file type
     if not file.content_type.startswith('image/'):
         raise HTTPException(status_code=400, detail="File must be an image")
@@ -234,45 +573,118 @@ async def _analyze_image(
             status_code=400, 
             detail=f"Unsupported file format. Allowed: {allowed_extensions}"
         )
+    return file_ext
+
+async def _save_upload(file: UploadFile, file_ext: str, analysis_type: str) -> tuple:
+    """Save an uploaded file temporarily; returns its path and size in bytes."""
+    with metrics.track_stage("upload_read", analysis_type):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
+            content = await file.read()
+            temp_file.write(content)
+            return temp_file.name, len(content)
+
+def _request_metadata(analysis_type: str,
+                      enhance_image: bool,
+                      remove_background: bool,
+                      region: Optional[str],
+                      tags: Optional[str],
+                      **fields) -> dict:
+    """Request metadata added to the response and saved with the analysis record."""
+    request_metadata = {
+        **fields,
+        "analysis_type": analysis_type,
+        "enhance_image": enhance_image,
+        "remove_background": remove_background
+    }
+    if region:
+        request_metadata["region"] = region
+    if tags:
+        request_metadata["tags"] = [tag.strip() for tag in tags.split(",") if tag.strip()]
+    return request_metadata
+
+def _analysis_outcome(result) -> str:
+    """Outcome label of an analysis for the metrics."""
+    if result.success:
+        return "success"
+    return "rejected" if result.quality or result.rejected_images else "failure"
+
+async def _analyze_image(
+    file: UploadFile,
+    analysis_type: str,
+    enhance_image: bool,
+    remove_background: bool,
+    save_result: bool,
+    background_tasks: BackgroundTasks,
+    region: Optional[str] = None,
+    tags: Optional[str] = None,
+    priority: int = PRIORITY_INTERACTIVE,
+    sections: Optional[List[str]] = None,
+    lesion_tiles: bool = False,
+    overrides: Optional[dict] = None
+) -> dict:
+    """Internal function to analyze images."""
+    global analyzer
+    
+    if analyzer is None:
+        raise HTTPException(status_code=503, detail="Analyzer not initialized")
+    
+    await _check_budget()
+    settings = _request_settings(overrides)
+    file_ext = _validate_upload(file)
     
     # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=file_ext) as temp_file:
-        content = await file.read()
-        temp_file.write(content)
-        temp_file_path = temp_file.name
+    temp_file_path, file_size = await _save_upload(file, file_ext, analysis_type)
     
+    in_flight = metrics.IN_FLIGHT.labels(analysis_type=analysis_type)
+    in_flight.inc()
     try:
-        # Perform analysis
-        result = analyzer.analyze_plant_image(
-            image_path=temp_file_path,
-            analysis_type=analysis_type,
-            enhance_image=enhance_image,
-            remove_background=remove_background
-        )
+        # Preprocess on the process pool, then call the model on the thread pool
+        with use_settings(settings):
+            if lesion_tiles:
+                result = await _get_analysis_stages().analyze_lesions(
+                    analyzer,
+                    temp_file_path,
+                    enhance=enhance_image,
+                    priority=priority
+                )
+            else:
+                result = await _get_analysis_stages().analyze(
+                    analyzer,
+                    temp_file_path,
+                    analysis_type=analysis_type,
+                    enhance=enhance_image,
+                    remove_bg=remove_background,
+                    priority=priority,
+                    sections=sections
+                )
+        metrics.ANALYSES.labels(analysis_type=analysis_type, outcome=_analysis_outcome(result)).inc()
         
         response_data = result.to_dict()
         
         # Add request metadata
-        request_metadata = {
-            "filename": file.filename,
-            "file_size": len(content),
-            "analysis_type": analysis_type,
-            "enhance_image": enhance_image,
-            "remove_background": remove_background
-        }
+        request_metadata = _request_metadata(
+            analysis_type, enhance_image, remove_background, region, tags,
+            filename=file.filename,
+            file_size=file_size
+        )
+        if sections:
+            request_metadata["sections"] = sections
+        if lesion_tiles:
+            request_metadata["lesion_tiles"] = True
+        if overrides:
+            request_metadata["overrides"] = overrides
         response_data["request_metadata"] = request_metadata
         
         # Save result if requested
         if save_result and result.success:
             background_tasks.add_task(
-                save_analysis_result,
-                response_data,
-                "data/results"
+                tracing.bind_context(save_analysis_result),
+                response_data
             )
         
-        # Save to vector database
+        # Save to vector database (in the request's trace)
         background_tasks.add_task(
-            _save_to_vector_db,
+            tracing.bind_context(_save_to_vector_db),
             request_metadata,
             response_data,
             temp_file_path
@@ -284,20 +696,21 @@ async def _analyze_image(
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
     
     finally:
+        in_flight.dec()
         # Don't delete temp file yet - vector DB task needs it
         # It will be cleaned up after vector DB save
-        pass
 
 def _save_to_vector_db(request_data: dict, response_data: dict, image_path: str):
     """Background task to save analysis record to vector database."""
     try:
-        vector_db = get_vector_db()
+        vector_db = vector_db_module.get_vector_db()
         if vector_db and vector_db.is_available():
-            record_id = vector_db.save_analysis_record(
-                request_data=request_data,
-                response_data=response_data,
-                image_path=image_path
-            )
+            with tracing.span("vector_db.save_record", **{"analysis.type": request_data.get("analysis_type")}):
+                record_id = vector_db.save_analysis_record(
+                    request_data=request_data,
+                    response_data=response_data,
+                    image_path=image_path
+                )
             if record_id:
                 print(f"✅ Analysis record saved to vector DB: {record_id}")
             else:
@@ -320,7 +733,10 @@ async def analyze_batch(
     analysis_type: str = Form("complete"),
     enhance_image: bool = Form(True),
     remove_background: bool = Form(False),
-    save_results: bool = Form(False)
+    save_results: bool = Form(False),
+    region: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    overrides: dict = Depends(analysis_overrides)
 ):
     """Analyze multiple images in batch."""
     global analyzer
@@ -331,33 +747,141 @@ async def analyze_batch(
     if len(files) > 10:  # Limit batch size
         raise HTTPException(status_code=400, detail="Maximum 10 files per batch")
     
-    results = {}
+    await _check_budget()
+    # Reject invalid overrides once rather than per file
+    _request_settings(overrides)
     
-    for file in files:
-        try:
-            result = await _analyze_image(
-                file=file,
-                analysis_type=analysis_type,
-                enhance_image=enhance_image,
-                remove_background=remove_background,
-                save_result=save_results,
-                background_tasks=background_tasks
-            )
-            results[file.filename] = result
-            
-        except Exception as e:
+    # Files are analyzed concurrently; the stage limits bound the actual parallelism
+    outcomes = await asyncio.gather(*[
+        _analyze_image(
+            file=file,
+            analysis_type=analysis_type,
+            enhance_image=enhance_image,
+            remove_background=remove_background,
+            save_result=save_results,
+            background_tasks=background_tasks,
+            region=region,
+            tags=tags,
+            priority=PRIORITY_BATCH,
+            overrides=overrides
+        )
+        for file in files
+    ], return_exceptions=True)
+    
+    results = {}
+    for file, outcome in zip(files, outcomes):
+        if isinstance(outcome, Exception):
+            detail = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
             results[file.filename] = {
                 "success": False,
-                "error": str(e),
+                "error": detail,
                 "analysis_type": analysis_type
             }
+        else:
+            results[file.filename] = outcome
     
-    return {
+    return FastJSONResponse({
         "batch_results": results,
         "total_files": len(files),
         "successful_analyses": sum(1 for r in results.values() if r.get("success", False)),
         "failed_analyses": sum(1 for r in results.values() if not r.get("success", False))
-    }
+    })
+
+@app.post("/analyze/multi")
+async def analyze_multi(
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(...),
+    analysis_type: str = Form("complete"),
+    enhance_image: bool = Form(True),
+    remove_background: bool = Form(False),
+    save_result: bool = Form(False),
+    region: Optional[str] = Form(None),
+    tags: Optional[str] = Form(None),
+    overrides: dict = Depends(analysis_overrides)
+):
+    """Analyze several photos of the same plant together, for one combined verdict from one model call."""
+    global analyzer
+    
+    if analyzer is None:
+        raise HTTPException(status_code=503, detail="Analyzer not initialized")
+    
+    if len(files) > config.MAX_IMAGES_PER_REQUEST:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximum {config.MAX_IMAGES_PER_REQUEST} images per request"
+        )
+    
+    await _check_budget()
+    settings = _request_settings(overrides)
+    
+    # Validate every file before saving any of them
+    file_exts = [_validate_upload(file) for file in files]
+    saved = [
+        await _save_upload(file, file_ext, analysis_type)
+        for file, file_ext in zip(files, file_exts)
+    ]
+    temp_file_paths = [path for path, _ in saved]
+    
+    in_flight = metrics.IN_FLIGHT.labels(analysis_type=analysis_type)
+    in_flight.inc()
+    kept_path = None
+    try:
+        # Photos are preprocessed in parallel on the process pool, then analyzed together
+        with use_settings(settings):
+            result = await _get_analysis_stages().analyze_many(
+                analyzer,
+                temp_file_paths,
+                analysis_type=analysis_type,
+                enhance=enhance_image,
+                remove_bg=remove_background,
+                priority=PRIORITY_INTERACTIVE
+            )
+        metrics.ANALYSES.labels(analysis_type=analysis_type, outcome=_analysis_outcome(result)).inc()
+        
+        response_data = result.to_dict()
+        request_metadata = _request_metadata(
+            analysis_type, enhance_image, remove_background, region, tags,
+            filenames=[file.filename for file in files],
+            file_size=sum(size for _, size in saved),
+            image_count=len(files)
+        )
+        if overrides:
+            request_metadata["overrides"] = overrides
+        response_data["request_metadata"] = request_metadata
+        
+        if save_result and result.success:
+            background_tasks.add_task(
+                tracing.bind_context(save_analysis_result),
+                response_data
+            )
+        
+        # The analysis record keeps the first photo that was analyzed
+        rejected = {rejection["image_number"] for rejection in result.rejected_images or []}
+        kept_path = next(
+            (path for number, path in enumerate(temp_file_paths, 1) if number not in rejected),
+            temp_file_paths[0]
+        )
+        background_tasks.add_task(
+            tracing.bind_context(_save_to_vector_db),
+            request_metadata,
+            response_data,
+            kept_path
+        )
+        
+        return FastJSONResponse(response_data)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    
+    finally:
+        in_flight.dec()
+        # The vector DB task cleans up the photo it keeps; remove the others now
+        for path in temp_file_paths:
+            if path != kept_path:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
 
 @app.get("/analysis/types")
 async def get_analysis_types():
@@ -374,7 +898,9 @@ async def get_analysis_types():
             "disease_detection": "Phát hiện bệnh trên cây", 
             "growth_analysis": "Phân tích tình trạng sinh trưởng",
             "complete": "Phân tích toàn diện (bao gồm tất cả)"
-        }
+        },
+        # Any combination can be requested from /analyze/sections in one model call
+        "supported_sections": analyzer.get_supported_sections()
     }
 
 @app.get("/records/search")
@@ -384,7 +910,7 @@ async def search_analysis_records(
     analysis_type: Optional[str] = None
 ):
     """Search analysis records in vector database."""
-    vector_db = get_vector_db()
+    vector_db = vector_db_module.get_vector_db()
     if not vector_db or not vector_db.is_available():
         raise HTTPException(status_code=503, detail="Vector database not available")
     
@@ -400,40 +926,50 @@ async def search_analysis_records(
             filter_metadata=filters if filters else None
         )
         
-        return {
+        return FastJSONResponse({
             "query": query,
             "limit": limit,
             "filters": filters,
             "total_results": len(records),
             "records": records
-        }
+        })
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
-@app.get("/records/{record_id}")
-async def get_analysis_record(record_id: str):
-    """Get a specific analysis record by ID."""
-    vector_db = get_vector_db()
-    if not vector_db or not vector_db.is_available():
-        raise HTTPException(status_code=503, detail="Vector database not available")
+@app.post("/records/export")
+async def export_analysis_records(
+    analysis_type: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """Export stored analysis results to a date/analysis_type partitioned Parquet dataset.
     
+    Each export replaces the previous one under EXPORT_DIR; the manifest's
+    paths are relative to EXPORT_DIR.
+    """
+    _check_api_key()
     try:
-        record = vector_db.get_record_by_id(record_id)
-        if not record:
-            raise HTTPException(status_code=404, detail="Record not found")
-        
-        return record
+        manifest = await run_in_threadpool(
+            export_results_snapshot,
+            config.EXPORT_DIR,
+            analysis_type=analysis_type,
+            start=since,
+            end=until
+        )
+        return manifest
         
-    except HTTPException:
-        raise
+    except ImportError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date range: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get record: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
 
 @app.get("/records/stats")
 async def get_database_statistics():
     """Get vector database statistics."""
-    vector_db = get_vector_db()
+    vector_db = vector_db_module.get_vector_db()
     if not vector_db:
         return {"available": False, "message": "Vector database not initialized"}
     
@@ -444,21 +980,64 @@ async def get_database_statistics():
     except Exception as e:
         return {"available": False, "error": str(e)}
 
+@app.get("/records/analytics")
+async def get_analysis_analytics(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    freq: str = "D",
+    limit: int = 10
+):
+    """Get analysis history statistics: counts, health trends and disease prevalence."""
+    try:
+        stats = await run_in_threadpool(
+            AnalyticsEngine().get_statistics,
+            start=since,
+            end=until,
+            freq=freq,
+            limit=limit
+        )
+        return FastJSONResponse(stats)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid parameters: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute analytics: {str(e)}")
+
+@app.get("/records/{record_id}")
+async def get_analysis_record(record_id: str):
+    """Get a specific analysis record by ID."""
+    vector_db = vector_db_module.get_vector_db()
+    if not vector_db or not vector_db.is_available():
+        raise HTTPException(status_code=503, detail="Vector database not available")
+    
+    try:
+        record = vector_db.get_record_by_id(record_id)
+        if not record:
+            raise HTTPException(status_code=404, detail="Record not found")
+        
+        return record
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get record: {str(e)}")
+
 # Error handlers
 @app.exception_handler(500)
 async def internal_error_handler(request, exc):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content={"detail": "Internal server error", "message": str(exc)}
     )
 
 @app.exception_handler(404) 
 async def not_found_handler(request, exc):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=404,
         content={"detail": "Endpoint not found", "message": "Check API documentation at /docs"}
     )
 
 if __name__ == "__main__":
+    # Development server; run `python -m src.api.serve` for multi-worker production serving
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=5000, reload=True)
@@ -0,0 +1,184 @@
+"""
+Fast JSON response encoding and compression middleware for the API.
+"""
+import gzip
+import json
+import math
+from typing import Any, Optional
+
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    from ..utils.config import config
+    from ..utils.metrics import track_stage
+except ImportError:
+    from src.utils.config import config
+    from src.utils.metrics import track_stage
+
+# Content types worth compressing; images and other binary payloads are skipped
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript")
+
+
+def _default(obj: Any) -> Any:
+    """Fallback encoder for values the JSON backends don't handle natively."""
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "tolist"):  # numpy arrays and scalars
+        return obj.tolist()
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    return str(obj)
+
+
+def _finite(obj: Any) -> Any:
+    """Copy of ``obj`` with NaN and infinities replaced by None, as orjson writes them."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(value) for value in obj]
+    return obj
+
+
+def _json_dumps(content: Any, default) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=default,
+    ).encode("utf-8")
+
+
+def dumps(content: Any, backend: Optional[str] = None) -> bytes:
+    """Serialize content to UTF-8 JSON bytes using the configured backend.
+
+    Both backends write non-finite floats as ``null``, so a payload renders
+    the same whether or not orjson is installed.
+    """
+    backend = backend or config.JSON_RESPONSE_BACKEND
+    if backend == "orjson" and orjson is not None:
+        return orjson.dumps(
+            content,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    try:
+        return _json_dumps(content, _default)
+    except ValueError:
+        # Only payloads with NaN or infinities pay for the extra pass
+        return _json_dumps(_finite(content), lambda obj: _finite(_default(obj)))
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when available, stdlib json otherwise.
+
+    Routes that return this class directly skip FastAPI's ``jsonable_encoder``
+    pass, which dominates serialization time for large analysis payloads.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        analysis_type = content.get("analysis_type") if isinstance(content, dict) else None
+        with track_stage("serialization", analysis_type or "none"):
+            return dumps(content)
+
+
+class CompressionMiddleware:
+    """Compress buffered responses above a size threshold with brotli or gzip.
+
+    Brotli is used when it is the preferred encoding, the ``brotli`` package is
+    installed and the client accepts it; otherwise gzip is used for clients that
+    accept it. Streaming responses (more than one body chunk) pass through as-is.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        preferred: str = "gzip",
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.preferred = preferred
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _select_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        if self.preferred == "brotli" and brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            compressible = headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+            if (
+                message.get("more_body", False)
+                or not compressible
+                or "content-encoding" in headers
+                or len(body) < self.minimum_size
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = self._compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
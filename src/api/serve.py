@@ -0,0 +1,109 @@
+"""
+Production launcher for the API with several worker processes.
+
+Each worker is a separate interpreter with its own analyzer, preprocessing
+pool and connections, so request handling scales across cores instead of
+sharing one event loop. State that has to hold for the host as a whole
+(rate limits, upstream health probes, in-flight and recently finished
+analyses) goes through SHARED_STATE_PATH, which is set for the workers when
+there is more than one of them, and each worker warms up before it accepts
+requests (WORKER_WARMUP).
+
+Uses gunicorn with uvicorn workers where gunicorn is installed (it restarts
+crashed workers), and uvicorn's own process manager otherwise (e.g. on
+Windows).
+
+Usage:
+    python -m src.api.serve --workers 4 --port 5000
+"""
+import argparse
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+from dotenv import dotenv_values
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.utils.config import config
+
+APP = "src.api.main:app"
+DEFAULT_SHARED_STATE_PATH = "data/shared/state.db"
+
+
+def _is_set(name: str, env: Mapping[str, str]) -> bool:
+    return name in env or name in dotenv_values(config.CONFIG_FILE)
+
+
+def worker_environment(workers: int, env: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+    """
+    Environment for the worker processes.
+
+    With several workers they share state through SHARED_STATE_PATH, and
+    each worker's preprocessing pool gets its share of the cores so the
+    host isn't oversubscribed (unless these are configured explicitly).
+    """
+    env = dict(os.environ if env is None else env)
+    if workers > 1:
+        if not config.SHARED_STATE_PATH and not _is_set("SHARED_STATE_PATH", env):
+            env["SHARED_STATE_PATH"] = DEFAULT_SHARED_STATE_PATH
+        if not _is_set("PIPELINE_PREPROCESS_WORKERS", env):
+            env["PIPELINE_PREPROCESS_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+    return env
+
+
+def gunicorn_available() -> bool:
+    """Whether gunicorn can run here (it doesn't support Windows)."""
+    return sys.platform != "win32" and importlib.util.find_spec("gunicorn") is not None
+
+
+def gunicorn_command(host: str, port: int, workers: int, log_level: str) -> List[str]:
+    """Command line running the API under gunicorn with uvicorn workers."""
+    # No --preload: every worker imports the app itself rather than forking a
+    # loaded one, so none of them inherits another's pools or connections
+    return [
+        sys.executable, "-m", "gunicorn", APP,
+        "--worker-class", "uvicorn.workers.UvicornWorker",
+        "--workers", str(workers),
+        "--bind", f"{host}:{port}",
+        "--log-level", log_level,
+        "--timeout", "120",
+    ]
+
+
+def main(argv: Optional[List[str]] = None):
+    """Start the API workers."""
+    parser = argparse.ArgumentParser(description="🌿 Plant Analysis AI - Chạy API với nhiều worker")
+    parser.add_argument("--host", default=config.API_HOST, help="Địa chỉ lắng nghe (mặc định API_HOST)")
+    parser.add_argument("--port", type=int, default=config.API_PORT, help="Cổng (mặc định API_PORT)")
+    parser.add_argument("--workers", type=int, default=config.API_WORKERS,
+                        help="Số tiến trình worker (mặc định API_WORKERS, tức số lõi CPU)")
+    parser.add_argument("--server", choices=("auto", "gunicorn", "uvicorn"), default="auto",
+                        help="Trình quản lý tiến trình (auto: gunicorn nếu có)")
+    parser.add_argument("--log-level", default="info", help="Mức log")
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    env = worker_environment(workers)
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if gunicorn_available() else "uvicorn"
+    print(f"🌿 Starting {workers} API worker(s) with {server} on {args.host}:{args.port}")
+    if env.get("SHARED_STATE_PATH"):
+        print(f"   Shared state: {env['SHARED_STATE_PATH']}")
+
+    os.chdir(ROOT)
+    if server == "gunicorn":
+        command = gunicorn_command(args.host, args.port, workers, args.log_level)
+        os.execve(sys.executable, command, env)
+
+    import uvicorn
+    os.environ.update(env)
+    uvicorn.run(APP, host=args.host, port=args.port, workers=workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
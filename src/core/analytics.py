@@ -0,0 +1,199 @@
+"""
+Vectorized analytics over analysis history.
+
+Dashboard statistics are computed from the result store's incrementally
+maintained daily aggregates, so they never rescan stored results.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    from .health_labels import (
+        DISEASE_PATTERN, HEALTH_CLASSES, HEALTHY_PATTERN, NO_DISEASE_PATTERN, WEAK_PATTERN
+    )
+    from .result_store import ResultStore, TimeBound, get_result_store
+    from ..utils.lazy import lazy_import
+except ImportError:
+    from src.core.health_labels import (
+        DISEASE_PATTERN, HEALTH_CLASSES, HEALTHY_PATTERN, NO_DISEASE_PATTERN, WEAK_PATTERN
+    )
+    from src.core.result_store import ResultStore, TimeBound, get_result_store
+    from src.utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+
+def classify_health_series(health_status: "pd.Series") -> "pd.Series":
+    """Vectorized equivalent of ``classify_health`` for a Series of statuses."""
+    text = health_status.fillna("").astype(str)
+    conditions = [
+        text.str.contains(NO_DISEASE_PATTERN, case=False, regex=True),
+        text.str.contains(DISEASE_PATTERN, case=False, regex=True),
+        text.str.contains(WEAK_PATTERN, case=False, regex=True),
+        text.str.contains(HEALTHY_PATTERN, case=False, regex=True),
+    ]
+    return pd.Series(
+        np.select(conditions, ["healthy", "diseased", "weak", "healthy"], default="unknown"),
+        index=health_status.index
+    )
+
+
+def _value_counts(series: "pd.Series", limit: Optional[int] = None) -> Dict[str, int]:
+    counts = series[series.astype(bool)].value_counts()
+    if limit:
+        counts = counts.head(limit)
+    return {str(key): int(value) for key, value in counts.items()}
+
+
+def summarize_results(results: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Summarize a mapping of analysis results.
+
+    Args:
+        results: Mapping of source (file path, record ID) to result dictionary
+
+    Returns:
+        Totals, counts per analysis type and plant type, and disease statuses
+    """
+    summary = {
+        "total_analyses": len(results),
+        "successful_analyses": 0,
+        "failed_analyses": 0,
+        "analysis_types": {},
+        "common_plant_types": {},
+        "common_health_issues": [],
+        "timestamp": datetime.now().isoformat()
+    }
+    if not results:
+        return summary
+
+    frame = pd.DataFrame.from_records(
+        [
+            {
+                "success": bool(result.get("success", False)),
+                "analysis_type": result.get("analysis_type") or "unknown",
+                "plant_type": result.get("plant_type") or "",
+                "health_status": result.get("health_status") if isinstance(result.get("health_status"), str) else "",
+            }
+            for result in results.values()
+        ]
+    )
+    successful = frame[frame["success"]]
+
+    summary["successful_analyses"] = int(len(successful))
+    summary["failed_analyses"] = int(len(frame) - len(successful))
+    summary["analysis_types"] = _value_counts(successful["analysis_type"])
+    summary["common_plant_types"] = _value_counts(successful["plant_type"])
+    summary["common_health_issues"] = successful.loc[
+        classify_health_series(successful["health_status"]) == "diseased", "health_status"
+    ].tolist()
+    return summary
+
+
+class AnalyticsEngine:
+    """Dashboard statistics over the result store's daily aggregates."""
+
+    def __init__(self, store: Optional[ResultStore] = None):
+        """Initialize with a result store (defaults to the configured store)."""
+        self.store = store or get_result_store()
+
+    def _aggregates(self, start: TimeBound, end: TimeBound) -> "pd.DataFrame":
+        frame = pd.DataFrame.from_records(
+            self.store.read_aggregates(start, end),
+            columns=["day", "analysis_type", "plant_type", "health_class",
+                     "disease", "region", "success", "count"]
+        )
+        frame["day"] = pd.to_datetime(frame["day"])
+        return frame.astype({"success": "int64", "count": "int64"})
+
+    @staticmethod
+    def _health_pivot(frame: "pd.DataFrame", index: str) -> "pd.DataFrame":
+        """Pivot counts of successful analyses into one column per health class."""
+        pivot = frame.pivot_table(
+            index=index, columns="health_class", values="count", aggfunc="sum", fill_value=0
+        )
+        return pivot.reindex(columns=HEALTH_CLASSES, fill_value=0)
+
+    def health_trends(self, frame: "pd.DataFrame", freq: str = "D") -> List[Dict[str, Any]]:
+        """Counts per health class per period, with the share of diseased plants."""
+        successful = frame[frame["success"] == 1]
+        if successful.empty:
+            return []
+        periods = successful.assign(period=successful["day"].dt.to_period(freq).dt.start_time)
+        pivot = self._health_pivot(periods, "period")
+        totals = pivot.sum(axis=1)
+        pivot["total"] = totals
+        pivot["disease_rate"] = np.round(pivot["diseased"] / totals.where(totals > 0), 4).fillna(0.0)
+        pivot.index = pivot.index.strftime("%Y-%m-%d")
+        return pivot.reset_index(names="period").to_dict(orient="records")
+
+    def disease_prevalence(self,
+                           frame: "pd.DataFrame",
+                           by: str = "region",
+                           start: TimeBound = None,
+                           end: TimeBound = None) -> List[Dict[str, Any]]:
+        """Share of diseased analyses per region or tag."""
+        if by == "tag":
+            grouped = pd.DataFrame.from_records(
+                self.store.read_tag_aggregates(start, end),
+                columns=["day", "tag", "health_class", "success", "count"]
+            )
+            grouped = grouped[grouped["success"] == 1]
+            key = "tag"
+        else:
+            grouped = frame[(frame["success"] == 1) & (frame["region"] != "")]
+            key = "region"
+        if grouped.empty:
+            return []
+
+        pivot = self._health_pivot(grouped, key)
+        totals = pivot.sum(axis=1)
+        result = pd.DataFrame({
+            "total": totals,
+            "diseased": pivot["diseased"],
+            "prevalence": np.round(pivot["diseased"] / totals, 4),
+        }).sort_values(["prevalence", "total"], ascending=False)
+        return result.reset_index(names=key).to_dict(orient="records")
+
+    def get_statistics(self,
+                       start: TimeBound = None,
+                       end: TimeBound = None,
+                       freq: str = "D",
+                       limit: int = 10) -> Dict[str, Any]:
+        """
+        Compute dashboard statistics.
+
+        Args:
+            start: Inclusive lower bound (day granularity)
+            end: Exclusive upper bound (day granularity)
+            freq: Trend period as a pandas frequency ("D", "W", "M")
+            limit: Maximum entries in top-N rankings
+
+        Returns:
+            Totals, top plant types and diseases, health trends and prevalence
+        """
+        frame = self._aggregates(start, end)
+        successful = frame[frame["success"] == 1]
+
+        plant_counts = successful[successful["plant_type"] != ""].groupby("plant_type")["count"].sum()
+        disease_counts = successful[successful["disease"] != ""].groupby("disease")["count"].sum()
+        health_counts = successful.groupby("health_class")["count"].sum().reindex(HEALTH_CLASSES, fill_value=0)
+
+        def top(counts: "pd.Series") -> Dict[str, int]:
+            counts = counts.sort_values(ascending=False).head(limit)
+            return {str(key): int(value) for key, value in counts.items()}
+
+        return {
+            "total_analyses": int(frame["count"].sum()),
+            "successful_analyses": int(successful["count"].sum()),
+            "failed_analyses": int(frame.loc[frame["success"] == 0, "count"].sum()),
+            "analysis_types": top(successful.groupby("analysis_type")["count"].sum()),
+            "health_classes": {key: int(value) for key, value in health_counts.items()},
+            "top_plant_types": top(plant_counts),
+            "top_diseases": top(disease_counts),
+            "health_trends": self.health_trends(frame, freq),
+            "prevalence_by_region": self.disease_prevalence(frame, "region"),
+            "prevalence_by_tag": self.disease_prevalence(frame, "tag", start, end),
+            "timestamp": datetime.now().isoformat()
+        }
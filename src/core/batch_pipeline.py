@@ -0,0 +1,193 @@
+"""
+Concurrent directory-scan pipeline for analyzing large image collections.
+
+Images flow through ``AnalysisStages``: decoded and preprocessed on a process
+pool, then analyzed on a thread pool (the model call is I/O-bound), each
+stage with its own concurrency limit and queue bound. Results are appended
+to a JSONL file and successfully analyzed paths to a checkpoint file, so an
+interrupted scan resumes where it stopped.
+"""
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+try:
+    from .plant_analyzer import PlantAnalyzer, PlantAnalysisResult
+    from .stages import AnalysisStages, preprocess_image_file, preprocessing_failure
+    from ..utils.config import config
+except ImportError:
+    from src.core.plant_analyzer import PlantAnalyzer, PlantAnalysisResult
+    from src.core.stages import AnalysisStages, preprocess_image_file, preprocessing_failure
+    from src.utils.config import config
+
+
+def iter_image_files(directory: str, pattern: str = "**/*") -> Iterator[str]:
+    """Yield supported image files under a directory matching a glob pattern."""
+    supported = {f".{fmt.strip().lower()}" for fmt in config.SUPPORTED_FORMATS}
+    for path in Path(directory).glob(pattern):
+        if path.is_file() and path.suffix.lower() in supported:
+            yield str(path)
+
+
+def load_checkpoint(checkpoint_path: str) -> Set[str]:
+    """Load the set of already analyzed image paths, as absolute paths."""
+    if not os.path.exists(checkpoint_path):
+        return set()
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        return {os.path.abspath(line.rstrip("\n")) for line in f if line.strip()}
+
+
+class BatchAnalysisPipeline:
+    """Directory scan over the preprocessing and model-call stages."""
+
+    def __init__(self,
+                 analyzer: PlantAnalyzer,
+                 output_path: str,
+                 checkpoint_path: Optional[str] = None,
+                 analysis_type: str = "complete",
+                 enhance_image: bool = True,
+                 remove_background: bool = False,
+                 preprocess_workers: Optional[int] = None,
+                 api_workers: Optional[int] = None,
+                 preprocess_queue: Optional[int] = None,
+                 api_queue: Optional[int] = None,
+                 on_result: Optional[Callable[[str, PlantAnalysisResult], None]] = None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            analyzer: Analyzer used for the model calls (shared by all threads)
+            output_path: JSONL file results are appended to
+            checkpoint_path: File of analyzed paths (defaults to output_path + ".checkpoint")
+            analysis_type: Type of analysis to perform
+            enhance_image: Whether to enhance image quality
+            remove_background: Whether to attempt background removal
+            preprocess_workers: Preprocessing processes (defaults to PIPELINE_PREPROCESS_WORKERS)
+            api_workers: Concurrent model calls (defaults to PIPELINE_API_CONCURRENCY)
+            preprocess_queue: Preprocessed images held before analysis (defaults to PIPELINE_PREPROCESS_QUEUE)
+            api_queue: Pending model calls (defaults to PIPELINE_API_QUEUE)
+            on_result: Optional callback invoked for each finished image
+        """
+        self.analyzer = analyzer
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+        self.analysis_type = analysis_type
+        self.enhance_image = enhance_image
+        self.remove_background = remove_background
+        self.preprocess_workers = preprocess_workers or config.PIPELINE_PREPROCESS_WORKERS
+        self.api_workers = api_workers or config.PIPELINE_API_CONCURRENCY
+        self.preprocess_queue = preprocess_queue
+        self.api_queue = api_queue
+        self.on_result = on_result
+
+    def run(self,
+            image_paths: Iterable[str],
+            progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Analyze images, skipping those recorded in the checkpoint.
+
+        Args:
+            image_paths: Image paths to analyze
+            progress: Optional callback receiving the running statistics after each image
+
+        Returns:
+            Final statistics (total, skipped, succeeded, failed, elapsed, rate)
+        """
+        Path(self.output_path).parent.mkdir(parents=True, exist_ok=True)
+        done = load_checkpoint(self.checkpoint_path)
+        image_paths = list(image_paths)
+        # Compared as absolute paths, so a file reached by a relative path or
+        # from another working directory is still recognized as analyzed
+        pending: List[str] = [path for path in image_paths if os.path.abspath(path) not in done]
+
+        stats = {
+            "total": len(pending),
+            "skipped": len(image_paths) - len(pending),
+            "completed": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "elapsed": 0.0,
+            "images_per_second": 0.0,
+        }
+        start_time = time.perf_counter()
+        queue = iter(pending)
+        in_flight: Dict[Future, tuple] = {}
+        stages = AnalysisStages(
+            preprocess_workers=self.preprocess_workers,
+            api_workers=self.api_workers,
+            preprocess_queue=self.preprocess_queue,
+            api_queue=self.api_queue
+        )
+
+        def submit_next() -> bool:
+            image_path = next(queue, None)
+            if image_path is None:
+                return False
+            future = stages.submit_preprocess(image_path, self.enhance_image, self.remove_background)
+            in_flight[future] = ("preprocess", image_path)
+            return True
+
+        try:
+            with open(self.output_path, "a", encoding="utf-8") as output_file, \
+                    open(self.checkpoint_path, "a", encoding="utf-8") as checkpoint_file:
+
+                # Preprocessed payloads are only pulled when one is handed on, so at
+                # most the preprocess queue bound of them is held in memory
+                for _ in range(stages.preprocess.max_pending):
+                    if not submit_next():
+                        break
+
+                while in_flight:
+                    finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        stage, image_path = in_flight.pop(future)
+
+                        if stage == "preprocess":
+                            try:
+                                payload = future.result()
+                            except Exception as e:
+                                result = preprocessing_failure(e, self.analysis_type)
+                            else:
+                                # Blocks while the model-call stage is full (backpressure)
+                                analysis = stages.submit_inference(self.analyzer, payload, self.analysis_type)
+                                in_flight[analysis] = ("analyze", image_path)
+                                submit_next()
+                                continue
+                            submit_next()
+                        else:
+                            result = future.result()
+
+                        self._record(image_path, result, output_file, checkpoint_file, stats)
+                        stats["elapsed"] = time.perf_counter() - start_time
+                        stats["images_per_second"] = stats["completed"] / stats["elapsed"] if stats["elapsed"] else 0.0
+                        if progress:
+                            progress(stats)
+        finally:
+            stages.shutdown()
+
+        stats["elapsed"] = time.perf_counter() - start_time
+        return stats
+
+    def _record(self, image_path: str, result: PlantAnalysisResult, output_file, checkpoint_file, stats: Dict[str, Any]):
+        """Append a result to the JSONL output and, on success, to the checkpoint."""
+        record = result.to_dict()
+        record["image_path"] = image_path
+        record["processed_at"] = datetime.now().isoformat()
+        output_file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        output_file.flush()
+
+        stats["completed"] += 1
+        if result.success:
+            stats["succeeded"] += 1
+            # Failed images are left out of the checkpoint so a resumed run retries them
+            checkpoint_file.write(os.path.abspath(image_path) + "\n")
+            checkpoint_file.flush()
+        else:
+            stats["failed"] += 1
+
+        if self.on_result:
+            self.on_result(image_path, result)
@@ -0,0 +1,203 @@
+"""
+Columnar export of stored analysis results to partitioned Parquet.
+"""
+import shutil
+import tempfile
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    from .result_store import ResultStore, TimeBound, get_result_store
+    from ..utils.lazy import lazy_import
+except ImportError:
+    from src.core.result_store import ResultStore, TimeBound, get_result_store
+    from src.utils.lazy import lazy_import
+
+try:
+    pa = lazy_import("pyarrow")
+    ds = lazy_import("pyarrow.dataset")
+except ImportError:  # optional dependency
+    pa = None
+    ds = None
+
+PARTITION_FIELDS = ("date", "analysis_type")
+# Dataset under the export directory that each API export replaces
+SNAPSHOT_NAME = "records"
+
+_snapshot_lock = threading.Lock()
+
+
+def _export_schema() -> "pa.Schema":
+    """Arrow schema of one flattened result row."""
+    return pa.schema([
+        ("id", pa.string()),
+        ("saved_at", pa.timestamp("us")),
+        ("success", pa.bool_()),
+        ("model_used", pa.string()),
+        ("plant_type", pa.string()),
+        ("health_status", pa.string()),
+        ("recommendations", pa.list_(pa.string())),
+        ("recommendation_count", pa.int32()),
+        ("analysis_text", pa.string()),
+        ("error", pa.string()),
+        ("image_width", pa.int32()),
+        ("image_height", pa.int32()),
+        ("image_mode", pa.string()),
+        ("image_format", pa.string()),
+        ("image_has_transparency", pa.bool_()),
+        ("image_estimated_file_size_kb", pa.int64()),
+        ("filename", pa.string()),
+        ("file_size", pa.int64()),
+        ("date", pa.string()),
+        ("analysis_type", pa.string()),
+    ])
+
+
+def _text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def flatten_result(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a stored result into one export row."""
+    saved_at = datetime.fromisoformat(record["saved_at"])
+    image_info = record.get("image_info") or {}
+    size = image_info.get("size") or (None, None)
+    request_metadata = record.get("request_metadata") or {}
+    recommendations = [_text(rec) for rec in record.get("recommendations") or []]
+
+    return {
+        "id": record["id"],
+        "saved_at": saved_at,
+        "success": bool(record.get("success", False)),
+        "model_used": _text(record.get("model_used")),
+        "plant_type": _text(record.get("plant_type")),
+        "health_status": _text(record.get("health_status")),
+        "recommendations": recommendations,
+        "recommendation_count": len(recommendations),
+        "analysis_text": _text(record.get("analysis_text")),
+        "error": _text(record.get("error")),
+        "image_width": size[0],
+        "image_height": size[1],
+        "image_mode": _text(image_info.get("mode")),
+        "image_format": _text(image_info.get("format")),
+        "image_has_transparency": image_info.get("has_transparency"),
+        "image_estimated_file_size_kb": image_info.get("estimated_file_size_kb"),
+        "filename": _text(request_metadata.get("filename")),
+        "file_size": request_metadata.get("file_size"),
+        "date": saved_at.strftime("%Y-%m-%d"),
+        "analysis_type": _text(record.get("analysis_type")) or "unknown",
+    }
+
+
+def _record_batches(store: ResultStore,
+                    schema: "pa.Schema",
+                    batch_size: int,
+                    filters: Dict[str, Any],
+                    counter: Dict[str, int]) -> Iterator["pa.RecordBatch"]:
+    for records in store.iter_batches(batch_size=batch_size, **filters):
+        rows: List[Dict[str, Any]] = [flatten_result(record) for record in records]
+        counter["rows"] += len(rows)
+        yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
+
+def export_results_to_parquet(output_dir: str,
+                              store: Optional[ResultStore] = None,
+                              analysis_type: Optional[str] = None,
+                              start: TimeBound = None,
+                              end: TimeBound = None,
+                              batch_size: int = 1000) -> Dict[str, Any]:
+    """
+    Stream stored results into a Hive-partitioned Parquet dataset.
+
+    Files are laid out as ``date=YYYY-MM-DD/analysis_type=<type>/part-*.parquet``.
+    Results are read and written in batches of ``batch_size`` rows, so memory
+    stays bounded regardless of history size.
+
+    Args:
+        output_dir: Root directory of the dataset
+        store: Source store (defaults to the configured store)
+        analysis_type: Only export this analysis type
+        start: Inclusive lower bound on save time
+        end: Exclusive upper bound on save time
+        batch_size: Rows per read batch and maximum rows per row group
+
+    Returns:
+        Export manifest with row count and written files
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet export. Install it with: pip install pyarrow")
+
+    store = store or get_result_store()
+    schema = _export_schema()
+    counter = {"rows": 0}
+    files: List[str] = []
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+    ds.write_dataset(
+        _record_batches(
+            store, schema, batch_size,
+            {"analysis_type": analysis_type, "start": start, "end": end},
+            counter
+        ),
+        output_dir,
+        schema=schema,
+        format="parquet",
+        partitioning=ds.partitioning(
+            pa.schema([(name, pa.string()) for name in PARTITION_FIELDS]),
+            flavor="hive"
+        ),
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_rows_per_group=batch_size,
+        file_visitor=lambda written: files.append(written.path),
+    )
+
+    return {
+        "output_dir": str(output_dir),
+        "rows": counter["rows"],
+        "files": sorted(files),
+        "partitioning": list(PARTITION_FIELDS),
+    }
+
+
+def export_results_snapshot(export_dir: str, **kwargs: Any) -> Dict[str, Any]:
+    """
+    Export stored results to ``<export_dir>/records``, replacing the previous export.
+
+    The dataset is written to a staging directory next to it and swapped in
+    once complete, so readers never see a half-written export and repeated
+    exports don't accumulate on disk. Paths in the manifest are relative to
+    ``export_dir``, so server paths aren't disclosed.
+
+    Args:
+        export_dir: Export directory (EXPORT_DIR)
+        **kwargs: Filters and options of export_results_to_parquet
+
+    Returns:
+        Export manifest with row count and written files
+    """
+    root = Path(export_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    target = root / SNAPSHOT_NAME
+    with _snapshot_lock:
+        staging = Path(tempfile.mkdtemp(dir=root, prefix=f".{SNAPSHOT_NAME}-"))
+        try:
+            manifest = export_results_to_parquet(str(staging), **kwargs)
+            previous = root / f"{staging.name}-previous"
+            if target.exists():
+                target.rename(previous)
+            staging.rename(target)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    manifest["output_dir"] = SNAPSHOT_NAME
+    manifest["files"] = [
+        (Path(SNAPSHOT_NAME) / Path(path).relative_to(staging)).as_posix() for path in manifest["files"]
+    ]
+    return manifest
@@ -0,0 +1,192 @@
+"""
+Cached upstream health probing for readiness checks.
+
+Probing OpenAI on every readiness request adds upstream traffic per replica
+and makes probes flap whenever the API is slow. ``UpstreamProber`` runs the
+probe in the background, serves the last result until it's older than the
+TTL, and stops probing a failing upstream for a while (circuit breaker).
+With shared state, API workers adopt a recent probe result published by
+another worker instead of probing the upstream themselves.
+"""
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+try:
+    from ..utils.config import config
+    from ..utils.metrics import record_cache
+    from .shared_state import SharedState
+except ImportError:
+    from src.utils.config import config
+    from src.utils.metrics import record_cache
+    from src.core.shared_state import SharedState
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+
+class UpstreamProber:
+    """Background upstream prober with a result TTL and a circuit breaker."""
+
+    def __init__(self,
+                 probe: Callable[[], Dict[str, Any]],
+                 interval: Optional[float] = None,
+                 ttl: Optional[float] = None,
+                 failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None,
+                 shared_state: Optional[SharedState] = None,
+                 shared_key: str = "health:upstream"):
+        """
+        Initialize the prober.
+
+        Args:
+            probe: Callable returning a dict with a boolean "success" key
+            interval: Seconds between background probes (defaults to HEALTH_PROBE_INTERVAL)
+            ttl: Seconds a probe result stays valid (defaults to HEALTH_PROBE_TTL)
+            failure_threshold: Consecutive failures that open the circuit (defaults to HEALTH_CIRCUIT_FAILURES)
+            reset_timeout: Seconds the circuit stays open before a trial probe (defaults to HEALTH_CIRCUIT_RESET)
+            shared_state: State where probe results are published for, and adopted from, other processes
+            shared_key: Entry under which probe results are shared
+        """
+        self.probe = probe
+        self.interval = interval or config.HEALTH_PROBE_INTERVAL
+        self.ttl = ttl or config.HEALTH_PROBE_TTL
+        self.failure_threshold = failure_threshold or config.HEALTH_CIRCUIT_FAILURES
+        self.reset_timeout = reset_timeout or config.HEALTH_CIRCUIT_RESET
+        self.shared_state = shared_state
+        self.shared_key = shared_key
+
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.reset()
+
+    def reset(self):
+        """Forget all probe results and close the circuit."""
+        with self._lock:
+            self._result: Optional[Dict[str, Any]] = None
+            self._checked_at: Optional[float] = None
+            self._latency: Optional[float] = None
+            self._failures = 0
+            self._circuit = CIRCUIT_CLOSED
+            self._opened_at: Optional[float] = None
+            self._probe_count = 0
+
+    def _is_fresh(self, now: float) -> bool:
+        return self._checked_at is not None and now - self._checked_at < self.ttl
+
+    def _circuit_state(self, now: float) -> str:
+        if self._circuit == CIRCUIT_OPEN and now - self._opened_at >= self.reset_timeout:
+            return CIRCUIT_HALF_OPEN
+        return self._circuit
+
+    def _adopt_shared(self) -> Optional[Dict[str, Any]]:
+        """A probe result another process published within the last interval, if any."""
+        if self.shared_state is None:
+            return None
+        return self.shared_state.get(self.shared_key)
+
+    def _run_probe(self, force: bool = False):
+        """Probe once (or adopt a shared result) and update the cached result and circuit state."""
+        shared = None if force else self._adopt_shared()
+        if shared is not None:
+            result, latency = shared["result"], shared["latency"]
+            now = time.monotonic() - max(0.0, time.time() - shared["checked_at"])
+        else:
+            start = time.perf_counter()
+            try:
+                result = dict(self.probe())
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            latency = time.perf_counter() - start
+            now = time.monotonic()
+            if self.shared_state is not None:
+                self.shared_state.set(
+                    self.shared_key,
+                    {"result": result, "latency": latency, "checked_at": time.time()},
+                    ttl=min(self.interval, self.ttl)
+                )
+
+        with self._lock:
+            self._result = result
+            self._checked_at = now
+            self._latency = latency
+            if shared is None:
+                self._probe_count += 1
+            if result.get("success"):
+                self._failures = 0
+                self._circuit = CIRCUIT_CLOSED
+                self._opened_at = None
+            else:
+                self._failures += 1
+                # A failed trial probe re-opens the circuit immediately
+                if self._circuit != CIRCUIT_CLOSED or self._failures >= self.failure_threshold:
+                    self._circuit = CIRCUIT_OPEN
+                    self._opened_at = now
+
+    def _refresh(self, force: bool = False) -> bool:
+        """Probe if the cached result has expired; returns whether a probe ran."""
+        now = time.monotonic()
+        with self._lock:
+            circuit = self._circuit_state(now)
+            due = force or (not self._is_fresh(now) and circuit != CIRCUIT_OPEN) or circuit == CIRCUIT_HALF_OPEN
+
+        if due and self._probe_lock.acquire(blocking=self._result is None):
+            try:
+                self._run_probe(force)
+            finally:
+                self._probe_lock.release()
+            return True
+        return False
+
+    def check(self, force: bool = False) -> Dict[str, Any]:
+        """
+        Get the upstream status, probing only if the cached result has expired.
+
+        While the circuit is open the upstream isn't probed until the reset
+        timeout elapses. Concurrent callers share a single in-flight probe.
+        """
+        probed = self._refresh(force)
+        record_cache("health_probe", hit=not probed)
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        """Get the cached upstream status without probing."""
+        now = time.monotonic()
+        with self._lock:
+            result = self._result or {}
+            circuit = self._circuit_state(now)
+            healthy = bool(result.get("success")) and self._is_fresh(now) and circuit == CIRCUIT_CLOSED
+            return {
+                "healthy": healthy,
+                "circuit": circuit,
+                "consecutive_failures": self._failures,
+                "probe_count": self._probe_count,
+                "last_result": result or None,
+                "last_error": None if result.get("success") else result.get("error"),
+                "last_latency_ms": round(self._latency * 1000, 2) if self._latency is not None else None,
+                "last_checked_seconds_ago": round(now - self._checked_at, 2) if self._checked_at is not None else None,
+                "stale": not self._is_fresh(now),
+            }
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._refresh()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start probing in a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="upstream-prober", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,58 @@
+"""
+Health status labelling shared by the result store and analytics.
+"""
+import re
+from typing import Any, Dict, Optional
+
+HEALTH_CLASSES = ["healthy", "diseased", "weak", "unknown"]
+
+# Negated disease mentions ("không có bệnh") must be checked before DISEASE_PATTERN
+NO_DISEASE_PATTERN = r"không\s+(?:có\s+|phát hiện\s+)?(?:dấu hiệu\s+)?bệnh|no\s+disease|disease[- ]free"
+DISEASE_PATTERN = r"bệnh|benh|disease|nhiễm|nấm|sâu|infect|blight|rot\b|virus"
+WEAK_PATTERN = r"suy yếu|yếu|weak|thiếu|stress|héo"
+HEALTHY_PATTERN = r"khỏe|khoẻ|khoe manh|healthy|bình thường|tốt"
+
+_no_disease_re = re.compile(NO_DISEASE_PATTERN, re.IGNORECASE)
+_disease_re = re.compile(DISEASE_PATTERN, re.IGNORECASE)
+_weak_re = re.compile(WEAK_PATTERN, re.IGNORECASE)
+_healthy_re = re.compile(HEALTHY_PATTERN, re.IGNORECASE)
+
+DISEASE_NAME_KEYS = ("tên bệnh", "disease_name", "disease_names", "diseases_detected")
+
+
+def classify_health(health_status: Optional[str]) -> str:
+    """Map a free-text health status to one of HEALTH_CLASSES."""
+    if not health_status:
+        return "unknown"
+    if _no_disease_re.search(health_status):
+        return "healthy"
+    if _disease_re.search(health_status):
+        return "diseased"
+    if _weak_re.search(health_status):
+        return "weak"
+    if _healthy_re.search(health_status):
+        return "healthy"
+    return "unknown"
+
+
+def _find_disease_name(data: Any, depth: int = 0) -> Optional[str]:
+    if depth > 3 or not isinstance(data, dict):
+        return None
+    for key, value in data.items():
+        if any(name in str(key).lower() for name in DISEASE_NAME_KEYS) and value:
+            if isinstance(value, list):
+                value = value[0] if value else None
+            if isinstance(value, (str, int, float)):
+                return str(value)
+        found = _find_disease_name(value, depth + 1)
+        if found:
+            return found
+    return None
+
+
+def extract_disease_name(result: Dict[str, Any]) -> Optional[str]:
+    """Get the disease name of a diseased result, or None if it isn't diseased."""
+    health_status = result.get("health_status")
+    if not isinstance(health_status, str) or classify_health(health_status) != "diseased":
+        return None
+    return _find_disease_name(result.get("structured_data")) or health_status
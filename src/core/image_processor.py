@@ -2,32 +2,93 @@
 Image processing utilities for plant analysis.
 """
 import os
-from typing import Tuple, Optional
-import cv2
-import numpy as np
+from typing import Any, Dict, List, Tuple, Optional
 from PIL import Image, ImageEnhance
 
 try:
-    from ..utils.config import config
+    from ..utils.config import Config, current_settings
+    from ..utils.lazy import lazy_import
+    from ..utils.metrics import QUALITY_REJECTIONS, track_stage
 except ImportError:
-    from src.utils.config import config
+    from src.utils.config import Config, current_settings
+    from src.utils.lazy import lazy_import
+    from src.utils.metrics import QUALITY_REJECTIONS, track_stage
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# HSV range of plant green (OpenCV hue 0-180)
+GREEN_HSV_LOWER = (25, 40, 40)
+GREEN_HSV_UPPER = (85, 255, 255)
+# Plant pixels of any hue (green, yellow, brown or red leaves, fruit and flowers):
+# saturated and not too dark, as in prescreen.extract_features
+PLANT_MIN_SATURATION = 40
+PLANT_MIN_VALUE = 40
+
+# Tiles are scored on a map downscaled so that one tile spans this many pixels
+TILE_SCORE_SIZE = 64
+# Largest lesion (enclosed non-green area), as a fraction of one tile
+TILE_MAX_LESION_AREA = 0.25
+# Dark spots are at least this much darker (HSV value, 0-255) than the leaf average
+TILE_MIN_SPOT_DARKENING = 40
+
+# Shown to users when the quality gate rejects an image
+QUALITY_MESSAGES = {
+    "blurry": "Ảnh bị mờ: hãy giữ chắc máy, chạm để lấy nét vào lá rồi chụp lại.",
+    "too_dark": "Ảnh quá tối: hãy chụp ở nơi đủ sáng hoặc bật đèn.",
+    "overexposed": "Ảnh bị cháy sáng: hãy tránh nắng chiếu thẳng vào ống kính hoặc chụp ở chỗ râm.",
+    "no_vegetation": "Không tìm thấy cây trong ảnh: hãy chụp gần để lá hoặc thân cây chiếm phần lớn khung hình.",
+}
+
+class QualityCheckError(ValueError):
+    """An image too poor to analyze; the message tells the user how to retake it."""
+    
+    def __init__(self, message: str, quality: Dict[str, Any]):
+        super().__init__(message)
+        self.quality = quality
+    
+    def __reduce__(self):
+        # Keep the quality report when raised in a worker process
+        return (QualityCheckError, (str(self), self.quality))
 
 class ImageProcessor:
     """Handle image preprocessing and enhancement for plant analysis."""
     
-    def __init__(self, max_size: int = None):
-        """Initialize image processor."""
-        self.max_size = max_size or config.MAX_IMAGE_SIZE
+    def __init__(self, max_size: int = None, settings: Optional[Config] = None):
+        """
+        Initialize image processor.
+
+        Args:
+            max_size: Longest side of prepared images (defaults to MAX_IMAGE_SIZE)
+            settings: Settings to use (defaults to those of the current request)
+        """
+        self._max_size = max_size
+        self._settings = settings
+
+    @property
+    def settings(self) -> Config:
+        """Explicit settings, or the current request's (with its overrides) read on each use."""
+        return self._settings or current_settings()
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size or self.settings.MAX_IMAGE_SIZE
     
-    def load_image(self, image_path: str) -> Image.Image:
-        """Load and validate image file."""
+    def load_image(self, image_path: str | Image.Image) -> Image.Image:
+        """Load and validate image file, or normalize an already decoded image."""
+        if isinstance(image_path, Image.Image):
+            # Decoded by the caller (e.g. an upload already shown in the web app)
+            if image_path.mode not in ('RGB', 'L'):
+                return image_path.convert('RGB')
+            return image_path
+        
         if not os.path.exists(image_path):
             raise FileNotFoundError(f"Image file not found: {image_path}")
         
         # Check file extension
         ext = os.path.splitext(image_path)[1].lower().replace('.', '')
-        if ext not in config.SUPPORTED_FORMATS:
-            raise ValueError(f"Unsupported image format: {ext}. Supported: {config.SUPPORTED_FORMATS}")
+        if ext not in self.settings.SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported image format: {ext}. Supported: {self.settings.SUPPORTED_FORMATS}")
         
         try:
             image = Image.open(image_path)
@@ -97,7 +158,7 @@ class ImageProcessor:
             print(f"Background removal failed: {e}")
             return image
     
-    def _grabcut_background_removal(self, opencv_image: np.ndarray) -> Image.Image:
+    def _grabcut_background_removal(self, opencv_image: "np.ndarray") -> Image.Image:
         """Use GrabCut algorithm for background removal."""
         height, width = opencv_image.shape[:2]
         
@@ -123,17 +184,13 @@ class ImageProcessor:
         # Convert back to PIL
         return Image.fromarray(cv2.cvtColor(result, cv2.COLOR_BGR2RGB))
     
-    def _threshold_background_removal(self, opencv_image: np.ndarray) -> Image.Image:
+    def _threshold_background_removal(self, opencv_image: "np.ndarray") -> Image.Image:
         """Use color thresholding for background removal."""
         # Convert to HSV
         hsv = cv2.cvtColor(opencv_image, cv2.COLOR_BGR2HSV)
         
-        # Define green color range (for plants)
-        lower_green = np.array([25, 40, 40])
-        upper_green = np.array([85, 255, 255])
-        
         # Create mask
-        mask = cv2.inRange(hsv, lower_green, upper_green)
+        mask = cv2.inRange(hsv, GREEN_HSV_LOWER, GREEN_HSV_UPPER)
         
         # Apply morphological operations
         kernel = np.ones((3, 3), np.uint8)
@@ -146,24 +203,223 @@ class ImageProcessor:
         # Convert back to PIL
         return Image.fromarray(cv2.cvtColor(result, cv2.COLOR_BGR2RGB))
     
-    def preprocess_for_analysis(self, image_path: str, enhance: bool = True, remove_bg: bool = False) -> Image.Image:
-        """Complete preprocessing pipeline for plant analysis."""
-        # Load image
-        image = self.load_image(image_path)
+    def assess_quality(self, image: Image.Image) -> Dict[str, Any]:
+        """
+        Measure sharpness, exposure and plant coverage on a small thumbnail.
+        
+        Sharpness is the variance of the Laplacian of the grayscale thumbnail,
+        exposure its mean brightness (0-255) and plant coverage the fraction of
+        saturated, not too dark pixels. Any hue counts, so yellowed, brown or
+        necrotic leaves and red fruit or flowers aren't taken for plant-free
+        images; grey and white screenshots, documents and walls are.
+        """
+        size = self.settings.QUALITY_THUMBNAIL_SIZE
+        scale = size / max(image.size)
+        thumbnail = image
+        if scale < 1:
+            thumbnail = image.resize(
+                (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+                Image.Resampling.BILINEAR
+            )
+        rgb = np.asarray(thumbnail.convert('RGB'))
+        
+        gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY)
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+        brightness = float(gray.mean())
+        hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+        plant = (hsv[:, :, 1] > PLANT_MIN_SATURATION) & (hsv[:, :, 2] > PLANT_MIN_VALUE)
+        plant_coverage = float(np.count_nonzero(plant)) / plant.size
+        
+        issues = []
+        if sharpness < self.settings.QUALITY_MIN_SHARPNESS:
+            issues.append("blurry")
+        if brightness < self.settings.QUALITY_MIN_BRIGHTNESS:
+            issues.append("too_dark")
+        elif brightness > self.settings.QUALITY_MAX_BRIGHTNESS:
+            issues.append("overexposed")
+        if plant_coverage < self.settings.QUALITY_MIN_PLANT_COVERAGE:
+            issues.append("no_vegetation")
+        
+        return {
+            "sharpness": round(sharpness, 2),
+            "brightness": round(brightness, 1),
+            "plant_coverage": round(plant_coverage, 4),
+            "issues": issues,
+        }
+    
+    def check_quality(self, image: Image.Image) -> Dict[str, Any]:
+        """Assess image quality, raising QualityCheckError for unusable images."""
+        quality = self.assess_quality(image)
+        if quality["issues"]:
+            for issue in quality["issues"]:
+                QUALITY_REJECTIONS.labels(issue=issue).inc()
+            raise QualityCheckError(" ".join(QUALITY_MESSAGES[issue] for issue in quality["issues"]), quality)
+        return quality
+    
+    def anomaly_map(self, image: Image.Image, scale: float) -> "np.ndarray":
+        """
+        Lesion mask (1 = likely lesion) of an image downscaled by ``scale``.
+        
+        Lesions are non-green areas enclosed by plant green (yellow, brown or
+        necrotic spots, holes) up to TILE_MAX_LESION_AREA of a tile, and leaf
+        interior pixels much darker than the rest of the leaf. Non-green areas reaching
+        the image edge (soil, pots, sky) are background, whatever their colour.
+        """
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        rgb = np.asarray(image.convert('RGB').resize(size, Image.Resampling.BILINEAR))
+        hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+        
+        val = hsv[:, :, 2]
+        green = cv2.inRange(hsv, GREEN_HSV_LOWER, GREEN_HSV_UPPER) > 0
+        
+        count, labels, stats, _ = cv2.connectedComponentsWithStats((~green).astype(np.uint8), connectivity=8)
+        left, top, width, height, area = (stats[:, i] for i in range(5))
+        touches_edge = (left == 0) | (top == 0) | (left + width == green.shape[1]) | (top + height == green.shape[0])
+        enclosed = ~touches_edge & (area <= TILE_MAX_LESION_AREA * (TILE_SCORE_SIZE ** 2))
+        enclosed[0] = False  # label 0 is the green pixels
+        
+        anomaly = enclosed[labels].astype(np.float32)
+        # Eroded, so pixels blending leaf and background at its edge don't count as dark spots
+        interior = cv2.erode(green.astype(np.uint8), np.ones((3, 3), np.uint8)) > 0
+        if interior.any():
+            leaf_val = val[interior].astype(np.float32)
+            threshold = leaf_val.mean() - max(2 * leaf_val.std(), TILE_MIN_SPOT_DARKENING)
+            anomaly[interior & (val < threshold)] = 1.0
+        return anomaly
+    
+    def rank_tiles(self,
+                   image: Image.Image,
+                   tile_size: Optional[int] = None,
+                   overlap: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Split an image into overlapping square tiles and rank them by anomaly score.
+        
+        Returns every tile's box (left, top, right, bottom in image pixels) and
+        score (mean of anomaly_map over the tile), highest score first. The last
+        row and column are aligned with the image edge so the tiles cover it all.
+        """
+        tile_size = min(tile_size or self.settings.LESION_TILE_SIZE, max(image.size))
+        overlap = self.settings.LESION_TILE_OVERLAP if overlap is None else overlap
+        stride = max(1, int(tile_size * (1 - overlap)))
+        
+        def starts(length: int) -> List[int]:
+            if length <= tile_size:
+                return [0]
+            positions = list(range(0, length - tile_size, stride))
+            return positions + [length - tile_size]
+        
+        scale = min(1.0, TILE_SCORE_SIZE / tile_size)
+        anomaly = self.anomaly_map(image, scale)
+        
+        tiles = []
+        for top in starts(image.height):
+            for left in starts(image.width):
+                box = (left, top, min(left + tile_size, image.width), min(top + tile_size, image.height))
+                window = anomaly[
+                    int(box[1] * scale):max(int(box[1] * scale) + 1, int(box[3] * scale)),
+                    int(box[0] * scale):max(int(box[0] * scale) + 1, int(box[2] * scale))
+                ]
+                tiles.append({"box": box, "score": float(window.mean()) if window.size else 0.0})
+        tiles.sort(key=lambda tile: tile["score"], reverse=True)
+        return tiles
+    
+    def prepare_lesion_views(self,
+                             image_path: str | Image.Image,
+                             enhance: bool = True,
+                             top_k: Optional[int] = None,
+                             check_quality: Optional[bool] = None) -> Tuple[Image.Image, List[Image.Image], List[Dict[str, Any]]]:
+        """
+        Preprocess an image for lesion tile analysis.
+        
+        Unlike prepare_image, the image is not downscaled to MAX_IMAGE_SIZE first:
+        the top_k (default LESION_TILE_TOP_K) highest-scoring tiles are cropped
+        at full resolution, where small lesions and pests are still visible, and
+        a LESION_OVERVIEW_SIZE overview shows the whole plant.
+        
+        Returns:
+            The overview, the tile crops and, per tile, its number, box, centre
+            (as fractions of the image width and height) and score
+        """
+        with track_stage("decode"):
+            image = self.load_image(image_path)
+            image.load()
+        
+        if self.settings.QUALITY_GATE_ENABLED if check_quality is None else check_quality:
+            with track_stage("quality_check"):
+                self.check_quality(image)
+        
+        with track_stage("tile_ranking"):
+            ranked = self.rank_tiles(image)[:top_k or self.settings.LESION_TILE_TOP_K]
+            tiles = [image.crop(tile["box"]) for tile in ranked]
+        
+        with track_stage("resize"):
+            overview = self.resize_image(image, self.settings.LESION_OVERVIEW_SIZE)
+        
+        if enhance:
+            with track_stage("enhance"):
+                overview = self.enhance_image(overview)
+                tiles = [self.enhance_image(tile) for tile in tiles]
+        
+        tile_info = [
+            {
+                "tile": number,
+                "box": list(tile["box"]),
+                "center": [
+                    round((tile["box"][0] + tile["box"][2]) / 2 / image.width, 2),
+                    round((tile["box"][1] + tile["box"][3]) / 2 / image.height, 2)
+                ],
+                "score": round(tile["score"], 4)
+            }
+            for number, tile in enumerate(ranked, 1)
+        ]
+        return overview, tiles, tile_info
+    
+    def prepare_image(self, image_path: str | Image.Image, check_quality: Optional[bool] = None) -> Image.Image:
+        """
+        First preprocessing steps: decode, resize and quality gate.
+        
+        Unless check_quality is False (default: QUALITY_GATE_ENABLED), blurry,
+        badly exposed and plant-free images are rejected with QualityCheckError
+        right after resizing, before any further work or model call.
+        """
+        # Load image (PIL decodes lazily, so force it inside the decode stage)
+        with track_stage("decode"):
+            image = self.load_image(image_path)
+            image.load()
         
         # Resize if needed
-        image = self.resize_image(image)
+        with track_stage("resize"):
+            image = self.resize_image(image)
+        
+        if self.settings.QUALITY_GATE_ENABLED if check_quality is None else check_quality:
+            with track_stage("quality_check"):
+                self.check_quality(image)
         
+        return image
+    
+    def finish_preprocessing(self, image: Image.Image, enhance: bool = True, remove_bg: bool = False) -> Image.Image:
+        """Last preprocessing steps on a prepared image: enhancement and background removal."""
         # Enhance image quality
         if enhance:
-            image = self.enhance_image(image)
+            with track_stage("enhance"):
+                image = self.enhance_image(image)
         
         # Remove background if requested
         if remove_bg:
-            image = self.remove_background(image)
+            with track_stage("background_removal"):
+                image = self.remove_background(image)
         
         return image
     
+    def preprocess_for_analysis(self,
+                                image_path: str | Image.Image,
+                                enhance: bool = True,
+                                remove_bg: bool = False,
+                                check_quality: Optional[bool] = None) -> Image.Image:
+        """Complete preprocessing pipeline for plant analysis (see prepare_image for the quality gate)."""
+        image = self.prepare_image(image_path, check_quality=check_quality)
+        return self.finish_preprocessing(image, enhance=enhance, remove_bg=remove_bg)
+    
     def get_image_info(self, image: Image.Image) -> dict:
         """Get detailed information about the image."""
         return {
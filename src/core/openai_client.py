@@ -4,29 +4,252 @@ OpenAI API client for plant analysis.
 
 import base64
 import io
+import json
+import math
+import time
 from typing import Optional, Dict, Any, List
 from PIL import Image
-import openai
 import logging
 from datetime import datetime
 from pathlib import Path
 
 try:
-    from ..utils.config import config
-    from .vector_db import get_vector_db
+    from ..utils.config import Config, config, current_settings
+    from ..utils.lazy import lazy_import
+    from ..utils.metrics import ROUTING_DECISIONS, track_stage
+    from ..utils.tracing import set_attributes, span
+    from .prescreen import prescreen_action
+    from .rate_limiter import PRIORITY_INTERACTIVE, get_request_scheduler
+    from .usage import check_budget, record_call, summarize_usage
 except ImportError:
-    from src.utils.config import config
-    from src.core.vector_db import get_vector_db
+    from src.utils.config import Config, config, current_settings
+    from src.utils.lazy import lazy_import
+    from src.utils.metrics import ROUTING_DECISIONS, track_stage
+    from src.utils.tracing import set_attributes, span
+    from src.core.prescreen import prescreen_action
+    from src.core.rate_limiter import PRIORITY_INTERACTIVE, get_request_scheduler
+    from src.core.usage import check_budget, record_call, summarize_usage
+
+openai = lazy_import("openai")
+# The vector database client is only needed for context retrieval
+vector_db_module = lazy_import(".vector_db", __package__)
 
 logger = logging.getLogger(__name__)
 
+# Prompt tokens of one image resized to MAX_IMAGE_SIZE at high detail (85 + 4 tiles x 170)
+IMAGE_TOKEN_ESTIMATE = 765
+LOW_DETAIL_IMAGE_TOKENS = 85
+
+# USD per million (prompt, completion, cached prompt) tokens; MODEL_PRICES overrides or adds models
+DEFAULT_MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00, 1.25),
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "gpt-4.1": (2.00, 8.00, 0.50),
+    "gpt-4.1-mini": (0.40, 1.60, 0.10),
+    "gpt-4.1-nano": (0.10, 0.40, 0.025),
+}
+
+# Appended to the first-pass prompt so routing can read the model's own assessment
+TRIAGE_INSTRUCTIONS = (
+    "\n\nNgoài ra, thêm vào đối tượng JSON gốc hai trường: \"confidence\" "
+    "(độ tin cậy tổng thể của phân tích, số từ 0 đến 1) và \"disease_detected\" "
+    "(true nếu phát hiện bệnh hoặc vấn đề sức khỏe, ngược lại false)."
+)
+
+# Appended to the prompt when several photos of one plant are analyzed together
+MULTI_IMAGE_INSTRUCTIONS = (
+    "\n\nLưu ý: có {count} ảnh được gửi kèm (theo thứ tự là ảnh số {numbers}), tất cả đều chụp "
+    "cùng một cây từ các góc khác nhau (ví dụ cận cảnh lá, toàn cây, mặt dưới lá). Hãy xem xét "
+    "tất cả các ảnh và đưa ra MỘT kết luận chung cho cây, ghi rõ số ảnh khi nêu một dấu hiệu "
+    "chỉ thấy ở ảnh đó."
+)
+
+# Appended to the disease detection prompt in lesion tile mode; {tiles} lists each tile's position
+LESION_TILE_INSTRUCTIONS = (
+    "\n\nLưu ý: ảnh đầu tiên là ảnh toàn cảnh độ phân giải thấp của cả cây. Các ảnh tiếp theo là "
+    "các vùng cắt ở độ phân giải gốc, được chọn vì có nhiều khả năng chứa vết bệnh hoặc sâu hại:\n"
+    "{tiles}\n"
+    "Hãy quan sát kỹ các vùng cắt để phát hiện vết bệnh nhỏ, đốm, nấm hoặc côn trùng, đối chiếu với "
+    "ảnh toàn cảnh và đưa ra MỘT kết luận chung cho cả cây."
+)
+
+# Sections that can be combined into one model call: title and JSON fields with their descriptions
+ANALYSIS_SECTIONS = {
+    "plant_identification": ("NHẬN DẠNG CÂY", {
+        "scientific_name": "tên khoa học",
+        "common_name": "tên thông thường",
+        "family": "họ thực vật",
+        "features": "đặc điểm nhận dạng chính (lá, thân, hoa, quả)",
+        "confidence": "độ tin cậy nhận dạng (0-1)",
+    }),
+    "disease_detection": ("TÌNH TRẠNG SỨC KHỎE VÀ BỆNH", {
+        "overall_health": "khỏe mạnh/bệnh/suy yếu",
+        "symptoms": "các dấu hiệu bệnh (nếu có)",
+        "disease_name": "tên bệnh có thể (nếu xác định được)",
+        "cause": "nguyên nhân có thể",
+        "severity": "nhẹ/trung bình/nặng",
+        "treatment": "khuyến nghị điều trị cụ thể",
+        "prevention": "biện pháp phòng ngừa",
+    }),
+    "growth_analysis": ("PHÂN TÍCH SINH TRƯỞNG", {
+        "growth_stage": "mầm/non/trưởng thành/già",
+        "nutrition": "đủ/thiếu/thừa chất dinh dưỡng",
+        "environment": "điều kiện ánh sáng, độ ẩm, nhiệt độ dựa trên dấu hiệu trên cây",
+        "growth_rate": "chậm/bình thường/nhanh",
+        "care_recommendations": "khuyến nghị chăm sóc",
+        "harvest_time": "thời điểm thu hoạch dự kiến (nếu áp dụng)",
+    }),
+}
+
+
+def normalize_sections(sections) -> List[str]:
+    """Validate requested sections, dropping duplicates and putting them in canonical order."""
+    requested = {section.strip() for section in sections if section and section.strip()}
+    unknown = requested - set(ANALYSIS_SECTIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown analysis sections: {sorted(unknown)}. Supported: {list(ANALYSIS_SECTIONS)}"
+        )
+    if not requested:
+        raise ValueError("At least one analysis section is required")
+    return [section for section in ANALYSIS_SECTIONS if section in requested]
+
+
+def estimate_cost(model: str, usage, settings: Optional[Config] = None) -> Optional[float]:
+    """Cost in USD of a completion's usage, or None for models without a known price."""
+    settings = settings or current_settings()
+    prices = {**DEFAULT_MODEL_PRICES, **settings.MODEL_PRICES}.get((model or "").lower())
+    if prices is None or usage is None:
+        return None
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    # Cached prompt tokens are billed at the cached price (the prompt price if none is known)
+    cached_tokens = min(cached_prompt_tokens(usage), prompt_tokens)
+    cached_price = prices[2] if len(prices) > 2 else prices[0]
+    cost = (prompt_tokens - cached_tokens) * prices[0] + cached_tokens * cached_price + completion_tokens * prices[1]
+    return round(cost / 1_000_000, 6)
+
+
+def cached_prompt_tokens(usage) -> int:
+    """Prompt tokens of a completion served from the prompt cache."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def image_tokens(encoded: str, detail: Optional[str] = None) -> int:
+    """
+    Prompt tokens of one base64 image at the given detail.
+
+    High detail scales the image to fit 2048x2048, then its shortest side to
+    768, and charges 170 tokens per 512px tile on top of the 85 base tokens.
+    """
+    if detail == "low":
+        return LOW_DETAIL_IMAGE_TOKENS
+    try:
+        width, height = Image.open(io.BytesIO(base64.b64decode(encoded))).size
+    except Exception:
+        return IMAGE_TOKEN_ESTIMATE
+    scale = min(1.0, 2048 / max(width, height))
+    scale *= min(1.0, 768 / (min(width, height) * scale))
+    tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+    return LOW_DETAIL_IMAGE_TOKENS + 170 * tiles
+
+
+def _sum_optional(values) -> Optional[float]:
+    known = [value for value in values if value is not None]
+    return round(sum(known), 6) if known else None
+
+
+def _load_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """Parse the JSON object in a model reply, tolerating code fences and surrounding prose."""
+    start, end = text.find("{"), text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_triage(text: str):
+    """Read the first pass's "confidence" (0-1) and "disease_detected" fields; None when missing."""
+    data = _load_json_object(text or "") or {}
+    confidence = data.get("confidence")
+    try:
+        confidence = float(confidence)
+        # Percentages ("85") are normalized to 0-1
+        if confidence > 1:
+            confidence /= 100
+    except (TypeError, ValueError):
+        confidence = None
+
+    disease = data.get("disease_detected")
+    if isinstance(disease, str):
+        disease = disease.strip().lower() in ("true", "yes", "có", "1")
+    elif disease is not None:
+        disease = bool(disease)
+    return confidence, disease
+
+
+def escalation_reason(confidence: Optional[float], disease_detected: Optional[bool],
+                      settings: Optional[Config] = None) -> Optional[str]:
+    """Why a first-pass result should be redone with the full model, or None to keep it."""
+    settings = settings or current_settings()
+    if confidence is None:
+        return "no_confidence"
+    if confidence < settings.CONFIDENCE_THRESHOLD:
+        return "low_confidence"
+    if disease_detected and settings.ROUTING_ESCALATE_ON_DISEASE:
+        return "disease_detected"
+    return None
+
+
+def image_parts(base64_images: str | List, detail: Optional[str] = None,
+                default_detail: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Chat message parts for the images of a request.
+
+    Items are base64 strings or (base64, detail) pairs; a detail given for
+    the whole call (e.g. a low-detail first pass) overrides each image's own,
+    and images with neither get ``default_detail`` (IMAGE_DETAIL).
+    """
+    parts = []
+    for item in [base64_images] if isinstance(base64_images, str) else base64_images:
+        encoded, image_detail = item if isinstance(item, tuple) else (item, None)
+        image_url = {"url": f"data:image/jpeg;base64,{encoded}"}
+        if detail or image_detail or default_detail:
+            image_url["detail"] = detail or image_detail or default_detail
+        parts.append({"type": "image_url", "image_url": image_url})
+    return parts
+
+
+def encode_stage(*images) -> str:
+    """Stage that encoding ``images`` is timed as: only base64 when they are already encoded (e.g. by a worker)."""
+    return "base64" if all(isinstance(image, bytes) for image in images) else "encode"
+
+
+def sections_analysis_type(sections: List[str]) -> str:
+    """Analysis type label of a multi-section analysis, e.g. "plant_identification+disease_detection"."""
+    return "+".join(sections)
+
 
 class OpenAIClient:
     """Client for interacting with OpenAI API."""
 
-    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
-        """Initialize OpenAI client."""
-        client_config = {"api_key": api_key or config.OPENAI_API_KEY}
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 settings: Optional[Config] = None):
+        """
+        Initialize OpenAI client.
+
+        Args:
+            api_key: API key (defaults to OPENAI_API_KEY)
+            base_url: API base URL (defaults to OPENAI_BASE_URL)
+            settings: Settings to use (defaults to those of the current request)
+        """
+        self._settings = settings
+        # Retries are handled by the request scheduler, which also honours rate limits
+        client_config = {"api_key": api_key or config.OPENAI_API_KEY, "max_retries": 0}
 
         # Add base URL if provided
         if base_url or config.OPENAI_BASE_URL:
@@ -34,77 +257,354 @@ class OpenAIClient:
 
         self.client = openai.OpenAI(**client_config)
 
-    def encode_image(self, image_path_or_pil: str | Image.Image) -> str:
+    @property
+    def settings(self) -> Config:
+        """Explicit settings, or the current request's (with its overrides) read on each use."""
+        return self._settings or current_settings()
+
+    @staticmethod
+    def encode_image_bytes(image: Image.Image) -> bytes:
+        """Encode a PIL Image to the byte format sent to the API."""
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def encode_image(self, image_path_or_pil: str | bytes | Image.Image) -> str:
         """Encode image to base64 string."""
         if isinstance(image_path_or_pil, str):
             with open(image_path_or_pil, "rb") as image_file:
                 return base64.b64encode(image_file.read()).decode("utf-8")
+        elif isinstance(image_path_or_pil, bytes):
+            # Already encoded (e.g. by a preprocessing worker process)
+            return base64.b64encode(image_path_or_pil).decode("utf-8")
         else:
             # PIL Image
-            buffer = io.BytesIO()
-            image_path_or_pil.save(buffer, format="PNG")
-            return base64.b64encode(buffer.getvalue()).decode("utf-8")
+            return base64.b64encode(self.encode_image_bytes(image_path_or_pil)).decode("utf-8")
+
+    @staticmethod
+    def estimate_tokens(prompt: str, images: int = 1, max_tokens: Optional[int] = None,
+                        detail: Optional[str] = None) -> int:
+        """Rough token cost of a request for rate limiting (upstream counts max_tokens too)."""
+        image_tokens = LOW_DETAIL_IMAGE_TOKENS if detail == "low" else IMAGE_TOKEN_ESTIMATE
+        # Vietnamese text averages about 3 characters per token
+        return len(prompt) // 3 + images * image_tokens + (max_tokens or current_settings().MAX_TOKENS)
 
     def analyze_plant_image(
-        self, image_path_or_pil: str | Image.Image, analysis_type: str = "complete"
+        self,
+        image_path_or_pil: str | bytes | Image.Image,
+        analysis_type: str = "complete",
+        priority: int = PRIORITY_INTERACTIVE,
+        prescreen: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
         """Analyze plant image using OpenAI Vision API with ChromaDB context."""
 
+        # A confident local healthy verdict can answer disease detection on its own
+        if prescreen_action(prescreen, analysis_type) == "skip":
+            return self._prescreen_result(prescreen, analysis_type)
+
         # Encode image
-        base64_image = self.encode_image(image_path_or_pil)
+        with track_stage(encode_stage(image_path_or_pil), analysis_type):
+            base64_image = self.encode_image(image_path_or_pil)
 
         # Query ChromaDB for relevant context
-        context_info = self._get_chromadb_context(analysis_type)
-
-        # Create prompt based on analysis type with context
-        prompts = {
-            "plant_identification": self._get_plant_identification_prompt(context_info),
-            "disease_detection": self._get_disease_detection_prompt(context_info),
-            "growth_analysis": self._get_growth_analysis_prompt(context_info),
-            "complete": self._get_complete_analysis_prompt(context_info),
-        }
+        with track_stage("context_retrieval", analysis_type):
+            context_info = self._get_chromadb_context(analysis_type)
+
+        prompt = self._get_analysis_prompt(analysis_type, context_info)
+        return self._run_analysis(base64_image, prompt, analysis_type, context_info, priority, prescreen=prescreen)
+
+    def analyze_plant_images(
+        self,
+        images: List[str | bytes | Image.Image],
+        analysis_type: str = "complete",
+        priority: int = PRIORITY_INTERACTIVE,
+        image_numbers: Optional[List[int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Analyze several photos of the same plant in one model call, for one combined verdict.
 
-        prompt = prompts.get(analysis_type, prompts["complete"])
+        The prompt and retrieved context are sent once, with one image part per photo.
+        image_numbers are the photos' numbers as the user knows them (default 1..N),
+        so the analysis can cite them even when some photos were dropped.
+        """
+        image_numbers = image_numbers or list(range(1, len(images) + 1))
+
+        with track_stage(encode_stage(*images), analysis_type):
+            base64_images = [self.encode_image(image) for image in images]
+
+        with track_stage("context_retrieval", analysis_type):
+            context_info = self._get_chromadb_context(analysis_type)
+
+        prompt = self._get_analysis_prompt(analysis_type, context_info) + MULTI_IMAGE_INSTRUCTIONS.format(
+            count=len(base64_images), numbers=", ".join(str(number) for number in image_numbers)
+        )
+        result = self._run_analysis(base64_images, prompt, analysis_type, context_info, priority)
+        result["image_count"] = len(base64_images)
+        return result
+
+    def analyze_lesion_tiles(
+        self,
+        overview: str | bytes | Image.Image,
+        tiles: List[str | bytes | Image.Image],
+        tile_info: List[Dict[str, Any]],
+        priority: int = PRIORITY_INTERACTIVE,
+    ) -> Dict[str, Any]:
+        """
+        Disease detection from a low-detail overview plus full-resolution tiles of likely lesions.
 
+        tile_info holds each tile's centre (fractions of the image size), so the
+        prompt can tell the model where the tiles are on the overview.
+        """
+        analysis_type = "disease_detection"
+
+        with track_stage(encode_stage(overview, *tiles), analysis_type):
+            base64_images = [(self.encode_image(overview), "low")] + [
+                (self.encode_image(tile), self.settings.LESION_TILE_DETAIL) for tile in tiles
+            ]
+
+        with track_stage("context_retrieval", analysis_type):
+            context_info = self._get_chromadb_context(analysis_type)
+
+        positions = "\n".join(
+            f"- Ảnh {number}: vùng quanh vị trí {info['center'][0]:.0%} chiều ngang, "
+            f"{info['center'][1]:.0%} chiều dọc của ảnh toàn cảnh"
+            for number, info in enumerate(tile_info, 2)
+        )
+        prompt = self._get_disease_detection_prompt(context_info) + LESION_TILE_INSTRUCTIONS.format(tiles=positions)
+        result = self._run_analysis(base64_images, prompt, analysis_type, context_info, priority)
+        result["lesion_tiles"] = tile_info
+        return result
+
+    def analyze_sections(
+        self,
+        image_path_or_pil: str | bytes | Image.Image,
+        sections: List[str],
+        priority: int = PRIORITY_INTERACTIVE,
+        prescreen: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Analyze several sections (see ``ANALYSIS_SECTIONS``) of a plant image in one model call."""
+        sections = normalize_sections(sections)
+        analysis_type = sections_analysis_type(sections)
+
+        with track_stage(encode_stage(image_path_or_pil), analysis_type):
+            base64_image = self.encode_image(image_path_or_pil)
+
+        # Type-specific context filters only apply to a single section
+        with track_stage("context_retrieval", analysis_type):
+            context_info = self._get_chromadb_context(sections[0] if len(sections) == 1 else "complete")
+
+        prompt = self._get_sections_prompt(sections, context_info)
+        result = self._run_analysis(
+            base64_image, prompt, analysis_type, context_info, priority, json_response=True,
+            prescreen=prescreen
+        )
+        result["sections"] = sections
+        return result
+
+    def _run_analysis(
+        self,
+        base64_image: str | List,
+        prompt: str,
+        analysis_type: str,
+        context_info: List[Dict[str, Any]],
+        priority: int,
+        json_response: bool = False,
+        prescreen: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Run the analysis (routed through a cheaper first pass if enabled) and wrap the response."""
+        settings = self.settings
         try:
-            response = self.client.chat.completions.create(
-                model=config.OPENAI_MODEL,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                },
-                            },
-                        ],
-                    }
-                ],
-                max_tokens=config.MAX_TOKENS,
-                temperature=config.TEMPERATURE,
-            )
+            check_budget()
+            # Images the pre-screen is confident are healthy go to the first-pass model
+            prescreened = prescreen_action(prescreen, analysis_type) is not None
+            if settings.MODEL_ROUTING == "tiered" or prescreened:
+                response, routing = self._route(
+                    base64_image, prompt, analysis_type, priority, json_response, prescreened
+                )
+            else:
+                response, call = self._call_model(
+                    prompt, base64_image, analysis_type, priority, settings.OPENAI_MODEL,
+                    json_response=json_response
+                )
+                routing = {"decision": "direct", "reason": None, "passes": [call]}
+            routing["cost_usd"] = _sum_optional(call.get("cost_usd") for call in routing["passes"])
+            routing["latency_ms"] = round(sum(call.get("latency_ms", 0.0) for call in routing["passes"]), 1)
 
             return {
                 "success": True,
                 "analysis": response.choices[0].message.content,
                 "analysis_type": analysis_type,
-                "model_used": config.OPENAI_MODEL,
+                "model_used": routing["passes"][-1]["model"],
                 "context_used": len(context_info) > 0,
                 "context_records": len(context_info),
+                "routing": routing,
+                "usage": summarize_usage(routing["passes"]),
             }
 
         except Exception as e:
             return {"success": False, "error": str(e), "analysis_type": analysis_type}
 
+    def _route(
+        self,
+        base64_image: str | List,
+        prompt: str,
+        analysis_type: str,
+        priority: int,
+        json_response: bool,
+        prescreened: bool = False,
+    ):
+        """
+        Try the first-pass model; escalate to OPENAI_MODEL when it isn't confident or finds disease.
+
+        After a confident healthy pre-screen, only detected disease escalates.
+        """
+        settings = self.settings
+        first_model = settings.ROUTING_FIRST_PASS_MODEL
+        passes = []
+        try:
+            response, call = self._call_model(
+                prompt + TRIAGE_INSTRUCTIONS, base64_image, analysis_type, priority, first_model,
+                detail=settings.ROUTING_FIRST_PASS_DETAIL, json_response=json_response
+            )
+            call["confidence"], call["disease_detected"] = parse_triage(response.choices[0].message.content)
+            passes.append(call)
+            if prescreened:
+                reason = "disease_detected" if call["disease_detected"] else None
+            else:
+                reason = escalation_reason(call["confidence"], call["disease_detected"], settings)
+        except Exception as e:
+            logger.warning(f"First-pass analysis with {first_model} failed, escalating: {e}")
+            passes.append({"model": first_model, "detail": settings.ROUTING_FIRST_PASS_DETAIL, "error": str(e)})
+            reason = "first_pass_failed"
+
+        if reason is None:
+            decision = "first_pass"
+        else:
+            decision = "escalated"
+            response, call = self._call_model(
+                prompt, base64_image, analysis_type, priority, settings.OPENAI_MODEL,
+                json_response=json_response
+            )
+            passes.append(call)
+
+        kept = "prescreen_healthy" if prescreened else "confident"
+        ROUTING_DECISIONS.labels(decision=decision, reason=reason or kept).inc()
+        set_attributes({"routing.decision": decision, "routing.reason": reason or kept})
+        return response, {"decision": decision, "reason": reason, "passes": passes, "prescreened": prescreened}
+
+    def _prescreen_result(self, prescreen: Dict[str, Any], analysis_type: str) -> Dict[str, Any]:
+        """Disease detection answered by a confident healthy pre-screen verdict, without a model call."""
+        ROUTING_DECISIONS.labels(decision="prescreen_skipped", reason="prescreen_healthy").inc()
+        set_attributes({"routing.decision": "prescreen_skipped"})
+        analysis = {
+            "overall_health": "khỏe mạnh",
+            "summary": (
+                f"Đánh giá sơ bộ: cây có vẻ khỏe mạnh (độ tin cậy {prescreen['confidence']:.0%}). "
+                "Kết quả từ mô hình cục bộ, chưa được AI phân tích chi tiết."
+            ),
+            "confidence": prescreen["confidence"],
+        }
+        return {
+            "success": True,
+            "analysis": json.dumps(analysis, ensure_ascii=False),
+            "analysis_type": analysis_type,
+            "model_used": "prescreen",
+            "context_used": False,
+            "context_records": 0,
+            "routing": {
+                "decision": "prescreen_skipped",
+                "reason": None,
+                "passes": [],
+                "prescreened": True,
+                "cost_usd": 0.0,
+                "latency_ms": prescreen.get("latency_ms", 0.0),
+            },
+            "usage": summarize_usage([]),
+        }
+
+    def _call_model(
+        self,
+        prompt: str,
+        base64_image: str | List,
+        analysis_type: str,
+        priority: int,
+        model: str,
+        detail: Optional[str] = None,
+        json_response: bool = False,
+    ):
+        """Call one model through the request scheduler; returns the response and a record of the call."""
+        scheduler = get_request_scheduler()
+        settings = self.settings
+        request_image_tokens = sum(
+            image_tokens(part["image_url"]["url"].split(",", 1)[1], part["image_url"].get("detail"))
+            for part in image_parts(base64_image, detail, settings.IMAGE_DETAIL)
+        )
+        estimated_tokens = request_image_tokens + self.estimate_tokens(
+            prompt, images=0, max_tokens=settings.max_tokens_for(analysis_type)
+        )
+
+        start = time.perf_counter()
+        response = scheduler.call(
+            lambda: self._create_completion(prompt, base64_image, analysis_type, json_response, model, detail),
+            estimated_tokens=estimated_tokens,
+            priority=priority,
+            analysis_type=analysis_type,
+        )
+        latency = time.perf_counter() - start
+
+        usage = getattr(response, "usage", None)
+        scheduler.settle(estimated_tokens, getattr(usage, "total_tokens", None))
+        call = {
+            "model": model,
+            "detail": detail or settings.IMAGE_DETAIL,
+            "latency_ms": round(latency * 1000, 1),
+            "prompt_tokens": getattr(usage, "prompt_tokens", None),
+            "completion_tokens": getattr(usage, "completion_tokens", None),
+            "cached_tokens": cached_prompt_tokens(usage),
+            # Upstream doesn't break image tokens out of the prompt; this is their computed share
+            "image_tokens": request_image_tokens,
+            "cost_usd": estimate_cost(model, usage, settings),
+        }
+        record_call(call, analysis_type)
+        return response, call
+
+    def _create_completion(self, prompt: str, base64_image: str | List, analysis_type: str,
+                           json_response: bool = False, model: Optional[str] = None,
+                           detail: Optional[str] = None):
+        """Send one chat completion request with the image (or several images)."""
+        settings = self.settings
+        model = model or settings.OPENAI_MODEL
+        options = {"response_format": {"type": "json_object"}} if json_response else {}
+        with track_stage("model_call", analysis_type):
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt},
+                            *image_parts(base64_image, detail, settings.IMAGE_DETAIL),
+                        ],
+                    }
+                ],
+                max_tokens=settings.max_tokens_for(analysis_type),
+                temperature=settings.TEMPERATURE,
+                **options,
+            )
+            usage = getattr(response, "usage", None)
+            set_attributes({
+                "llm.model": model,
+                "llm.prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "llm.completion_tokens": getattr(usage, "completion_tokens", None),
+            })
+        return response
+
     def _get_chromadb_context(
         self, analysis_type: str, limit: int = 5
     ) -> List[Dict[str, Any]]:
         """Query ChromaDB for relevant context based on analysis type."""
         try:
-            vector_db = get_vector_db()
+            vector_db = vector_db_module.get_vector_db()
             if not vector_db or not vector_db.is_available():
                 logger.warning("ChromaDB not available for context retrieval")
                 return []
@@ -139,13 +639,14 @@ class OpenAIClient:
             # Search with each query and collect unique results
             seen_ids = set()
             for query in queries:
-                records = vector_db.search_records(
-                    query=query,
-                    limit=limit,
-                    filter_metadata={"analysis_type": analysis_type}
-                    if analysis_type != "complete"
-                    else None,
-                )
+                with span("vector_db.search_records", **{"db.query": query}):
+                    records = vector_db.search_records(
+                        query=query,
+                        limit=limit,
+                        filter_metadata={"analysis_type": analysis_type}
+                        if analysis_type != "complete"
+                        else None,
+                    )
 
                 for record in records:
                     if record["id"] not in seen_ids:
@@ -207,6 +708,15 @@ class OpenAIClient:
 
         return context_text
 
+    def _get_analysis_prompt(self, analysis_type: str, context_info: List[Dict[str, Any]]) -> str:
+        """Prompt for an analysis type (unknown types get the complete analysis)."""
+        prompts = {
+            "plant_identification": self._get_plant_identification_prompt,
+            "disease_detection": self._get_disease_detection_prompt,
+            "growth_analysis": self._get_growth_analysis_prompt,
+        }
+        return prompts.get(analysis_type, self._get_complete_analysis_prompt)(context_info)
+
     def _get_plant_identification_prompt(
         self, context_records: Optional[List[Dict[str, Any]]] = None
     ) -> str:
@@ -321,3 +831,26 @@ class OpenAIClient:
             return context_text + "\n" + base_prompt
 
         return base_prompt
+
+    def _get_sections_prompt(
+        self, sections: List[str], context_records: Optional[List[Dict[str, Any]]] = None
+    ) -> str:
+        """Get one combined prompt covering only the requested sections."""
+        parts = ["Hãy phân tích cây trồng trong hình ảnh này, chỉ gồm các mục sau:"]
+        for number, section in enumerate(sections, 1):
+            title, fields = ANALYSIS_SECTIONS[section]
+            parts.append(f"\n## {number}. {title} (khóa \"{section}\")")
+            parts.extend(f"- {field}: {description}" for field, description in fields.items())
+
+        keys = ", ".join(f'"{section}"' for section in sections)
+        parts.append(
+            f"\nTrả lời bằng tiếng Việt, chỉ một đối tượng JSON có các khóa {keys}; "
+            "mỗi khóa là một đối tượng chứa các trường của mục tương ứng."
+        )
+        base_prompt = "\n".join(parts)
+
+        if context_records:
+            context_text = self._format_context_for_prompt(context_records)
+            return context_text + "\n" + base_prompt
+
+        return base_prompt
@@ -1,18 +1,38 @@
 """
 Main plant analyzer class that combines image processing and AI analysis.
 """
+import hashlib
 import json
-from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from PIL import Image
 
 try:
-    from .openai_client import OpenAIClient
-    from .image_processor import ImageProcessor
-    from ..utils.config import config
+    from .openai_client import ANALYSIS_SECTIONS, OpenAIClient, normalize_sections, sections_analysis_type
+    from .image_processor import ImageProcessor, QualityCheckError
+    from .prescreen import extract_features, prescreen_features
+    from .rate_limiter import PRIORITY_INTERACTIVE
+    from .shared_state import get_shared_state, shared_key
+    from .singleflight import SingleFlight
+    from .usage import shared_usage
+    from ..utils.config import config, current_settings
+    from ..utils.lazy import lazy_import
+    from ..utils.metrics import analysis_context, record_cache, track_stage
+    from ..utils.tracing import bind_context, set_attributes, span
 except ImportError:
-    from src.core.openai_client import OpenAIClient
-    from src.core.image_processor import ImageProcessor
-    from src.utils.config import config
+    from src.core.openai_client import ANALYSIS_SECTIONS, OpenAIClient, normalize_sections, sections_analysis_type
+    from src.core.image_processor import ImageProcessor, QualityCheckError
+    from src.core.prescreen import extract_features, prescreen_features
+    from src.core.rate_limiter import PRIORITY_INTERACTIVE
+    from src.core.shared_state import get_shared_state, shared_key
+    from src.core.singleflight import SingleFlight
+    from src.core.usage import shared_usage
+    from src.utils.config import config, current_settings
+    from src.utils.lazy import lazy_import
+    from src.utils.metrics import analysis_context, record_cache, track_stage
+    from src.utils.tracing import bind_context, set_attributes, span
+
+np = lazy_import("numpy")
 
 class PlantAnalysisResult:
     """Container for plant analysis results."""
@@ -23,10 +43,26 @@ class PlantAnalysisResult:
         self.success = raw_response.get("success", False)
         self.analysis_type = raw_response.get("analysis_type", "unknown")
         self.model_used = raw_response.get("model_used", "unknown")
+        self.sections = raw_response.get("sections")
+        self.routing = raw_response.get("routing")
+        # Tokens and cost of the model calls made for this analysis
+        self.usage = raw_response.get("usage")
+        # Quality gate report when the image was rejected before analysis
+        self.quality = raw_response.get("quality")
+        # Local pre-screen features and provisional verdict, when enabled
+        self.prescreen = raw_response.get("prescreen")
+        # Multi-image analyses: photos analyzed together, and those dropped before the model call
+        self.image_count = raw_response.get("image_count")
+        self.rejected_images = raw_response.get("rejected_images")
+        # Lesion tile mode: the full-resolution tiles sent with the overview
+        self.lesion_tiles = raw_response.get("lesion_tiles")
         
         if self.success:
             self.analysis_text = raw_response.get("analysis", "")
-            self._parse_analysis()
+            if self.sections:
+                self._parse_sections()
+            else:
+                self._parse_analysis()
         else:
             self.error = raw_response.get("error", "Unknown error")
     
@@ -48,6 +84,29 @@ class PlantAnalysisResult:
                 "summary": self._extract_summary()
             }
     
+    def _parse_sections(self):
+        """Parse a multi-section analysis: one JSON object keyed by section."""
+        text = self.analysis_text.strip()
+        # Tolerate a Markdown code fence around the JSON
+        if text.startswith("```"):
+            text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = None
+        if not isinstance(data, dict):
+            self.structured_data = {
+                "raw_analysis": self.analysis_text,
+                "summary": self._extract_summary()
+            }
+            return
+        self.structured_data = data
+    
+    def get_section(self, section: str) -> Optional[Dict[str, Any]]:
+        """Structured result of one section of a multi-section analysis."""
+        value = getattr(self, 'structured_data', {}).get(section)
+        return value if isinstance(value, dict) else None
+    
     def _extract_summary(self) -> str:
         """Extract a brief summary from the analysis text."""
         lines = self.analysis_text.split('\n')
@@ -70,6 +129,8 @@ class PlantAnalysisResult:
     
     def get_health_status(self) -> Optional[str]:
         """Extract health status from analysis."""
+        if self.sections:
+            return (self.get_section("disease_detection") or {}).get("overall_health")
         if hasattr(self, 'structured_data'):
             return (self.structured_data.get("health_status", {}).get("overall") or
                    self.structured_data.get("health_status") or
@@ -78,6 +139,15 @@ class PlantAnalysisResult:
     
     def get_recommendations(self) -> list:
         """Extract recommendations from analysis."""
+        if self.sections:
+            recommendations = []
+            for section, field in (("disease_detection", "treatment"), ("growth_analysis", "care_recommendations")):
+                value = (self.get_section(section) or {}).get(field)
+                if isinstance(value, str):
+                    recommendations.append(value)
+                elif isinstance(value, list):
+                    recommendations.extend(value)
+            return recommendations
         if hasattr(self, 'structured_data'):
             recommendations = (self.structured_data.get("recommendations") or
                              self.structured_data.get("care_recommendations", []))
@@ -103,11 +173,35 @@ class PlantAnalysisResult:
                 "health_status": self.get_health_status(),
                 "recommendations": self.get_recommendations()
             })
+            if self.sections:
+                result["sections"] = {section: self.get_section(section) for section in self.sections}
+            if self.routing:
+                result["routing"] = self.routing
+            if self.lesion_tiles:
+                result["lesion_tiles"] = self.lesion_tiles
+            if self.usage:
+                result["usage"] = self.usage
         else:
             result["error"] = self.error
+            if self.quality:
+                result["quality"] = self.quality
+        
+        if self.prescreen:
+            result["prescreen"] = self.prescreen
+        if self.image_count:
+            result["image_count"] = self.image_count
+        if self.rejected_images:
+            result["rejected_images"] = self.rejected_images
         
         return result
 
+def image_rejection(image_number: int, error: Exception) -> Dict[str, Any]:
+    """Report for one photo of a multi-image analysis that couldn't be preprocessed."""
+    rejection = {"image_number": image_number, "error": str(error)}
+    if isinstance(error, QualityCheckError):
+        rejection["quality"] = error.quality
+    return rejection
+
 class PlantAnalyzer:
     """Main class for analyzing plants from images."""
     
@@ -117,42 +211,408 @@ class PlantAnalyzer:
         
         self.openai_client = OpenAIClient(api_key, base_url)
         self.image_processor = ImageProcessor()
+        # Identical analyses running at the same time share one model call
+        self._in_flight = SingleFlight()
+
+    @staticmethod
+    def _analysis_key(image: Image.Image | bytes, analysis_type: str) -> tuple:
+        """Key identifying an analysis: digest of the preprocessed image plus its parameters."""
+        # Requests with other overrides (model, detail, token cap) don't share results
+        settings = current_settings().fingerprint()
+        if isinstance(image, Image.Image):
+            digest = hashlib.sha256(image.tobytes()).hexdigest()
+            return digest, image.mode, image.size, analysis_type, settings
+        return hashlib.sha256(image).hexdigest(), analysis_type, settings
+
+    def _coalesce(self, key: tuple, call_model: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run ``call_model`` once for identical analyses in flight, across API workers when state is shared.
+
+        With shared state, successful results are also kept for ANALYSIS_CACHE_TTL seconds.
+
+        A result from another request's call reports zero usage for this
+        request (marked ``shared``), as the call was accounted to that request.
+
+        Returns:
+            The raw result, and whether it came from another request's call
+        """
+        state = get_shared_state()
+        if state is None:
+            raw_result, shared = self._in_flight.do(key, call_model)
+        else:
+            ttl = current_settings().ANALYSIS_CACHE_TTL
+            (raw_result, remote), local = self._in_flight.do(
+                key, lambda: state.coalesce(shared_key(key), call_model, ttl)
+            )
+            raw_result, shared = raw_result, local or remote
+        if shared and "usage" in raw_result:
+            raw_result = {**raw_result, "usage": shared_usage()}
+        return raw_result, shared
     
     def analyze_plant_image(self, 
-                          image_path: str, 
+                          image_path: str | Image.Image, 
                           analysis_type: str = "complete",
                           enhance_image: bool = True,
-                          remove_background: bool = False) -> PlantAnalysisResult:
+                          remove_background: bool = False,
+                          priority: int = PRIORITY_INTERACTIVE,
+                          sections: Optional[List[str]] = None) -> PlantAnalysisResult:
         """
         Analyze a plant image.
         
         Args:
-            image_path: Path to the image file
+            image_path: Path to the image file, or an already decoded PIL Image
             analysis_type: Type of analysis ("plant_identification", "disease_detection", 
                          "growth_analysis", "complete")
             enhance_image: Whether to enhance image quality
             remove_background: Whether to attempt background removal
+            priority: Scheduling priority of the model call (PRIORITY_INTERACTIVE or PRIORITY_BATCH)
+            sections: Analyze only these sections in one combined model call
+                      (any of "plant_identification", "disease_detection", "growth_analysis");
+                      overrides analysis_type
         
         Returns:
             PlantAnalysisResult: Analysis results
         """
         try:
             # Preprocess image
-            processed_image = self.image_processor.preprocess_for_analysis(
-                image_path=image_path,
+            with analysis_context(analysis_type), span("preprocess", **{"analysis.type": analysis_type}):
+                prepared_image = self.image_processor.prepare_image(image_path)
+                image_features = None
+                if current_settings().PRESCREEN_ENABLED:
+                    # Before enhancement, matching the features the model was trained on
+                    with track_stage("prescreen"):
+                        image_features = extract_features(prepared_image)
+                processed_image = self.image_processor.finish_preprocessing(
+                    prepared_image,
+                    enhance=enhance_image,
+                    remove_bg=remove_background
+                )
+            
+            return self.analyze_preprocessed_image(
+                processed_image,
+                analysis_type=analysis_type,
+                image_info=self.image_processor.get_image_info(processed_image),
+                priority=priority,
+                sections=sections,
+                image_features=image_features
+            )
+            
+        except QualityCheckError as e:
+            return PlantAnalysisResult({
+                "success": False,
+                "error": str(e),
+                "quality": e.quality,
+                "analysis_type": analysis_type
+            })
+        except Exception as e:
+            return PlantAnalysisResult({
+                "success": False,
+                "error": str(e),
+                "analysis_type": analysis_type
+            })
+    
+    def analyze_preprocessed_image(self,
+                                   image: Image.Image | bytes,
+                                   analysis_type: str = "complete",
+                                   image_info: Optional[Dict[str, Any]] = None,
+                                   priority: int = PRIORITY_INTERACTIVE,
+                                   sections: Optional[List[str]] = None,
+                                   image_features: Optional["np.ndarray"] = None) -> PlantAnalysisResult:
+        """
+        Analyze an image that has already been preprocessed.
+        
+        Args:
+            image: Preprocessed PIL Image, or its already-encoded bytes
+            analysis_type: Type of analysis to perform
+            image_info: Image information recorded during preprocessing
+            priority: Scheduling priority of the model call
+            sections: Analyze only these sections in one combined model call
+            image_features: Pre-screen features of the prepared (resized, not yet
+                            enhanced) image; computed here from a PIL Image if not given
+        
+        Returns:
+            PlantAnalysisResult: Analysis results
+        """
+        try:
+            if image_features is None and isinstance(image, Image.Image) and current_settings().PRESCREEN_ENABLED:
+                with track_stage("prescreen", analysis_type):
+                    image_features = extract_features(image)
+            prescreen = prescreen_features(image_features)
+            
+            if sections:
+                sections = normalize_sections(sections)
+                analysis_type = sections_analysis_type(sections)
+                call_model = lambda: self.openai_client.analyze_sections(
+                    image_path_or_pil=image,
+                    sections=sections,
+                    priority=priority,
+                    prescreen=prescreen
+                )
+            else:
+                call_model = lambda: self.openai_client.analyze_plant_image(
+                    image_path_or_pil=image,
+                    analysis_type=analysis_type,
+                    priority=priority,
+                    prescreen=prescreen
+                )
+            
+            # Analyze with OpenAI, joining an identical analysis already in flight
+            with analysis_context(analysis_type), span("analyze_image", **{"analysis.type": analysis_type}):
+                raw_result, shared = self._coalesce(
+                    self._analysis_key(image, analysis_type),
+                    call_model
+                )
+                record_cache("in_flight", shared)
+                set_attributes({
+                    "analysis.success": bool(raw_result.get("success")),
+                    "analysis.coalesced": shared,
+                })
+            # Each caller gets its own copy of the shared result
+            raw_result = dict(raw_result)
+            
+            # Add image info to result
+            if image_info is None and isinstance(image, Image.Image):
+                image_info = self.image_processor.get_image_info(image)
+            if image_info is not None:
+                raw_result["image_info"] = image_info
+            if prescreen is not None:
+                raw_result["prescreen"] = prescreen
+            
+            return PlantAnalysisResult(raw_result)
+            
+        except Exception as e:
+            return PlantAnalysisResult({
+                "success": False,
+                "error": str(e),
+                "analysis_type": analysis_type
+            })
+    
+    def analyze_lesion_tiles(self,
+                             image_path: str | Image.Image,
+                             enhance_image: bool = True,
+                             priority: int = PRIORITY_INTERACTIVE) -> PlantAnalysisResult:
+        """
+        Disease detection on a high-resolution image in lesion tile mode.
+        
+        Instead of one image downscaled to MAX_IMAGE_SIZE (which loses small
+        lesions and pests), the model gets a low-detail overview plus the
+        full-resolution tiles ranked most likely to show lesions.
+        
+        Args:
+            image_path: Path to the image file, or an already decoded PIL Image
+            enhance_image: Whether to enhance the overview and tiles
+            priority: Scheduling priority of the model call
+        
+        Returns:
+            PlantAnalysisResult: Analysis results, with the tiles in lesion_tiles
+        """
+        analysis_type = "disease_detection"
+        try:
+            with analysis_context(analysis_type), span(
+                "preprocess", **{"analysis.type": analysis_type, "preprocess.mode": "lesion_tiles"}
+            ):
+                overview, tiles, tile_info = self.image_processor.prepare_lesion_views(
+                    image_path, enhance=enhance_image
+                )
+            
+            return self.analyze_preprocessed_lesion_views(
+                overview,
+                tiles,
+                tile_info,
+                image_info=self.image_processor.get_image_info(overview),
+                priority=priority
+            )
+            
+        except QualityCheckError as e:
+            return PlantAnalysisResult({
+                "success": False,
+                "error": str(e),
+                "quality": e.quality,
+                "analysis_type": analysis_type
+            })
+        except Exception as e:
+            return PlantAnalysisResult({
+                "success": False,
+                "error": str(e),
+                "analysis_type": analysis_type
+            })
+    
+    def analyze_preprocessed_lesion_views(self,
+                                          overview: Image.Image | bytes,
+                                          tiles: List[Image.Image | bytes],
+                                          tile_info: List[Dict[str, Any]],
+                                          image_info: Optional[Dict[str, Any]] = None,
+                                          priority: int = PRIORITY_INTERACTIVE) -> PlantAnalysisResult:
+        """
+        Analyze an overview and lesion tiles prepared by ImageProcessor.prepare_lesion_views.
+        
+        Args:
+            overview: Preprocessed overview image, or its already-encoded bytes
+            tiles: Preprocessed tiles, or their already-encoded bytes
+            tile_info: Number, box, centre and score of each tile
+            image_info: Overview image information recorded during preprocessing
+            priority: Scheduling priority of the model call
+        
+        Returns:
+            PlantAnalysisResult: Analysis results
+        """
+        analysis_type = "disease_detection"
+        try:
+            with analysis_context(analysis_type), span(
+                "analyze_image", **{"analysis.type": analysis_type, "analysis.tiles": len(tiles)}
+            ):
+                raw_result, shared = self._coalesce(
+                    ("lesion_tiles", self._analysis_key(overview, analysis_type),
+                     tuple(self._analysis_key(tile, analysis_type) for tile in tiles)),
+                    lambda: self.openai_client.analyze_lesion_tiles(
+                        overview,
+                        tiles,
+                        tile_info,
+                        priority=priority
+                    )
+                )
+                record_cache("in_flight", shared)
+                set_attributes({
+                    "analysis.success": bool(raw_result.get("success")),
+                    "analysis.coalesced": shared,
+                })
+            # Each caller gets its own copy of the shared result
+            raw_result = dict(raw_result)
+            
+            if image_info is None and isinstance(overview, Image.Image):
+                image_info = self.image_processor.get_image_info(overview)
+            if image_info is not None:
+                raw_result["image_info"] = image_info
+            
+            return PlantAnalysisResult(raw_result)
+            
+        except Exception as e:
+            return PlantAnalysisResult({
+                "success": False,
+                "error": str(e),
+                "analysis_type": analysis_type
+            })
+    
+    def analyze_plant_images(self,
+                             image_paths: List[str | Image.Image],
+                             analysis_type: str = "complete",
+                             enhance_image: bool = True,
+                             remove_background: bool = False,
+                             priority: int = PRIORITY_INTERACTIVE) -> PlantAnalysisResult:
+        """
+        Analyze several photos of the same plant (e.g. leaf close-up, whole plant,
+        leaf underside) together, for one combined verdict from one model call.
+        
+        The photos are preprocessed in parallel. Photos that fail preprocessing
+        (including the quality gate) are dropped and listed in rejected_images;
+        the analysis only fails if none is left.
+        
+        Args:
+            image_paths: Paths to the image files, or already decoded PIL Images
+            analysis_type: Type of analysis to perform
+            enhance_image: Whether to enhance image quality
+            remove_background: Whether to attempt background removal
+            priority: Scheduling priority of the model call
+        
+        Returns:
+            PlantAnalysisResult: Combined analysis results
+        """
+        def preprocess(image_path):
+            return self.image_processor.preprocess_for_analysis(
+                image_path,
                 enhance=enhance_image,
                 remove_bg=remove_background
             )
+        
+        images, image_numbers, rejected_images = [], [], []
+        with analysis_context(analysis_type), span(
+            "preprocess", **{"analysis.type": analysis_type, "preprocess.images": len(image_paths)}
+        ):
+            # Decoding, resizing and OpenCV work release the GIL, so threads overlap
+            with ThreadPoolExecutor(max_workers=max(1, len(image_paths))) as executor:
+                futures = [executor.submit(bind_context(preprocess), path) for path in image_paths]
+            for image_number, future in enumerate(futures, 1):
+                try:
+                    images.append(future.result())
+                    image_numbers.append(image_number)
+                except Exception as e:
+                    rejected_images.append(image_rejection(image_number, e))
+        
+        return self.analyze_preprocessed_images(
+            images,
+            analysis_type=analysis_type,
+            image_infos=[self.image_processor.get_image_info(image) for image in images],
+            priority=priority,
+            image_numbers=image_numbers,
+            rejected_images=rejected_images
+        )
+    
+    def analyze_preprocessed_images(self,
+                                    images: List[Image.Image | bytes],
+                                    analysis_type: str = "complete",
+                                    image_infos: Optional[List[Dict[str, Any]]] = None,
+                                    priority: int = PRIORITY_INTERACTIVE,
+                                    image_numbers: Optional[List[int]] = None,
+                                    rejected_images: Optional[List[Dict[str, Any]]] = None) -> PlantAnalysisResult:
+        """
+        Analyze already preprocessed photos of the same plant in one model call.
+        
+        Args:
+            images: Preprocessed PIL Images, or their already-encoded bytes
+            analysis_type: Type of analysis to perform
+            image_infos: Image information recorded during preprocessing, per image
+            priority: Scheduling priority of the model call
+            image_numbers: The images' numbers in the original request (default 1..N)
+            rejected_images: Photos of the request dropped during preprocessing
+        
+        Returns:
+            PlantAnalysisResult: Combined analysis results
+        """
+        rejected_images = rejected_images or []
+        if not images:
+            return PlantAnalysisResult({
+                "success": False,
+                "error": " ".join(
+                    f"Ảnh {rejection['image_number']}: {rejection['error']}" for rejection in rejected_images
+                ) or "No images to analyze",
+                "rejected_images": rejected_images,
+                "analysis_type": analysis_type
+            })
+        
+        try:
+            max_images = current_settings().MAX_IMAGES_PER_REQUEST
+            if len(images) > max_images:
+                raise ValueError(f"At most {max_images} images can be analyzed together")
+            image_numbers = image_numbers or list(range(1, len(images) + 1))
             
-            # Analyze with OpenAI
-            raw_result = self.openai_client.analyze_plant_image(
-                image_path_or_pil=processed_image,
-                analysis_type=analysis_type
-            )
+            # Analyze with OpenAI, joining an identical analysis already in flight
+            with analysis_context(analysis_type), span(
+                "analyze_images", **{"analysis.type": analysis_type, "analysis.images": len(images)}
+            ):
+                raw_result, shared = self._coalesce(
+                    ("multi", tuple(self._analysis_key(image, analysis_type) for image in images),
+                     tuple(image_numbers)),
+                    lambda: self.openai_client.analyze_plant_images(
+                        images,
+                        analysis_type=analysis_type,
+                        priority=priority,
+                        image_numbers=image_numbers
+                    )
+                )
+                record_cache("in_flight", shared)
+                set_attributes({
+                    "analysis.success": bool(raw_result.get("success")),
+                    "analysis.coalesced": shared,
+                })
+            # Each caller gets its own copy of the shared result
+            raw_result = dict(raw_result)
             
-            # Add image info to result
-            image_info = self.image_processor.get_image_info(processed_image)
-            raw_result["image_info"] = image_info
+            if image_infos is None and all(isinstance(image, Image.Image) for image in images):
+                image_infos = [self.image_processor.get_image_info(image) for image in images]
+            if image_infos is not None:
+                raw_result["image_info"] = image_infos
+            if rejected_images:
+                raw_result["rejected_images"] = rejected_images
             
             return PlantAnalysisResult(raw_result)
             
@@ -160,6 +620,7 @@ class PlantAnalyzer:
             return PlantAnalysisResult({
                 "success": False,
                 "error": str(e),
+                "rejected_images": rejected_images,
                 "analysis_type": analysis_type
             })
     
@@ -195,6 +656,10 @@ class PlantAnalyzer:
         """Get list of supported analysis types."""
         return ["plant_identification", "disease_detection", "growth_analysis", "complete"]
     
+    def get_supported_sections(self) -> list:
+        """Get list of sections that can be combined in one analysis."""
+        return list(ANALYSIS_SECTIONS)
+    
     def test_connection(self) -> Dict[str, Any]:
         """Test the connection to OpenAI API."""
         try:
@@ -0,0 +1,383 @@
+"""
+Local health pre-screen from colour and texture features.
+
+A small scikit-learn classifier trained on past analyses gives an instant,
+provisional health verdict (healthy / diseased / weak) with a confidence.
+The features are cheap image statistics computed with NumPy on a thumbnail
+of the decoded, resized image (before optional enhancement).
+When PRESCREEN_ENABLED is set, every analysis records them next to its
+result, so the result store collects labelled training data. The labels
+come from each result's ``health_status``.
+
+The verdict is shown as a preliminary answer and lets the router skip or
+downgrade model calls for images it is confident are healthy.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from PIL import Image
+
+try:
+    from .health_labels import classify_health
+    from .image_processor import ImageProcessor
+    from ..utils.config import config
+    from ..utils.lazy import lazy_import
+except ImportError:
+    from src.core.health_labels import classify_health
+    from src.core.image_processor import ImageProcessor
+    from src.utils.config import config
+    from src.utils.lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# scikit-learn alone takes about a second to import; only training and loading a model need it
+try:
+    joblib = lazy_import("joblib")
+    linear_model = lazy_import("sklearn.linear_model")
+    model_selection = lazy_import("sklearn.model_selection")
+    pipeline = lazy_import("sklearn.pipeline")
+    preprocessing = lazy_import("sklearn.preprocessing")
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Bump when the features change; models trained on another version are refused
+FEATURE_VERSION = 1
+FEATURE_SIZE = 256
+HUE_BINS = 12
+
+FEATURE_NAMES = (
+    [f"hue_{i}" for i in range(HUE_BINS)] +
+    ["hue_mean", "hue_std", "saturation_mean", "saturation_std", "value_mean", "value_std",
+     "green_fraction", "yellow_fraction", "brown_fraction", "pale_fraction", "spot_fraction",
+     "lesion_fraction", "plant_fraction", "sharpness", "gradient_mean", "contrast"]
+)
+
+# Health classes the pre-screen predicts ("unknown" results aren't used for training)
+PRESCREEN_CLASSES = ("healthy", "diseased", "weak")
+
+
+@lru_cache(maxsize=None)
+def _lesion_kernel() -> "np.ndarray":
+    """Closing with this kernel fills lesion-sized holes in the leaf mask."""
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+
+def extract_features(image: Image.Image) -> "np.ndarray":
+    """
+    Colour and texture features of an image, computed on a small thumbnail.
+
+    Colour statistics cover "plant" pixels (saturated and not too dark):
+    a hue histogram, HSV means and spreads, and the fractions of green,
+    yellow, brown, pale and dark-spot pixels. Lesions are non-green pixels
+    enclosed by leaf (holes in the green mask), which tells spots on a leaf
+    apart from soil of the same colour. Texture is described by sharpness
+    (log Laplacian variance), mean gradient magnitude and contrast.
+    """
+    scale = FEATURE_SIZE / max(image.size)
+    if scale < 1:
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.Resampling.BILINEAR
+        )
+    rgb = np.asarray(image.convert('RGB'))
+    hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV).reshape(-1, 3).astype(np.float32)
+    hue, sat, val = hsv[:, 0], hsv[:, 1], hsv[:, 2]
+    gray = cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY).astype(np.float32)
+
+    plant = (sat > 40) & (val > 40)
+    plant_count = max(int(plant.sum()), 1)
+    plant_hue, plant_sat, plant_val = hue[plant], sat[plant], val[plant]
+
+    hue_hist = np.bincount(
+        np.minimum((plant_hue * HUE_BINS / 180).astype(np.int64), HUE_BINS - 1),
+        minlength=HUE_BINS
+    ) / plant_count
+
+    if plant_hue.size:
+        hsv_stats = [
+            plant_hue.mean() / 180, plant_hue.std() / 180,
+            plant_sat.mean() / 255, plant_sat.std() / 255,
+            plant_val.mean() / 255, plant_val.std() / 255,
+        ]
+        spot_threshold = plant_val.mean() - 2 * plant_val.std()
+    else:
+        hsv_stats = [0.0] * 6
+        spot_threshold = -1.0
+
+    # OpenCV hue is 0-180: brown/orange below 20, yellow around 30, green 25-85
+    green = plant & (hue >= 25) & (hue <= 85)
+    yellow = plant & (hue >= 20) & (hue < 35)
+    brown = plant & ((hue < 20) | (hue > 160))
+    pale = (sat < 40) & (val > 170)
+    spots = plant & (val < spot_threshold)
+
+    green_mask = green.reshape(gray.shape).astype(np.uint8)
+    leaf = cv2.morphologyEx(green_mask, cv2.MORPH_CLOSE, _lesion_kernel())
+    lesions = (leaf > green_mask).sum() / max(int(leaf.sum()), 1)
+
+    grad_y, grad_x = np.gradient(gray)
+    return np.array(
+        list(hue_hist) + hsv_stats + [
+            green.sum() / plant_count,
+            yellow.sum() / plant_count,
+            brown.sum() / plant_count,
+            pale.mean(),
+            spots.sum() / plant_count,
+            lesions,
+            plant.mean(),
+            np.log1p(cv2.Laplacian(gray, cv2.CV_32F).var()),
+            np.hypot(grad_x, grad_y).mean() / 255,
+            gray.std() / 255,
+        ],
+        dtype=np.float32
+    )
+
+
+def prepare_for_features(image_path: str | Image.Image) -> Image.Image:
+    """Decode and resize an image as analysis does before extracting features (no quality gate)."""
+    return ImageProcessor().prepare_image(image_path, check_quality=False)
+
+
+def training_label(record: Dict[str, Any]) -> Optional[str]:
+    """Pre-screen class of a stored result, or None if it can't be used for training."""
+    if record.get("success") is False:
+        return None
+    # Verdicts the pre-screen gave itself (PRESCREEN_ACTION=skip) would only reinforce its own guesses
+    if record.get("model_used") == "prescreen" or (record.get("routing") or {}).get("decision") == "prescreen_skipped":
+        return None
+    label = classify_health(record.get("health_status"))
+    return label if label in PRESCREEN_CLASSES else None
+
+
+def load_store_training_data(store) -> Tuple[List["np.ndarray"], List[str]]:
+    """
+    Features and labels of stored results.
+
+    Uses the features recorded with each result, or extracts them from the
+    result's ``image_path`` (saved by directory scans) while the file exists.
+    """
+    features, labels = [], []
+    for batch in store.iter_batches(success=True):
+        for record in batch:
+            label = training_label(record)
+            if label is None:
+                continue
+            recorded = record.get("prescreen") or {}
+            image_path = record.get("image_path")
+            if (recorded.get("feature_version") == FEATURE_VERSION
+                    and len(recorded.get("features") or ()) == len(FEATURE_NAMES)):
+                features.append(np.asarray(recorded["features"], dtype=np.float32))
+            elif image_path and Path(image_path).exists():
+                features.append(extract_features(prepare_for_features(image_path)))
+            else:
+                continue
+            labels.append(label)
+    return features, labels
+
+
+def load_jsonl_training_data(paths: Iterable[str]) -> Tuple[List["np.ndarray"], List[str]]:
+    """Features and labels from batch-scan JSONL outputs, read from each record's image file."""
+    features, labels = [], []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                label = training_label(record)
+                image_path = record.get("image_path")
+                if label is None or not image_path or not Path(image_path).exists():
+                    continue
+                features.append(extract_features(prepare_for_features(image_path)))
+                labels.append(label)
+    return features, labels
+
+
+class PreScreenModel:
+    """Trained pre-screen classifier with its training metadata."""
+
+    def __init__(self, estimator, metadata: Dict[str, Any]):
+        self.estimator = estimator
+        self.metadata = metadata
+        self.classes = [str(c) for c in estimator.classes_]
+
+    @classmethod
+    def train(cls, features: List["np.ndarray"], labels: List[str]) -> "PreScreenModel":
+        """
+        Fit a standardized logistic regression (balanced class weights).
+
+        Raises:
+            ValueError: If there are fewer than two classes to learn from
+        """
+        if not SKLEARN_AVAILABLE:
+            raise RuntimeError("scikit-learn is required to train the pre-screen model")
+        counts = {label: labels.count(label) for label in sorted(set(labels))}
+        if len(counts) < 2:
+            raise ValueError(f"Need at least two health classes to train, got {counts}")
+
+        X = np.vstack(features)
+        y = np.asarray(labels)
+        estimator = pipeline.make_pipeline(
+            preprocessing.StandardScaler(),
+            linear_model.LogisticRegression(max_iter=1000, class_weight="balanced")
+        )
+        # Cross-validated accuracy, when every class has enough samples
+        folds = min(5, min(counts.values()))
+        cv_accuracy = None
+        if folds >= 2:
+            cv_accuracy = round(float(model_selection.cross_val_score(estimator, X, y, cv=folds).mean()), 4)
+        estimator.fit(X, y)
+
+        return cls(estimator, {
+            "feature_version": FEATURE_VERSION,
+            "trained_at": datetime.now().isoformat(),
+            "samples": len(labels),
+            "class_counts": counts,
+            "cv_accuracy": cv_accuracy,
+        })
+
+    def save(self, path: str):
+        """Write the model (estimator and metadata) with joblib."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump({"estimator": self.estimator, "metadata": self.metadata}, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PreScreenModel":
+        """
+        Load a saved model.
+
+        Raises:
+            ValueError: If it was trained on a different feature version
+        """
+        data = joblib.load(path)
+        version = data["metadata"].get("feature_version")
+        if version != FEATURE_VERSION:
+            raise ValueError(f"Pre-screen model uses feature version {version}, expected {FEATURE_VERSION}")
+        return cls(data["estimator"], data["metadata"])
+
+    def predict_features(self, features: "np.ndarray") -> Dict[str, Any]:
+        """Verdict for one feature vector: the most likely class, its probability and all probabilities."""
+        probabilities = self.estimator.predict_proba(features.reshape(1, -1))[0]
+        best = int(np.argmax(probabilities))
+        return {
+            "health_class": self.classes[best],
+            "confidence": round(float(probabilities[best]), 4),
+            "probabilities": {c: round(float(p), 4) for c, p in zip(self.classes, probabilities)},
+        }
+
+    def predict(self, image: Image.Image) -> Dict[str, Any]:
+        """Verdict for an image, with the time taken."""
+        start = time.perf_counter()
+        verdict = self.predict_features(extract_features(image))
+        verdict["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return verdict
+
+
+def is_confident_healthy(prescreen: Optional[Dict[str, Any]]) -> bool:
+    """Whether a pre-screen verdict is healthy with at least PRESCREEN_HEALTHY_CONFIDENCE."""
+    return bool(
+        prescreen
+        and prescreen.get("health_class") == "healthy"
+        and (prescreen.get("confidence") or 0) >= config.PRESCREEN_HEALTHY_CONFIDENCE
+    )
+
+
+def _load_model(path: str) -> Optional[PreScreenModel]:
+    if not SKLEARN_AVAILABLE:
+        logger.warning("Pre-screen disabled: scikit-learn is not installed")
+        return None
+    if not Path(path).exists():
+        logger.info(f"No pre-screen model at {path}; recording features only")
+        return None
+    try:
+        return PreScreenModel.load(path)
+    except Exception as e:
+        logger.warning(f"Failed to load pre-screen model {path}: {e}")
+        return None
+
+
+_model: Optional[PreScreenModel] = None
+_model_checked = False
+_model_lock = threading.Lock()
+
+
+def get_prescreen_model() -> Optional[PreScreenModel]:
+    """Load the pre-screen model once; None when disabled, not trained yet or unusable."""
+    global _model, _model_checked
+    with _model_lock:
+        if not _model_checked:
+            _model_checked = True
+            if config.PRESCREEN_ENABLED:
+                _model = _load_model(config.PRESCREEN_MODEL_PATH)
+        return _model
+
+
+def reset_prescreen_model():
+    """Forget the loaded model so the next use reloads it (e.g. after retraining)."""
+    global _model, _model_checked
+    with _model_lock:
+        _model, _model_checked = None, False
+
+
+def prescreen_features(features: Optional["np.ndarray"]) -> Optional[Dict[str, Any]]:
+    """
+    Pre-screen record for an analysis: the features, plus a verdict if a model is loaded.
+
+    Returns None when the pre-screen is disabled or there are no features.
+    """
+    if not config.PRESCREEN_ENABLED or features is None:
+        return None
+    record: Dict[str, Any] = {
+        "feature_version": FEATURE_VERSION,
+        "features": [round(float(value), 5) for value in features],
+    }
+    model = get_prescreen_model()
+    if model is not None:
+        start = time.perf_counter()
+        record.update(model.predict_features(np.asarray(features, dtype=np.float32)))
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+
+def train_prescreen_model(store=None,
+                          jsonl_paths: Iterable[str] = (),
+                          output_path: Optional[str] = None) -> PreScreenModel:
+    """Train on the result store (and batch-scan outputs) and save to PRESCREEN_MODEL_PATH."""
+    features, labels = [], []
+    if store is not None:
+        store_features, store_labels = load_store_training_data(store)
+        features += store_features
+        labels += store_labels
+    jsonl_features, jsonl_labels = load_jsonl_training_data(jsonl_paths)
+    features += jsonl_features
+    labels += jsonl_labels
+
+    model = PreScreenModel.train(features, labels)
+    model.save(output_path or config.PRESCREEN_MODEL_PATH)
+    reset_prescreen_model()
+    return model
+
+
+def prescreen_action(prescreen: Optional[Dict[str, Any]], analysis_type: str) -> Optional[str]:
+    """
+    How routing should use a pre-screen verdict (PRESCREEN_ACTION).
+
+    Only confident healthy verdicts change anything: "skip" answers a
+    disease_detection analysis from the pre-screen alone; everything else is
+    "downgrade"d to the first-pass model.
+    """
+    if config.PRESCREEN_ACTION not in ("skip", "downgrade") or not is_confident_healthy(prescreen):
+        return None
+    if config.PRESCREEN_ACTION == "skip" and analysis_type == "disease_detection":
+        return "skip"
+    return "downgrade"
@@ -0,0 +1,315 @@
+"""
+Client-side rate limiting and retries for OpenAI calls.
+
+``RequestScheduler`` keeps requests under the account's requests-per-minute
+and tokens-per-minute limits with two token buckets, so bursts queue here
+instead of turning into 429 storms. Waiting requests are released in
+priority order (interactive before batch). Transient failures (429, 5xx,
+connection errors) are retried with jittered exponential backoff, and a
+``Retry-After`` from the server pauses every request, not just the one that
+got it. With SHARED_STATE_PATH set, the buckets and the pause live in the
+shared state so the limits hold for all API workers together rather than
+for each of them.
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional
+
+try:
+    from ..utils.config import config
+    from ..utils.lazy import lazy_import
+    from ..utils.metrics import UPSTREAM_RETRIES, observe_stage
+    from .shared_state import SharedState, get_shared_state
+except ImportError:
+    from src.utils.config import config
+    from src.utils.lazy import lazy_import
+    from src.utils.metrics import UPSTREAM_RETRIES, observe_stage
+    from src.core.shared_state import SharedState, get_shared_state
+
+openai = lazy_import("openai")
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+# Shared state entry holding the wall-clock time until which all workers pause
+PAUSE_KEY = "rate_limit:paused_until"
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (requests larger than the bucket wait for a full one)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Return (positive) or charge (negative) tokens after the fact."""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class SharedTokenBucket:
+    """``TokenBucket`` kept in shared state, so every process draws from the same tokens."""
+
+    def __init__(self, state: SharedState, name: str, per_minute: float, capacity: Optional[float] = None):
+        self.state = state
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+
+    @property
+    def tokens(self) -> float:
+        return self.state.bucket_level(self.name, self.rate, self.capacity)
+
+    def _refill(self, now: float):
+        # The shared level is computed from wall-clock time when read
+        pass
+
+    def wait_time(self, amount: float, now: float) -> float:
+        return self.state.bucket_wait(self.name, amount, self.rate, self.capacity)
+
+    def take(self, amount: float):
+        # Another process may take between wait_time() and here; that only leaves a short debt
+        self.state.bucket_add(self.name, -min(amount, self.capacity), self.rate, self.capacity)
+
+    def adjust(self, amount: float):
+        self.state.bucket_add(self.name, amount, self.rate, self.capacity)
+
+
+def parse_retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds to wait from ``retry-after-ms`` or ``retry-after`` (seconds or HTTP date) headers."""
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return max(0.0, float(value) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_status(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an OpenAI error is transient (rate limit, server error, connection problem)."""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    status = _error_status(error)
+    return status is not None and (status in RETRYABLE_STATUS or status >= 500)
+
+
+class RequestScheduler:
+    """Rate limits, priority ordering and retries for upstream model calls."""
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: Optional[int] = None,
+                 backoff_base: Optional[float] = None,
+                 backoff_max: Optional[float] = None,
+                 shared_state: Optional[SharedState] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            requests_per_minute: Request limit, 0 for none (defaults to OPENAI_RPM_LIMIT)
+            tokens_per_minute: Estimated token limit, 0 for none (defaults to OPENAI_TPM_LIMIT)
+            max_retries: Retries after the first attempt (defaults to OPENAI_MAX_RETRIES)
+            backoff_base: First backoff ceiling in seconds (defaults to OPENAI_BACKOFF_BASE)
+            backoff_max: Largest backoff, and the longest Retry-After honoured (defaults to OPENAI_BACKOFF_MAX)
+            shared_state: State shared with other processes for the buckets and pauses (per-process if None)
+        """
+        rpm = config.OPENAI_RPM_LIMIT if requests_per_minute is None else requests_per_minute
+        tpm = config.OPENAI_TPM_LIMIT if tokens_per_minute is None else tokens_per_minute
+        self.shared_state = shared_state
+        if shared_state is not None:
+            self.requests = SharedTokenBucket(shared_state, "requests", rpm) if rpm > 0 else None
+            self.tokens = SharedTokenBucket(shared_state, "tokens", tpm) if tpm > 0 else None
+        else:
+            self.requests = TokenBucket(rpm) if rpm > 0 else None
+            self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.max_retries = config.OPENAI_MAX_RETRIES if max_retries is None else max_retries
+        self.backoff_base = backoff_base or config.OPENAI_BACKOFF_BASE
+        self.backoff_max = backoff_max or config.OPENAI_BACKOFF_MAX
+
+        self._cond = threading.Condition()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+
+    def _pause_remaining(self, now: float) -> float:
+        remaining = self._paused_until - now
+        if self.shared_state is not None:
+            paused_until = self.shared_state.get(PAUSE_KEY)
+            if paused_until is not None:
+                remaining = max(remaining, paused_until - time.time())
+        return remaining
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = self._pause_remaining(now)
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def acquire(self, tokens: int = 0, priority: int = PRIORITY_INTERACTIVE) -> float:
+        """
+        Block until a request may be sent.
+
+        Only the highest-priority waiter (FIFO within a priority) may take
+        from the buckets, so batch work never overtakes a queued interactive
+        request.
+
+        Returns:
+            Seconds spent waiting
+        """
+        start = time.monotonic()
+        entry = (priority, next(self._sequence))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiters[0] == entry:
+                        timeout = self._wait_time(tokens, time.monotonic())
+                        if timeout <= 0:
+                            if self.requests:
+                                self.requests.take(1)
+                            if self.tokens and tokens:
+                                self.tokens.take(tokens)
+                            break
+                    self._cond.wait(timeout)
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+        return time.monotonic() - start
+
+    def settle(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the real usage of a request is known."""
+        if not self.tokens or actual_tokens is None:
+            return
+        with self._cond:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Hold all requests for ``seconds`` (e.g. after a 429 with Retry-After)."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            if self.shared_state is not None:
+                paused_until = max(self.shared_state.get(PAUSE_KEY) or 0.0, time.time() + seconds)
+                self.shared_state.set(PAUSE_KEY, paused_until, ttl=paused_until - time.time())
+            self._cond.notify_all()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for a retry attempt (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying ``error``, or None if it shouldn't be retried."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        response = getattr(error, "response", None)
+        retry_after = parse_retry_after(getattr(response, "headers", None))
+        if retry_after is None:
+            return self.backoff(attempt)
+        if retry_after > self.backoff_max:
+            # Longer than a caller should be kept waiting
+            return None
+        return retry_after
+
+    def call(self,
+             func: Callable[[], Any],
+             estimated_tokens: int = 0,
+             priority: int = PRIORITY_INTERACTIVE,
+             analysis_type: Optional[str] = None) -> Any:
+        """Run ``func`` within the rate limits, retrying transient failures."""
+        attempt = 0
+        while True:
+            observe_stage("rate_limit_wait", self.acquire(estimated_tokens, priority), analysis_type)
+            try:
+                return func()
+            except Exception as e:
+                delay = self.retry_delay(e, attempt)
+                if delay is None:
+                    raise
+                # A failed request wasn't charged upstream
+                self.settle(estimated_tokens, 0)
+                status = _error_status(e)
+                UPSTREAM_RETRIES.labels(reason=str(status) if status else "connection").inc()
+                logger.warning(
+                    f"OpenAI request failed ({status or type(e).__name__}), "
+                    f"retry {attempt + 1}/{self.max_retries} in {delay:.2f}s"
+                )
+                attempt += 1
+                if status == 429:
+                    self.pause(delay)
+                else:
+                    time.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current limits, remaining budget and queue length."""
+        with self._cond:
+            now = time.monotonic()
+            for bucket in (self.requests, self.tokens):
+                if bucket:
+                    bucket._refill(now)
+            return {
+                "requests_per_minute": self.requests.rate * 60 if self.requests else None,
+                "tokens_per_minute": self.tokens.rate * 60 if self.tokens else None,
+                "available_requests": round(self.requests.tokens, 2) if self.requests else None,
+                "available_tokens": round(self.tokens.tokens) if self.tokens else None,
+                "waiting": len(self._waiters),
+                "paused_for_seconds": round(max(0.0, self._pause_remaining(now)), 3),
+                "max_retries": self.max_retries,
+                "shared": self.shared_state is not None,
+            }
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """Get the process-wide scheduler (rate limits are per account, not per client or worker)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(shared_state=get_shared_state())
+        return _scheduler
@@ -0,0 +1,631 @@
+"""
+Durable SQLite-backed store for analysis results.
+
+Results are appended to a single WAL-mode SQLite database with batched
+commits, replacing the one-JSON-file-per-result layout under data/results.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+try:
+    from .health_labels import classify_health, extract_disease_name
+    from ..utils.config import config
+except ImportError:
+    from src.core.health_labels import classify_health, extract_disease_name
+    from src.utils.config import config
+
+logger = logging.getLogger(__name__)
+
+TimeBound = Union[datetime, str, float, None]
+
+
+def api_key_hash(api_key: str) -> str:
+    """Stable hash an API key's usage is stored under, so the database never holds the key."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:KEY_HASH_LENGTH]
+
+TABLES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_results (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    analysis_type TEXT,
+    plant_type TEXT,
+    health_status TEXT,
+    success INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    health_class TEXT,
+    disease TEXT,
+    region TEXT
+);
+CREATE TABLE IF NOT EXISTS result_tags (
+    result_id TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (result_id, tag)
+);
+CREATE TABLE IF NOT EXISTS result_aggregates (
+    day TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    plant_type TEXT NOT NULL,
+    health_class TEXT NOT NULL,
+    disease TEXT NOT NULL,
+    region TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, analysis_type, plant_type, health_class, disease, region, success)
+);
+CREATE TABLE IF NOT EXISTS tag_aggregates (
+    day TEXT NOT NULL,
+    tag TEXT NOT NULL,
+    health_class TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (day, tag, health_class, success)
+);
+CREATE TABLE IF NOT EXISTS usage_aggregates (
+    day TEXT NOT NULL,
+    key_hash TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    model TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    image_tokens INTEGER NOT NULL,
+    cost_usd REAL NOT NULL,
+    PRIMARY KEY (day, key_hash, analysis_type, model)
+);
+"""
+
+# Hex digits of an API key's SHA-256 kept in usage_aggregates instead of the key
+KEY_HASH_LENGTH = 16
+
+# Token counts kept per day, key, analysis type and model
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens", "image_tokens")
+
+# Columns added after the first release of the store; backfilled on open
+ADDED_COLUMNS = {"health_class": "TEXT", "disease": "TEXT", "region": "TEXT"}
+
+# Aggregates are maintained by triggers so every insert path keeps them in
+# step, and ignored duplicate inserts (re-run migrations) are never counted.
+INDEX_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_results_created_at ON analysis_results(created_at);
+CREATE INDEX IF NOT EXISTS idx_results_plant_type ON analysis_results(plant_type, created_at);
+CREATE INDEX IF NOT EXISTS idx_results_health_status ON analysis_results(health_status, created_at);
+CREATE INDEX IF NOT EXISTS idx_results_analysis_type ON analysis_results(analysis_type, created_at);
+CREATE TRIGGER IF NOT EXISTS trg_results_aggregate AFTER INSERT ON analysis_results
+BEGIN
+    INSERT INTO result_aggregates
+        (day, analysis_type, plant_type, health_class, disease, region, success, count)
+    VALUES (
+        date(NEW.created_at, 'unixepoch', 'localtime'),
+        COALESCE(NEW.analysis_type, ''),
+        COALESCE(NEW.plant_type, ''),
+        COALESCE(NEW.health_class, 'unknown'),
+        COALESCE(NEW.disease, ''),
+        COALESCE(NEW.region, ''),
+        NEW.success,
+        1
+    )
+    ON CONFLICT (day, analysis_type, plant_type, health_class, disease, region, success)
+    DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_tags_aggregate AFTER INSERT ON result_tags
+BEGIN
+    INSERT INTO tag_aggregates (day, tag, health_class, success, count)
+    SELECT date(created_at, 'unixepoch', 'localtime'), NEW.tag, COALESCE(health_class, 'unknown'), success, 1
+    FROM analysis_results WHERE id = NEW.result_id
+    ON CONFLICT (day, tag, health_class, success) DO UPDATE SET count = count + 1;
+END;
+"""
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """Normalize an indexed field to text (structured values are JSON-encoded)."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _result_tags(result: Dict[str, Any]) -> List[str]:
+    """Get the tags of a result as a list (comma-separated strings are split)."""
+    request_metadata = result.get("request_metadata") or {}
+    tags = result.get("tags") or request_metadata.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    return sorted({str(tag).strip() for tag in tags if str(tag).strip()})
+
+
+def _to_day(value: TimeBound) -> Optional[str]:
+    """Convert a time bound to a local YYYY-MM-DD day string."""
+    timestamp = _to_timestamp(value)
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d") if timestamp is not None else None
+
+
+def _to_timestamp(value: TimeBound) -> Optional[float]:
+    """Convert a datetime, ISO string or epoch seconds to epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+class ResultStore:
+    """Append-only analysis result store with batched commits."""
+
+    def __init__(self,
+                 db_path: Optional[str] = None,
+                 batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
+        """
+        Open (or create) the result store.
+
+        Args:
+            db_path: Path to the SQLite database file
+            batch_size: Number of buffered results that triggers a commit
+            flush_interval: Seconds between background commits of buffered results
+        """
+        self.db_path = str(db_path or config.RESULT_STORE_PATH)
+        self.batch_size = batch_size or config.RESULT_STORE_BATCH_SIZE
+        self.flush_interval = flush_interval if flush_interval is not None else config.RESULT_STORE_FLUSH_INTERVAL
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._pending: List[tuple] = []
+        self._closed = False
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(TABLES_SCHEMA)
+        self._migrate_schema()
+        self._conn.executescript(INDEX_SCHEMA)
+        self._conn.commit()
+
+        self._stop_event = threading.Event()
+        self._flusher = None
+        if self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="result-store-flush", daemon=True)
+            self._flusher.start()
+
+    def _migrate_schema(self):
+        """Add analytics columns and aggregate keys to stores created before they existed."""
+        usage_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(usage_aggregates)")}
+        if "api_key" in usage_columns:
+            # Usage stored under plain API keys; replaced by their hashes
+            self._conn.create_function("api_key_hash", 1, api_key_hash, deterministic=True)
+            with self._conn:
+                self._conn.execute("ALTER TABLE usage_aggregates RENAME COLUMN api_key TO key_hash")
+                self._conn.execute("UPDATE usage_aggregates SET key_hash = api_key_hash(key_hash)")
+
+        tag_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tag_aggregates)")}
+        if "success" not in tag_columns:
+            # Tag aggregates without a success key; recreated and rebuilt below
+            self._conn.executescript(
+                "DROP TRIGGER IF EXISTS trg_tags_aggregate; DROP TABLE tag_aggregates;" + TABLES_SCHEMA
+            )
+
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(analysis_results)")}
+        missing = {name: kind for name, kind in ADDED_COLUMNS.items() if name not in existing}
+        if not missing:
+            if "success" not in tag_columns:
+                self.rebuild_aggregates()
+            return
+
+        with self._conn:
+            for name, kind in missing.items():
+                self._conn.execute(f"ALTER TABLE analysis_results ADD COLUMN {name} {kind}")
+
+            rows = self._conn.execute("SELECT id, payload FROM analysis_results").fetchall()
+            for record_id, payload in rows:
+                result = json.loads(payload)
+                labels = self._labels(result)
+                self._conn.execute(
+                    "UPDATE analysis_results SET health_class = ?, disease = ?, region = ? WHERE id = ?",
+                    labels + (record_id,)
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO result_tags (result_id, tag) VALUES (?, ?)",
+                    [(record_id, tag) for tag in _result_tags(result)]
+                )
+        self.rebuild_aggregates()
+
+    def rebuild_aggregates(self):
+        """Recompute the aggregate tables from stored results."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM result_aggregates")
+            self._conn.execute("DELETE FROM tag_aggregates")
+            self._conn.execute(
+                "INSERT INTO result_aggregates "
+                "(day, analysis_type, plant_type, health_class, disease, region, success, count) "
+                "SELECT date(created_at, 'unixepoch', 'localtime'), COALESCE(analysis_type, ''), "
+                "COALESCE(plant_type, ''), COALESCE(health_class, 'unknown'), COALESCE(disease, ''), "
+                "COALESCE(region, ''), success, COUNT(*) "
+                "FROM analysis_results GROUP BY 1, 2, 3, 4, 5, 6, 7"
+            )
+            self._conn.execute(
+                "INSERT INTO tag_aggregates (day, tag, health_class, success, count) "
+                "SELECT date(r.created_at, 'unixepoch', 'localtime'), t.tag, "
+                "COALESCE(r.health_class, 'unknown'), r.success, COUNT(*) "
+                "FROM result_tags t JOIN analysis_results r ON r.id = t.result_id GROUP BY 1, 2, 3, 4"
+            )
+
+    def _flush_loop(self):
+        """Commit buffered results periodically until the store is closed."""
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Result store background flush failed: {e}")
+
+    @staticmethod
+    def _labels(result: Dict[str, Any]) -> tuple:
+        """Derive (health_class, disease, region) for aggregation."""
+        request_metadata = result.get("request_metadata") or {}
+        health_status = _as_text(result.get("health_status"))
+        health_class = classify_health(health_status) if result.get("success", False) else "unknown"
+        return (
+            health_class,
+            extract_disease_name(result) if health_class == "diseased" else None,
+            _as_text(result.get("region") or request_metadata.get("region")),
+        )
+
+    def _make_row(self, result: Dict[str, Any], record_id: Optional[str], created_at: Optional[float]) -> tuple:
+        """Build (row, tags) for a result."""
+        record_id = record_id or uuid.uuid4().hex
+        created_at = created_at if created_at is not None else datetime.now().timestamp()
+        row = (
+            record_id,
+            created_at,
+            _as_text(result.get("analysis_type")),
+            _as_text(result.get("plant_type")),
+            _as_text(result.get("health_status")),
+            1 if result.get("success", False) else 0,
+            json.dumps(result, ensure_ascii=False, separators=(",", ":"), default=str),
+        ) + self._labels(result)
+        return row, _result_tags(result)
+
+    def _write_rows(self, rows: List[tuple]):
+        """Insert (row, tags) pairs in a single transaction. Caller must hold the lock."""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO analysis_results "
+                "(id, created_at, analysis_type, plant_type, health_status, success, payload, "
+                "health_class, disease, region) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row, _ in rows]
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO result_tags (result_id, tag) VALUES (?, ?)",
+                [(row[0], tag) for row, tags in rows for tag in tags]
+            )
+
+    def save(self,
+             result: Dict[str, Any],
+             record_id: Optional[str] = None,
+             created_at: Optional[float] = None) -> str:
+        """
+        Buffer a result for writing and return its record ID.
+
+        The result is committed once ``batch_size`` results are buffered, on the
+        next background flush, or on an explicit ``flush()``.
+        """
+        row, tags = self._make_row(result, record_id, created_at)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Result store is closed")
+            self._pending.append((row, tags))
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+        return row[0]
+
+    def save_many(self, results: List[Dict[str, Any]]) -> List[str]:
+        """Write several results in one transaction and return their record IDs."""
+        rows = [self._make_row(result, None, None) for result in results]
+        with self._lock:
+            self._pending.extend(rows)
+            self._flush_locked()
+        return [row[0] for row, _ in rows]
+
+    def flush(self):
+        """Commit all buffered results."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        self._write_rows(rows)
+
+    def _decode(self, row: tuple) -> Dict[str, Any]:
+        record_id, created_at, payload = row
+        record = json.loads(payload)
+        record["id"] = record_id
+        record.setdefault("saved_at", datetime.fromtimestamp(created_at).isoformat())
+        return record
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Get a stored result by record ID."""
+        with self._lock:
+            self._flush_locked()
+            row = self._conn.execute(
+                "SELECT id, created_at, payload FROM analysis_results WHERE id = ?",
+                (record_id,)
+            ).fetchone()
+        return self._decode(row) if row else None
+
+    def _where(self,
+               plant_type: Optional[str] = None,
+               health_status: Optional[str] = None,
+               analysis_type: Optional[str] = None,
+               start: TimeBound = None,
+               end: TimeBound = None,
+               success: Optional[bool] = None) -> tuple:
+        clauses, params = [], []
+        if plant_type is not None:
+            clauses.append("plant_type = ?")
+            params.append(plant_type)
+        if health_status is not None:
+            clauses.append("health_status = ?")
+            params.append(health_status)
+        if analysis_type is not None:
+            clauses.append("analysis_type = ?")
+            params.append(analysis_type)
+        if start is not None:
+            clauses.append("created_at >= ?")
+            params.append(_to_timestamp(start))
+        if end is not None:
+            clauses.append("created_at < ?")
+            params.append(_to_timestamp(end))
+        if success is not None:
+            clauses.append("success = ?")
+            params.append(1 if success else 0)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query(self,
+              plant_type: Optional[str] = None,
+              health_status: Optional[str] = None,
+              analysis_type: Optional[str] = None,
+              start: TimeBound = None,
+              end: TimeBound = None,
+              success: Optional[bool] = None,
+              limit: int = 100,
+              offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Look up stored results, newest first.
+
+        Args:
+            plant_type: Exact plant type to match
+            health_status: Exact health status to match
+            analysis_type: Analysis type to match
+            start: Inclusive lower bound on save time
+            end: Exclusive upper bound on save time
+            success: Only successful (True) or failed (False) analyses
+            limit: Maximum number of results
+            offset: Number of results to skip
+
+        Returns:
+            List of stored results with their ``id``
+        """
+        where, params = self._where(plant_type, health_status, analysis_type, start, end, success)
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                f"SELECT id, created_at, payload FROM analysis_results{where} "
+                "ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def count(self, **filters) -> int:
+        """Count stored results matching the same filters as ``query``."""
+        where, params = self._where(**filters)
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(f"SELECT COUNT(*) FROM analysis_results{where}", params).fetchone()[0]
+
+    def iter_batches(self, batch_size: int = 500, **filters) -> Iterator[List[Dict[str, Any]]]:
+        """Iterate stored results oldest first in batches of bounded size."""
+        where, params = self._where(**filters)
+        last_key = (float("-inf"), "")
+        self.flush()
+        while True:
+            keyset = "(created_at, id) > (?, ?)"
+            clause = f"{where} AND {keyset}" if where else f" WHERE {keyset}"
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT id, created_at, payload FROM analysis_results{clause} "
+                    "ORDER BY created_at, id LIMIT ?",
+                    params + [last_key[0], last_key[1], batch_size]
+                ).fetchall()
+            if not rows:
+                return
+            last_key = (rows[-1][1], rows[-1][0])
+            yield [self._decode(row) for row in rows]
+
+    def read_aggregates(self, start: TimeBound = None, end: TimeBound = None) -> List[Dict[str, Any]]:
+        """
+        Read the incrementally maintained daily aggregates.
+
+        Args:
+            start: Inclusive lower bound (day granularity)
+            end: Exclusive upper bound (day granularity)
+
+        Returns:
+            Aggregate rows keyed by day, analysis type, plant type, health class,
+            disease, region and success
+        """
+        return self._read_day_table("result_aggregates", start, end)
+
+    def read_tag_aggregates(self, start: TimeBound = None, end: TimeBound = None) -> List[Dict[str, Any]]:
+        """Read daily result counts per tag and health class."""
+        return self._read_day_table("tag_aggregates", start, end)
+
+    def record_usage(self,
+                     api_key: str,
+                     analysis_type: str,
+                     model: str,
+                     usage: Dict[str, Any],
+                     at: TimeBound = None):
+        """
+        Add one model call's token usage and cost to the daily usage of an API key.
+
+        Usage is stored under the key's hash (api_key_hash). Unlike results,
+        it is committed immediately so budget checks see it.
+        """
+        day = _to_day(at if at is not None else datetime.now())
+        values = [int(usage.get(field) or 0) for field in USAGE_FIELDS]
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Result store is closed")
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO usage_aggregates "
+                    "(day, key_hash, analysis_type, model, calls, prompt_tokens, completion_tokens, "
+                    "cached_tokens, image_tokens, cost_usd) VALUES (?, ?, ?, ?, 1, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (day, key_hash, analysis_type, model) DO UPDATE SET "
+                    "calls = calls + 1, prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                    "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                    "cached_tokens = cached_tokens + excluded.cached_tokens, "
+                    "image_tokens = image_tokens + excluded.image_tokens, "
+                    "cost_usd = cost_usd + excluded.cost_usd",
+                    [day, api_key_hash(api_key), analysis_type or "", model or ""] + values + [float(usage.get("cost_usd") or 0.0)]
+                )
+
+    def usage_totals(self, api_key: str, day: TimeBound = None) -> Dict[str, Any]:
+        """Calls, tokens and cost of an API key on one day (default: today)."""
+        day = _to_day(day if day is not None else datetime.now())
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COALESCE(SUM(calls), 0), COALESCE(SUM(prompt_tokens), 0), "
+                "COALESCE(SUM(completion_tokens), 0), COALESCE(SUM(cached_tokens), 0), "
+                "COALESCE(SUM(image_tokens), 0), COALESCE(SUM(cost_usd), 0) "
+                "FROM usage_aggregates WHERE day = ? AND key_hash = ?",
+                (day, api_key_hash(api_key))
+            ).fetchone()
+        totals = dict(zip(("calls",) + USAGE_FIELDS, row[:5]))
+        totals["total_tokens"] = totals["prompt_tokens"] + totals["completion_tokens"]
+        totals["cost_usd"] = round(row[5], 6)
+        return totals
+
+    def read_usage_aggregates(self, start: TimeBound = None, end: TimeBound = None) -> List[Dict[str, Any]]:
+        """Read daily calls, tokens and cost per API key hash, analysis type and model."""
+        return self._read_day_table("usage_aggregates", start, end)
+
+    def _read_day_table(self, table: str, start: TimeBound, end: TimeBound) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("day >= ?")
+            params.append(_to_day(start))
+        if end is not None:
+            clauses.append("day < ?")
+            params.append(_to_day(end))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self._flush_locked()
+            cursor = self._conn.execute(f"SELECT * FROM {table}{where}", params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def close(self):
+        """Flush buffered results and close the database."""
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._closed = True
+            self._stop_event.set()
+            self._conn.close()
+
+
+# Global store instances, one per database path
+_stores: Dict[str, ResultStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_result_store(db_path: Optional[str] = None) -> ResultStore:
+    """Get the shared result store for a database path, opening it if needed."""
+    key = str(Path(db_path or config.RESULT_STORE_PATH).resolve())
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = ResultStore(db_path or config.RESULT_STORE_PATH)
+            _stores[key] = store
+        return store
+
+
+def close_result_stores():
+    """Flush and close every open result store."""
+    with _stores_lock:
+        for store in _stores.values():
+            try:
+                store.close()
+            except Exception as e:
+                logger.error(f"Failed to close result store {store.db_path}: {e}")
+        _stores.clear()
+
+
+atexit.register(close_result_stores)
+
+
+def migrate_json_results(source_dir: str,
+                         store: Optional[ResultStore] = None,
+                         pattern: str = "*.json",
+                         delete_source: bool = False) -> Dict[str, int]:
+    """
+    Import legacy one-file-per-result JSON files into the result store.
+
+    Record IDs are derived from the file name, so running the migration
+    again does not create duplicates.
+
+    Args:
+        source_dir: Directory containing legacy result files
+        store: Target store (defaults to the configured store)
+        pattern: Glob pattern for result files
+        delete_source: Delete each file after it has been committed
+
+    Returns:
+        Counts of migrated, failed and total files
+    """
+    store = store or get_result_store()
+    files = sorted(Path(source_dir).glob(pattern))
+    stats = {"total": len(files), "migrated": 0, "failed": 0}
+    migrated_files = []
+
+    for filepath in files:
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                result = json.load(f)
+            if not isinstance(result, dict):
+                raise ValueError("result file does not contain a JSON object")
+
+            saved_at = result.get("saved_at")
+            created_at = _to_timestamp(saved_at) if saved_at else filepath.stat().st_mtime
+            record_id = uuid.uuid5(uuid.NAMESPACE_URL, filepath.name).hex
+
+            store.save(result, record_id=record_id, created_at=created_at)
+            migrated_files.append(filepath)
+            stats["migrated"] += 1
+        except Exception as e:
+            logger.error(f"Failed to migrate {filepath}: {e}")
+            stats["failed"] += 1
+
+    store.flush()
+
+    if delete_source:
+        for filepath in migrated_files:
+            filepath.unlink()
+
+    return stats
@@ -0,0 +1,215 @@
+"""
+State shared by the API worker processes of one host.
+
+Each worker process otherwise keeps its own rate limit buckets, health probe
+results and in-flight analyses, so N workers send N times the configured
+request rate, probe upstreams N times as often and analyze the same image
+once per worker. ``SharedState`` keeps that state in a small WAL-mode SQLite
+database (SHARED_STATE_PATH) that every worker opens: expiring JSON entries
+for cached results and leases, and token buckets updated in one transaction.
+Without SHARED_STATE_PATH every process keeps its state in memory as before.
+"""
+import contextlib
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+
+try:
+    from ..utils.config import config
+    from ..utils.metrics import record_cache
+except ImportError:
+    from src.utils.config import config
+    from src.utils.metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+# How long a worker may hold an analysis before others stop waiting for it
+ANALYSIS_LEASE_SECONDS = 180.0
+# Interval at which workers waiting for another worker's analysis check for its result
+ANALYSIS_POLL_SECONDS = 0.1
+# Shortest time a result is kept, so workers already waiting on the analysis can pick it up
+RESULT_GRACE_SECONDS = 5.0
+PURGE_INTERVAL_SECONDS = 60.0
+
+
+def shared_key(key: Hashable) -> str:
+    """Stable text key for a hashable key such as an analysis key tuple."""
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+class SharedState:
+    """Expiring entries and token buckets in a SQLite file shared across processes."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (or create) the shared state database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = str(db_path)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+        # Autocommit; multi-statement updates take the write lock with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run the enclosed statements atomically across processes."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Value of an entry, or None if it is missing or expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Store a JSON-serializable value for ``ttl`` seconds."""
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, payload, now + ttl)
+            )
+            # Expired entries are only skipped by reads; drop them now and then
+            if now - self._purged_at > PURGE_INTERVAL_SECONDS:
+                self._purged_at = now
+                self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """Take a lease on ``key`` unless another process holds an unexpired one."""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and row[0] > time.time():
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, 'null', ?)",
+                (key, time.time() + ttl)
+            )
+            return True
+
+    def _bucket_level(self, conn, name: str, rate: float, capacity: float, now: float) -> float:
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return capacity
+        return min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+
+    def bucket_wait(self, name: str, amount: float, rate: float, capacity: float) -> float:
+        """Seconds until ``amount`` tokens are available in a bucket refilled at ``rate`` per second."""
+        with self._lock:
+            tokens = self._bucket_level(self._conn, name, rate, capacity, time.time())
+        amount = min(amount, capacity)
+        return 0.0 if tokens >= amount else (amount - tokens) / rate
+
+    def bucket_add(self, name: str, amount: float, rate: float, capacity: float) -> float:
+        """Add (positive) or take (negative) tokens; returns the new level."""
+        now = time.time()
+        with self._transaction() as conn:
+            tokens = min(capacity, self._bucket_level(conn, name, rate, capacity, now) + amount)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)", (name, tokens, now)
+            )
+        return tokens
+
+    def bucket_level(self, name: str, rate: float, capacity: float) -> float:
+        """Tokens currently in a bucket."""
+        with self._lock:
+            return self._bucket_level(self._conn, name, rate, capacity, time.time())
+
+    def coalesce(self, key: str, func: Callable[[], Dict[str, Any]], ttl: float) -> Tuple[Dict[str, Any], bool]:
+        """
+        Run ``func`` once per ``key`` across processes and share its successful result for ``ttl`` seconds.
+
+        With a ``ttl`` of 0 only the calls waiting at the time get the result.
+
+        While another worker runs the same key, this waits for its result
+        instead of calling ``func`` again; if that worker fails or disappears
+        (its lease expires), this one runs ``func`` itself.
+
+        Returns:
+            The result, and whether it came from another call
+        """
+        result_key, lease_key = f"result:{key}", f"running:{key}"
+        waited = False
+        while True:
+            cached = self.get(result_key)
+            # Past its ttl a result is only for calls that were waiting for it
+            if cached is not None and (waited or cached["fresh_until"] > time.time()):
+                record_cache("shared_result", hit=True)
+                return cached["result"], True
+            if self.claim(lease_key, ANALYSIS_LEASE_SECONDS):
+                break
+            waited = True
+            time.sleep(ANALYSIS_POLL_SECONDS)
+
+        record_cache("shared_result", hit=False)
+        try:
+            result = func()
+            if result.get("success"):
+                entry = {"result": result, "fresh_until": time.time() + ttl}
+                self.set(result_key, entry, max(ttl, RESULT_GRACE_SECONDS))
+            return result, False
+        finally:
+            self.delete(lease_key)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Shared state instances, one per database path
+_states: Dict[str, SharedState] = {}
+_states_lock = threading.Lock()
+
+
+def get_shared_state(db_path: Optional[str] = None) -> Optional[SharedState]:
+    """Get the shared state for a database path (defaults to SHARED_STATE_PATH), or None if sharing is off."""
+    db_path = db_path or config.SHARED_STATE_PATH
+    if not db_path:
+        return None
+    key = str(Path(db_path).resolve())
+    with _states_lock:
+        state = _states.get(key)
+        if state is None:
+            state = SharedState(db_path)
+            _states[key] = state
+        return state
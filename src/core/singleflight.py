@@ -0,0 +1,62 @@
+"""
+In-flight deduplication of identical calls (single-flight).
+
+When several threads ask for the same key at once, only the first runs the
+function; the others wait for it and receive the same result (or
+exception). Nothing is kept once the call finishes, so this only covers
+the window while a call is in flight; it's not a cache.
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    """One in-flight call and its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run ``func`` unless a call with ``key`` is already in flight.
+
+        Returns:
+            The result, and whether it was shared from another caller's call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """Number of distinct calls currently running."""
+        with self._lock:
+            return len(self._calls)
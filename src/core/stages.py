@@ -0,0 +1,378 @@
+"""
+Two-stage analysis execution: CPU-bound preprocessing and I/O-bound model calls.
+
+Preprocessing (decode, resize, enhance, background removal, encode) runs on
+a process pool so it isn't serialized by the GIL. Only the encoded image
+bytes cross back to the parent, where the model call runs on a thread pool.
+Each stage has its own concurrency limit and a bounded number of pending
+tasks. Submitting to a full stage waits, so a slow stage holds back the
+stages that feed it.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from PIL import Image
+
+try:
+    from .image_processor import ImageProcessor, QualityCheckError
+    from .openai_client import OpenAIClient
+    from .plant_analyzer import PlantAnalyzer, PlantAnalysisResult, image_rejection
+    from .prescreen import extract_features
+    from .rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+    from ..utils.config import Config, config, current_settings, use_settings
+    from ..utils.metrics import QUEUE_DEPTH, collect_stage_timings, record_stage_timings, track_stage
+    from ..utils.tracing import bind_context, set_attributes, span
+except ImportError:
+    from src.core.image_processor import ImageProcessor, QualityCheckError
+    from src.core.openai_client import OpenAIClient
+    from src.core.plant_analyzer import PlantAnalyzer, PlantAnalysisResult, image_rejection
+    from src.core.prescreen import extract_features
+    from src.core.rate_limiter import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+    from src.utils.config import Config, config, current_settings, use_settings
+    from src.utils.metrics import QUEUE_DEPTH, collect_stage_timings, record_stage_timings, track_stage
+    from src.utils.tracing import bind_context, set_attributes, span
+
+# Per-process ImageProcessor, created on first use in each worker
+_worker_processor: Optional[ImageProcessor] = None
+
+
+def preprocess_image_file(image_path: str, enhance: bool, remove_bg: bool,
+                          settings: Optional[Config] = None) -> Dict[str, Any]:
+    """
+    Preprocess one image in a worker process.
+
+    Returns the encoded image bytes rather than a PIL Image so only a compact
+    payload crosses the process boundary, along with the stage timings for the
+    parent process to record. ``settings`` is the submitter's current settings:
+    workers neither see its request overrides nor its config reloads otherwise.
+    """
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = ImageProcessor()
+
+    image_features = None
+    with use_settings(settings), collect_stage_timings() as timings:
+        image = _worker_processor.prepare_image(image_path)
+        if current_settings().PRESCREEN_ENABLED:
+            # Before enhancement, matching the features the model was trained on
+            with track_stage("prescreen"):
+                image_features = extract_features(image)
+        image = _worker_processor.finish_preprocessing(image, enhance=enhance, remove_bg=remove_bg)
+        with track_stage("encode"):
+            image_bytes = OpenAIClient.encode_image_bytes(image)
+    return {
+        "image_bytes": image_bytes,
+        "image_info": _worker_processor.get_image_info(image),
+        "image_features": image_features,
+        "stage_timings": timings,
+    }
+
+
+def preprocess_lesion_file(image_path: str, enhance: bool, settings: Optional[Config] = None) -> Dict[str, Any]:
+    """Prepare the overview and lesion tiles of one image in a worker process (see preprocess_image_file)."""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = ImageProcessor()
+
+    with use_settings(settings), collect_stage_timings() as timings:
+        overview, tiles, tile_info = _worker_processor.prepare_lesion_views(image_path, enhance=enhance)
+        with track_stage("encode"):
+            overview_bytes = OpenAIClient.encode_image_bytes(overview)
+            tile_bytes = [OpenAIClient.encode_image_bytes(tile) for tile in tiles]
+    return {
+        "overview_bytes": overview_bytes,
+        "tile_bytes": tile_bytes,
+        "tile_info": tile_info,
+        "image_info": _worker_processor.get_image_info(overview),
+        "stage_timings": timings,
+    }
+
+
+def warm_worker() -> int:
+    """Build a worker's ImageProcessor and load OpenCV/NumPy before its first image; returns its pid."""
+    global _worker_processor
+    if _worker_processor is None:
+        _worker_processor = ImageProcessor()
+    image = Image.new("RGB", (64, 64), (60, 140, 60))
+    _worker_processor.assess_quality(image)
+    OpenAIClient.encode_image_bytes(_worker_processor.resize_image(image, 32))
+    return os.getpid()
+
+
+def preprocessing_failure(error: Exception, analysis_type: str) -> PlantAnalysisResult:
+    """Failed result for an image that couldn't be preprocessed."""
+    if isinstance(error, QualityCheckError):
+        # Rejected by the quality gate: the message already says how to retake the photo
+        return PlantAnalysisResult({
+            "success": False,
+            "error": str(error),
+            "quality": error.quality,
+            "analysis_type": analysis_type
+        })
+    return PlantAnalysisResult({
+        "success": False,
+        "error": f"Preprocessing failed: {str(error)}",
+        "analysis_type": analysis_type
+    })
+
+
+class Stage:
+    """An executor with a bounded number of pending (queued + running) tasks.
+
+    A stage is driven either synchronously with ``submit`` or from a single
+    event loop with ``run``; the two modes keep separate slot counters.
+    """
+
+    def __init__(self, name: str, executor: Executor, max_pending: int):
+        """
+        Initialize the stage.
+
+        Args:
+            name: Stage name (used in diagnostics)
+            executor: Executor running the stage's tasks
+            max_pending: Maximum queued + running tasks before submitters wait
+        """
+        self.name = name
+        self.executor = executor
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._async_slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        # Threads can run in the submitter's context (current span, analysis type);
+        # process workers can't, as contexts don't pickle
+        self._propagate_context = isinstance(executor, ThreadPoolExecutor)
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks queued or running in this stage."""
+        return self._pending
+
+    def _track(self, delta: int):
+        with self._pending_lock:
+            self._pending += delta
+            QUEUE_DEPTH.labels(stage=self.name).set(self._pending)
+
+    def _bind(self, fn: Callable) -> Callable:
+        return bind_context(fn) if self._propagate_context else fn
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Submit a task, blocking while the stage is full."""
+        fn = self._bind(fn)
+        self._slots.acquire()
+        self._track(1)
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self._track(-1)
+            self._slots.release()
+            raise
+
+        def release(_):
+            self._track(-1)
+            self._slots.release()
+
+        future.add_done_callback(release)
+        return future
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run a task from an event loop, waiting (without blocking the loop) while the stage is full."""
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.max_pending)
+
+        async with self._async_slots:
+            self._track(1)
+            try:
+                return await asyncio.wrap_future(self.executor.submit(self._bind(fn), *args))
+            finally:
+                self._track(-1)
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the stage's executor."""
+        self.executor.shutdown(wait=wait)
+
+
+class AnalysisStages:
+    """Preprocessing process pool feeding a model-call thread pool."""
+
+    def __init__(self,
+                 preprocess_workers: Optional[int] = None,
+                 api_workers: Optional[int] = None,
+                 preprocess_queue: Optional[int] = None,
+                 api_queue: Optional[int] = None):
+        """
+        Initialize both stages.
+
+        Args:
+            preprocess_workers: Preprocessing processes (defaults to PIPELINE_PREPROCESS_WORKERS)
+            api_workers: Concurrent model calls (defaults to PIPELINE_API_CONCURRENCY)
+            preprocess_queue: Pending preprocessing tasks allowed (defaults to PIPELINE_PREPROCESS_QUEUE)
+            api_queue: Pending model calls allowed (defaults to PIPELINE_API_QUEUE)
+        """
+        preprocess_workers = preprocess_workers or config.PIPELINE_PREPROCESS_WORKERS
+        api_workers = api_workers or config.PIPELINE_API_CONCURRENCY
+        self.preprocess_workers = preprocess_workers
+
+        # "spawn" keeps workers independent of the parent's threads and open connections
+        self.preprocess = Stage(
+            "preprocess",
+            ProcessPoolExecutor(
+                max_workers=preprocess_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            ),
+            preprocess_queue or config.PIPELINE_PREPROCESS_QUEUE or preprocess_workers * 2
+        )
+        self.inference = Stage(
+            "inference",
+            ThreadPoolExecutor(max_workers=api_workers, thread_name_prefix="inference"),
+            api_queue or config.PIPELINE_API_QUEUE or api_workers * 2
+        )
+
+    def warm_up(self) -> List[int]:
+        """
+        Start the preprocessing processes and load their dependencies.
+
+        Spawned workers otherwise start, and import OpenCV, on the first
+        requests that reach them.
+
+        Returns:
+            Process ids of the warmed workers
+        """
+        futures = [self.preprocess.submit(warm_worker) for _ in range(self.preprocess_workers)]
+        return sorted({future.result() for future in futures})
+
+    def submit_preprocess(self, image_path: str, enhance: bool, remove_bg: bool) -> Future:
+        """Submit an image for preprocessing, blocking while the stage is full."""
+        return self.preprocess.submit(preprocess_image_file, image_path, enhance, remove_bg, current_settings())
+
+    def submit_inference(self,
+                         analyzer: PlantAnalyzer,
+                         payload: Dict[str, Any],
+                         analysis_type: str,
+                         priority: int = PRIORITY_BATCH) -> Future:
+        """Submit a preprocessed payload for analysis, blocking while the stage is full."""
+        record_stage_timings(payload.get("stage_timings"), analysis_type)
+        return self.inference.submit(
+            analyzer.analyze_preprocessed_image,
+            payload["image_bytes"],
+            analysis_type,
+            payload["image_info"],
+            priority,
+            None,
+            payload.get("image_features")
+        )
+
+    async def analyze(self,
+                      analyzer: PlantAnalyzer,
+                      image_path: str,
+                      analysis_type: str = "complete",
+                      enhance: bool = True,
+                      remove_bg: bool = False,
+                      priority: int = PRIORITY_INTERACTIVE,
+                      sections: Optional[List[str]] = None) -> PlantAnalysisResult:
+        """Preprocess and analyze one image (or only some sections of it) from an event loop."""
+        with span("preprocess", **{"analysis.type": analysis_type, "preprocess.remove_bg": remove_bg}):
+            try:
+                payload = await self.preprocess.run(
+                    preprocess_image_file, image_path, enhance, remove_bg, current_settings()
+                )
+            except Exception as e:
+                return preprocessing_failure(e, analysis_type)
+            # Worker processes aren't traced; attach their stage timings to this span
+            set_attributes({
+                f"preprocess.{stage}_ms": round(seconds * 1000, 3)
+                for stage, seconds in payload.get("stage_timings", {}).items()
+            })
+
+        record_stage_timings(payload.get("stage_timings"), analysis_type)
+        return await self.inference.run(
+            analyzer.analyze_preprocessed_image,
+            payload["image_bytes"],
+            analysis_type,
+            payload["image_info"],
+            priority,
+            sections,
+            payload.get("image_features")
+        )
+
+    async def analyze_lesions(self,
+                              analyzer: PlantAnalyzer,
+                              image_path: str,
+                              enhance: bool = True,
+                              priority: int = PRIORITY_INTERACTIVE) -> PlantAnalysisResult:
+        """Disease detection in lesion tile mode (overview plus full-resolution tiles) from an event loop."""
+        analysis_type = "disease_detection"
+        with span("preprocess", **{"analysis.type": analysis_type, "preprocess.mode": "lesion_tiles"}):
+            try:
+                payload = await self.preprocess.run(preprocess_lesion_file, image_path, enhance, current_settings())
+            except Exception as e:
+                return preprocessing_failure(e, analysis_type)
+            set_attributes({
+                f"preprocess.{stage}_ms": round(seconds * 1000, 3)
+                for stage, seconds in payload.get("stage_timings", {}).items()
+            })
+
+        record_stage_timings(payload.get("stage_timings"), analysis_type)
+        return await self.inference.run(
+            analyzer.analyze_preprocessed_lesion_views,
+            payload["overview_bytes"],
+            payload["tile_bytes"],
+            payload["tile_info"],
+            payload["image_info"],
+            priority
+        )
+
+    async def analyze_many(self,
+                           analyzer: PlantAnalyzer,
+                           image_paths: List[str],
+                           analysis_type: str = "complete",
+                           enhance: bool = True,
+                           remove_bg: bool = False,
+                           priority: int = PRIORITY_INTERACTIVE) -> PlantAnalysisResult:
+        """Preprocess several photos of one plant in parallel, then analyze them together in one model call."""
+        with span("preprocess", **{
+            "analysis.type": analysis_type,
+            "preprocess.remove_bg": remove_bg,
+            "preprocess.images": len(image_paths),
+        }):
+            settings = current_settings()
+            outcomes = await asyncio.gather(*[
+                self.preprocess.run(preprocess_image_file, image_path, enhance, remove_bg, settings)
+                for image_path in image_paths
+            ], return_exceptions=True)
+
+        images, image_infos, image_numbers, rejected_images = [], [], [], []
+        for image_number, outcome in enumerate(outcomes, 1):
+            if isinstance(outcome, Exception):
+                # Dropped (e.g. by the quality gate); the other photos are still analyzed
+                rejected_images.append(image_rejection(image_number, outcome))
+                continue
+            record_stage_timings(outcome.get("stage_timings"), analysis_type)
+            images.append(outcome["image_bytes"])
+            image_infos.append(outcome["image_info"])
+            image_numbers.append(image_number)
+
+        return await self.inference.run(
+            analyzer.analyze_preprocessed_images,
+            images,
+            analysis_type,
+            image_infos,
+            priority,
+            image_numbers,
+            rejected_images
+        )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Pending task counts and limits per stage."""
+        return {
+            stage.name: {"pending": stage.pending, "max_pending": stage.max_pending}
+            for stage in (self.preprocess, self.inference)
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Shut down both stages."""
+        self.preprocess.shutdown(wait=wait)
+        self.inference.shutdown(wait=wait)
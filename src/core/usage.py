@@ -0,0 +1,138 @@
+"""
+Per-request token and cost accounting with daily budgets per API key.
+
+Every model call made on behalf of an API key (the X-API-Key header, bound
+with ``usage_key`` for the duration of a request) is added to that key's
+daily usage in the result store. Keys with a daily token or cost budget
+(DAILY_TOKEN_BUDGET, DAILY_COST_BUDGET_USD, per-key DAILY_BUDGETS) are
+refused new analyses once today's usage reaches it; the request that
+crosses the budget still completes. Calls outside a usage key (CLI, batch
+pipeline) are only counted in the metrics.
+
+Budgets only hold callers to them when API_KEYS lists the accepted keys:
+otherwise any header value is its own key, and a new value starts afresh.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+try:
+    from .result_store import ResultStore, api_key_hash, get_result_store
+    from ..utils.config import config
+    from ..utils.metrics import record_tokens
+except ImportError:
+    from src.core.result_store import ResultStore, api_key_hash, get_result_store
+    from src.utils.config import config
+    from src.utils.metrics import record_tokens
+
+logger = logging.getLogger(__name__)
+
+# Key requests without an X-API-Key header are accounted under
+DEFAULT_USAGE_KEY = "anonymous"
+
+_usage_key: ContextVar[Optional[str]] = ContextVar("usage_key", default=None)
+
+
+class BudgetExceededError(RuntimeError):
+    """An API key has used up its daily token or cost budget."""
+
+    def __init__(self, key: str, status: Dict[str, Any]):
+        super().__init__("Daily budget exceeded for this API key")
+        self.key = key
+        self.status = status
+
+    def __reduce__(self):
+        return (BudgetExceededError, (self.key, self.status))
+
+
+@contextmanager
+def usage_key(key: Optional[str]) -> Iterator[str]:
+    """Account model calls made inside the block (and tasks bound to it) to an API key."""
+    key = key or DEFAULT_USAGE_KEY
+    token = _usage_key.set(key)
+    try:
+        yield key
+    finally:
+        _usage_key.reset(token)
+
+
+def current_usage_key() -> Optional[str]:
+    """API key the current model calls are accounted to, if any."""
+    return _usage_key.get()
+
+
+def key_allowed(key: Optional[str]) -> bool:
+    """Whether requests may use an API key (any key when API_KEYS is empty)."""
+    return not config.API_KEYS or key in config.API_KEYS
+
+
+def budget_for(key: str) -> Dict[str, Optional[float]]:
+    """Daily token and cost budget of an API key (None = unlimited)."""
+    override = config.DAILY_BUDGETS.get(key, {})
+    tokens = override.get("tokens", config.DAILY_TOKEN_BUDGET)
+    cost_usd = override.get("cost_usd", config.DAILY_COST_BUDGET_USD)
+    return {"tokens": tokens or None, "cost_usd": cost_usd or None}
+
+
+def budget_status(key: str, store: Optional[ResultStore] = None) -> Dict[str, Any]:
+    """Today's usage of an API key against its budget."""
+    budget = budget_for(key)
+    usage = (store or get_result_store()).usage_totals(key)
+    remaining = {
+        "tokens": max(0, budget["tokens"] - usage["total_tokens"]) if budget["tokens"] else None,
+        "cost_usd": max(0.0, round(budget["cost_usd"] - usage["cost_usd"], 6)) if budget["cost_usd"] else None,
+    }
+    return {
+        "key": key,
+        "day": datetime.now().strftime("%Y-%m-%d"),
+        "usage": usage,
+        "budget": budget,
+        "remaining": remaining,
+        "exhausted": any(value is not None and value <= 0 for value in remaining.values()),
+    }
+
+
+def check_budget(key: Optional[str] = None, store: Optional[ResultStore] = None):
+    """Raise BudgetExceededError if the key (default: the current usage key) has no budget left today."""
+    key = key or current_usage_key()
+    if key is None:
+        return
+    budget = budget_for(key)
+    if budget["tokens"] is None and budget["cost_usd"] is None:
+        return
+    status = budget_status(key, store)
+    if status["exhausted"]:
+        raise BudgetExceededError(key, status)
+
+
+def record_call(call: Dict[str, Any], analysis_type: str, store: Optional[ResultStore] = None):
+    """Count a model call in the metrics and, under a usage key, in the key's daily usage."""
+    record_tokens(call, analysis_type)
+    key = current_usage_key()
+    if key is None:
+        return
+    try:
+        (store or get_result_store()).record_usage(key, analysis_type, call.get("model"), call)
+    except Exception as e:
+        logger.error(f"Failed to record usage for API key {api_key_hash(key)}: {e}")
+
+
+def shared_usage() -> Dict[str, Any]:
+    """Usage of a request served another request's result: the calls were paid for by that request."""
+    return {**summarize_usage([]), "shared": True}
+
+
+def summarize_usage(calls: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Token and cost totals of the model calls made for one request."""
+    calls = [call for call in calls if "error" not in call]
+    summary = {
+        field: sum(call.get(field) or 0 for call in calls)
+        for field in ("prompt_tokens", "completion_tokens", "cached_tokens", "image_tokens")
+    }
+    summary["total_tokens"] = summary["prompt_tokens"] + summary["completion_tokens"]
+    costs = [call["cost_usd"] for call in calls if call.get("cost_usd") is not None]
+    summary["cost_usd"] = round(sum(costs), 6) if costs else (0.0 if not calls else None)
+    summary["calls"] = len(calls)
+    return summary
@@ -13,7 +13,12 @@ sys.path.insert(0, str(current_dir))
 sys.path.insert(0, str(current_dir.parent))
 
 from src.core.plant_analyzer import PlantAnalyzer
+from src.core.result_store import get_result_store, migrate_json_results
+from src.core.exporter import export_results_to_parquet
+from src.core.batch_pipeline import BatchAnalysisPipeline, iter_image_files
+from src.core.prescreen import train_prescreen_model
 from src.utils.helpers import (
+    RESULT_STORE_FILENAME,
     save_analysis_result,
     format_analysis_for_display,
     validate_image_path,
@@ -32,7 +37,11 @@ Ví dụ sử dụng:
   python main.py --image photo.jpg --analysis complete
   python main.py --image photo.jpg --analysis disease_detection --save
   python main.py --image photo.jpg --enhance --remove-bg
+  python main.py --dir survey/ --glob "**/*.jpg" --analysis disease_detection
   python main.py --info
+  python main.py --migrate-results data/results
+  python main.py --export-parquet data/exports --since 2024-01-01
+  python main.py --train-prescreen --training-jsonl data/results/survey_scan.jsonl
   python main.py --test
         """
     )
@@ -44,6 +53,45 @@ Ví dụ sử dụng:
         help="Đường dẫn đến file hình ảnh cần phân tích"
     )
     
+    parser.add_argument(
+        "--dir", "-d",
+        type=str,
+        help="Thư mục chứa hình ảnh cần phân tích hàng loạt"
+    )
+    
+    parser.add_argument(
+        "--glob", "-g",
+        type=str,
+        default="**/*",
+        help="Mẫu glob để chọn file trong --dir (mặc định: **/*)"
+    )
+    
+    parser.add_argument(
+        "--jsonl",
+        type=str,
+        help="File JSONL ghi kết quả quét thư mục (mặc định: data/results/<tên thư mục>_scan.jsonl)"
+    )
+    
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        help="File checkpoint để tiếp tục quét khi bị gián đoạn (mặc định: <jsonl>.checkpoint)"
+    )
+    
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=config.PIPELINE_PREPROCESS_WORKERS,
+        help=f"Số process tiền xử lý ảnh (mặc định: {config.PIPELINE_PREPROCESS_WORKERS})"
+    )
+    
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=config.PIPELINE_API_CONCURRENCY,
+        help=f"Số yêu cầu OpenAI đồng thời (mặc định: {config.PIPELINE_API_CONCURRENCY})"
+    )
+    
     parser.add_argument(
         "--analysis", "-a",
         type=str,
@@ -55,14 +103,14 @@ Ví dụ sử dụng:
     parser.add_argument(
         "--save", "-s",
         action="store_true",
-        help="Lưu kết quả phân tích vào file JSON"
+        help="Lưu kết quả phân tích vào cơ sở dữ liệu kết quả"
     )
     
     parser.add_argument(
         "--output", "-o",
         type=str,
-        default="data/results",
-        help="Thư mục lưu kết quả (mặc định: data/results)"
+        default=None,
+        help="Thư mục chứa cơ sở dữ liệu kết quả (mặc định: RESULT_STORE_PATH)"
     )
     
     # Image processing options
@@ -103,6 +151,40 @@ Ví dụ sử dụng:
         help="Thiết lập thư mục project"
     )
     
+    parser.add_argument(
+        "--export-parquet",
+        type=str,
+        metavar="DIR",
+        help="Xuất lịch sử phân tích ra Parquet (phân vùng theo ngày và loại phân tích) vào DIR"
+    )
+    
+    parser.add_argument(
+        "--since",
+        type=str,
+        help="Chỉ xuất kết quả từ thời điểm này (ISO, ví dụ: 2024-01-31)"
+    )
+    
+    parser.add_argument(
+        "--migrate-results",
+        type=str,
+        metavar="DIR",
+        help="Chuyển các file kết quả JSON cũ trong DIR vào cơ sở dữ liệu kết quả"
+    )
+    
+    parser.add_argument(
+        "--train-prescreen",
+        action="store_true",
+        help="Huấn luyện mô hình sàng lọc sức khỏe cục bộ từ cơ sở dữ liệu kết quả (lưu vào PRESCREEN_MODEL_PATH)"
+    )
+    
+    parser.add_argument(
+        "--training-jsonl",
+        type=str,
+        nargs="+",
+        default=[],
+        help="Thêm dữ liệu huấn luyện từ các file JSONL quét thư mục (đọc lại ảnh theo image_path)"
+    )
+    
     # Parse arguments
     args = parser.parse_args()
     
@@ -120,9 +202,25 @@ Ví dụ sử dụng:
         test_api_connection()
         return
     
+    if args.migrate_results:
+        migrate_results(args.migrate_results, args.output)
+        return
+    
+    if args.export_parquet:
+        export_parquet(args.export_parquet, args.output, args.since)
+        return
+    
+    if args.train_prescreen:
+        train_prescreen(args.output, args.training_jsonl)
+        return
+    
+    if args.dir:
+        scan_directory(args)
+        return
+    
     # Validate main arguments
     if not args.image:
-        print("❌ Lỗi: Vui lòng cung cấp đường dẫn hình ảnh với --image")
+        print("❌ Lỗi: Vui lòng cung cấp đường dẫn hình ảnh với --image hoặc thư mục với --dir")
         parser.print_help()
         return
     
@@ -177,6 +275,120 @@ def test_api_connection():
     except Exception as e:
         print(f"❌ Lỗi khi kiểm tra kết nối: {str(e)}")
 
+def migrate_results(source_dir: str, output_dir: str = None):
+    """Migrate legacy JSON result files into the result store."""
+    if not os.path.isdir(source_dir):
+        print(f"❌ Lỗi: Thư mục không tồn tại: {source_dir}")
+        return
+    
+    print(f"🔄 Đang chuyển kết quả từ: {source_dir}")
+    
+    try:
+        db_path = os.path.join(output_dir, RESULT_STORE_FILENAME) if output_dir else None
+        store = get_result_store(db_path)
+        stats = migrate_json_results(source_dir, store=store)
+        
+        print(f"✅ Đã chuyển {stats['migrated']}/{stats['total']} file vào {store.db_path}")
+        if stats["failed"]:
+            print(f"⚠️ {stats['failed']} file không đọc được, xem log để biết chi tiết")
+            
+    except Exception as e:
+        print(f"❌ Lỗi khi chuyển dữ liệu: {str(e)}")
+
+def export_parquet(export_dir: str, output_dir: str = None, since: str = None):
+    """Export stored analysis results to partitioned Parquet."""
+    print(f"🔄 Đang xuất lịch sử phân tích ra: {export_dir}")
+    
+    try:
+        db_path = os.path.join(output_dir, RESULT_STORE_FILENAME) if output_dir else None
+        manifest = export_results_to_parquet(export_dir, store=get_result_store(db_path), start=since)
+        
+        print(f"✅ Đã xuất {manifest['rows']} kết quả vào {len(manifest['files'])} file Parquet")
+        
+    except Exception as e:
+        print(f"❌ Lỗi khi xuất dữ liệu: {str(e)}")
+
+def train_prescreen(output_dir: str = None, jsonl_paths: List[str] = ()):
+    """Train the local pre-screen model on stored results."""
+    print("🔄 Đang huấn luyện mô hình sàng lọc sức khỏe cục bộ...")
+    
+    try:
+        db_path = os.path.join(output_dir, RESULT_STORE_FILENAME) if output_dir else None
+        model = train_prescreen_model(store=get_result_store(db_path), jsonl_paths=jsonl_paths)
+        metadata = model.metadata
+        
+        print(f"✅ Đã huấn luyện trên {metadata['samples']} kết quả: {metadata['class_counts']}")
+        if metadata["cv_accuracy"] is not None:
+            print(f"🎯 Độ chính xác (cross-validation): {metadata['cv_accuracy']:.1%}")
+        print(f"💾 Đã lưu mô hình vào {config.PRESCREEN_MODEL_PATH}")
+        if not config.PRESCREEN_ENABLED:
+            print("💡 Đặt PRESCREEN_ENABLED=true để dùng mô hình khi phân tích")
+        
+    except Exception as e:
+        print(f"❌ Lỗi khi huấn luyện: {str(e)}")
+
+def scan_directory(args):
+    """Analyze every matching image in a directory with the concurrent pipeline."""
+    if not os.path.isdir(args.dir):
+        print(f"❌ Lỗi: Thư mục không tồn tại: {args.dir}")
+        return
+    
+    jsonl_path = args.jsonl or os.path.join(
+        "data", "results", f"{Path(args.dir).resolve().name}_scan.jsonl"
+    )
+    
+    print(f"🔄 Đang quét thư mục: {args.dir} ({args.glob})")
+    print(f"📊 Loại phân tích: {args.analysis}")
+    print(f"⚙️ {args.workers} process tiền xử lý, {args.concurrency} yêu cầu đồng thời")
+    
+    try:
+        analyzer = PlantAnalyzer()
+        
+        on_result = None
+        if args.save:
+            db_path = os.path.join(args.output, RESULT_STORE_FILENAME) if args.output else None
+            store = get_result_store(db_path)
+            
+            def on_result(image_path, result):
+                if result.success:
+                    store.save({**result.to_dict(), "image_path": image_path})
+        
+        pipeline = BatchAnalysisPipeline(
+            analyzer,
+            output_path=jsonl_path,
+            checkpoint_path=args.checkpoint,
+            analysis_type=args.analysis,
+            enhance_image=args.enhance,
+            remove_background=args.remove_bg,
+            preprocess_workers=args.workers,
+            api_workers=args.concurrency,
+            on_result=on_result
+        )
+        
+        def show_progress(stats):
+            print(
+                f"\r⏳ {stats['completed']}/{stats['total']} "
+                f"✅ {stats['succeeded']} ❌ {stats['failed']} "
+                f"| {stats['images_per_second']:.2f} ảnh/giây",
+                end="",
+                flush=True
+            )
+        
+        stats = pipeline.run(iter_image_files(args.dir, args.glob), progress=show_progress)
+        
+        print()
+        if stats["skipped"]:
+            print(f"⏭️ Bỏ qua {stats['skipped']} ảnh đã phân tích (theo checkpoint)")
+        print(f"✅ Hoàn thành {stats['completed']} ảnh trong {stats['elapsed']:.1f} giây")
+        print(f"💾 Kết quả JSONL: {jsonl_path}")
+        if stats["failed"]:
+            print(f"⚠️ {stats['failed']} ảnh thất bại, chạy lại cùng lệnh để thử lại")
+        
+    except KeyboardInterrupt:
+        print("\n⏸️ Đã dừng. Chạy lại cùng lệnh để tiếp tục từ checkpoint.")
+    except Exception as e:
+        print(f"\n❌ Lỗi trong quá trình quét thư mục: {str(e)}")
+
 def analyze_image(args):
     """Analyze the provided image."""
     print(f"🔄 Đang phân tích hình ảnh: {args.image}")
@@ -222,8 +434,8 @@ def analyze_image(args):
             
             # Save results if requested
             if args.save:
-                filepath = save_analysis_result(result.to_dict(), args.output)
-                print(f"\n💾 Kết quả đã được lưu vào: {filepath}")
+                record_id = save_analysis_result(result.to_dict(), args.output)
+                print(f"\n💾 Kết quả đã được lưu với ID: {record_id}")
                 
         else:
             print(f"\n❌ Phân tích thất bại: {result.error}")
@@ -1,42 +1,441 @@
 # """
 # Configuration settings for the plant analysis application.
 # """
+import contextlib
+import copy
+import json
+import logging
 import os
-from dotenv import load_dotenv
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Mapping, Optional
+
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+
+logger = logging.getLogger(__name__)
+
+# Variables set by the process environment, which keep precedence over the
+# file on every reload (load_dotenv never overrides them either)
+_PROCESS_ENV = dict(os.environ)
 
 # Load environment variables
 load_dotenv()
 
+IMAGE_DETAILS = ("low", "high", "auto")
+
+# Read once when their component is built; reloading records them but they only
+# take effect after a restart
+RESTART_REQUIRED = frozenset({
+    "OPENAI_API_KEY", "OPENAI_BASE_URL", "OPENAI_RPM_LIMIT", "OPENAI_TPM_LIMIT",
+    "OPENAI_MAX_RETRIES", "OPENAI_BACKOFF_BASE", "OPENAI_BACKOFF_MAX",
+    "CHROMADB_HOST", "CHROMADB_PORT", "PRESCREEN_MODEL_PATH",
+    "RESULT_STORE_PATH", "RESULT_STORE_BATCH_SIZE", "RESULT_STORE_FLUSH_INTERVAL",
+    "PIPELINE_PREPROCESS_WORKERS", "PIPELINE_API_CONCURRENCY",
+    "PIPELINE_PREPROCESS_QUEUE", "PIPELINE_API_QUEUE",
+    "HEALTH_PROBE_INTERVAL", "HEALTH_PROBE_TTL", "HEALTH_CIRCUIT_FAILURES", "HEALTH_CIRCUIT_RESET",
+    "TRACING_EXPORTER", "TRACING_FILE", "TRACING_SERVICE_NAME",
+    "RESPONSE_COMPRESSION", "RESPONSE_COMPRESSION_MIN_SIZE",
+    "CONFIG_FILE", "CONFIG_RELOAD_INTERVAL",
+    "SHARED_STATE_PATH", "WORKER_WARMUP", "API_HOST", "API_PORT", "API_WORKERS",
+})
+
+
+class _Reader:
+    """Typed access to an environment mapping; errors name the variable."""
+
+    def __init__(self, env: Mapping[str, str]):
+        self.env = env
+
+    def string(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = self.env.get(name)
+        return default if value is None or value == "" else value
+
+    def choice(self, name: str, default: str, choices) -> str:
+        value = self.string(name, default).lower()
+        if value not in choices:
+            raise ValueError(f"{name} must be one of {', '.join(choices)}, got {value!r}")
+        return value
+
+    def _parse(self, name: str, default, cast, minimum, maximum):
+        raw = self.string(name)
+        try:
+            value = default if raw is None else cast(raw)
+        except ValueError:
+            raise ValueError(f"{name} must be a{'n integer' if cast is int else ' number'}, got {raw!r}") from None
+        if minimum is not None and value < minimum:
+            raise ValueError(f"{name} must be at least {minimum}, got {value}")
+        if maximum is not None and value > maximum:
+            raise ValueError(f"{name} must be at most {maximum}, got {value}")
+        return value
+
+    def integer(self, name: str, default: int, minimum=None, maximum=None) -> int:
+        return self._parse(name, default, int, minimum, maximum)
+
+    def number(self, name: str, default: float, minimum=None, maximum=None) -> float:
+        return self._parse(name, default, float, minimum, maximum)
+
+    def boolean(self, name: str, default: bool) -> bool:
+        value = self.string(name)
+        if value is None:
+            return default
+        if value.lower() not in ("true", "false"):
+            raise ValueError(f"{name} must be true or false, got {value!r}")
+        return value.lower() == "true"
+
+    def json(self, name: str, default: Any) -> Any:
+        raw = self.string(name)
+        if raw is None:
+            return default
+        try:
+            value = json.loads(raw)
+        except ValueError as e:
+            raise ValueError(f"{name} is not valid JSON: {e}") from None
+        if not isinstance(value, type(default)):
+            raise ValueError(f"{name} must be a JSON {type(default).__name__}")
+        return value
+
+    def items(self, name: str, default: str) -> List[str]:
+        return [item.strip() for item in self.string(name, default).split(",") if item.strip()]
+
+
+def _environment(path: Optional[str]) -> Dict[str, str]:
+    """The config file's values overlaid with the process environment."""
+    values = {}
+    if path and os.path.exists(path):
+        values = {key: value for key, value in dotenv_values(path).items() if value is not None}
+    return {**values, **_PROCESS_ENV}
+
+
 class Config:
     """Application configuration."""
-    
-    # OpenAI settings
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
-    OPENAI_MODEL = os.getenv("OPENAI_MODEL", "GPT-4o")
-    MAX_TOKENS = int(os.getenv("MAX_TOKENS", "1000"))
-    TEMPERATURE = float(os.getenv("TEMPERATURE", "0.3"))
-    
-    # ChromaDB settings
-    CHROMADB_HOST = os.getenv("CHROMADB_HOST", "localhost")
-    CHROMADB_PORT = int(os.getenv("CHROMADB_PORT", "8000"))
-    
-    # Image processing settings
-    MAX_IMAGE_SIZE = int(os.getenv("MAX_IMAGE_SIZE", "1024"))
-    SUPPORTED_FORMATS = os.getenv("SUPPORTED_FORMATS", "jpg,jpeg,png,webp").split(",")
-    
-    # Analysis settings
-    CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.7"))
-    ENABLE_DISEASE_DETECTION = os.getenv("ENABLE_DISEASE_DETECTION", "true").lower() == "true"
-    ENABLE_GROWTH_ANALYSIS = os.getenv("ENABLE_GROWTH_ANALYSIS", "true").lower() == "true"
-    
+
+    def __init__(self, env: Optional[Mapping[str, str]] = None):
+        """
+        Load and validate settings.
+
+        Args:
+            env: Variables to read (defaults to the process environment over CONFIG_FILE)
+
+        Raises:
+            ValueError: If a variable is malformed or out of range
+        """
+        self.load(os.environ if env is None else env)
+
+    def load(self, env: Mapping[str, str]):
+        """Set every setting from ``env``."""
+        read = _Reader(env)
+
+        # Settings file re-read on reload (SIGHUP or when it changes); 0 = don't watch it
+        self.CONFIG_FILE = read.string("CONFIG_FILE") or find_dotenv(usecwd=True) or ".env"
+        self.CONFIG_RELOAD_INTERVAL = read.number("CONFIG_RELOAD_INTERVAL", 0.0, minimum=0)
+
+        # OpenAI settings
+        self.OPENAI_API_KEY = read.string("OPENAI_API_KEY")
+        self.OPENAI_BASE_URL = read.string("OPENAI_BASE_URL")
+        self.OPENAI_MODEL = read.string("OPENAI_MODEL", "GPT-4o")
+        self.MAX_TOKENS = read.integer("MAX_TOKENS", 1000, minimum=1)
+        # Completion token limit per analysis type, e.g. {"plant_identification": 400}; other types use MAX_TOKENS
+        self.MAX_TOKENS_BY_TYPE = {
+            "plant_identification": 500,
+            "disease_detection": 1000,
+            "growth_analysis": 800,
+            "complete": 1200,
+            **read.json("MAX_TOKENS_BY_TYPE", {}),
+        }
+        for analysis_type, limit in self.MAX_TOKENS_BY_TYPE.items():
+            if not isinstance(limit, int) or limit < 1:
+                raise ValueError(f"MAX_TOKENS_BY_TYPE[{analysis_type!r}] must be a positive integer")
+        self.TEMPERATURE = read.number("TEMPERATURE", 0.3, minimum=0, maximum=2)
+        # Client-side limits below the account's (0 = no limit) and retries of transient failures
+        self.OPENAI_RPM_LIMIT = read.number("OPENAI_RPM_LIMIT", 0.0, minimum=0)
+        self.OPENAI_TPM_LIMIT = read.number("OPENAI_TPM_LIMIT", 0.0, minimum=0)
+        self.OPENAI_MAX_RETRIES = read.integer("OPENAI_MAX_RETRIES", 4, minimum=0)
+        self.OPENAI_BACKOFF_BASE = read.number("OPENAI_BACKOFF_BASE", 0.5, minimum=0)
+        self.OPENAI_BACKOFF_MAX = read.number("OPENAI_BACKOFF_MAX", 30.0, minimum=0)
+        # Model routing: "single" sends everything to OPENAI_MODEL; "tiered" tries the
+        # first-pass model and escalates on low confidence or detected disease
+        self.MODEL_ROUTING = read.choice("MODEL_ROUTING", "single", ("single", "tiered"))
+        self.ROUTING_FIRST_PASS_MODEL = read.string("ROUTING_FIRST_PASS_MODEL", "gpt-4o-mini")
+        self.ROUTING_FIRST_PASS_DETAIL = read.choice("ROUTING_FIRST_PASS_DETAIL", "low", IMAGE_DETAILS)
+        self.ROUTING_ESCALATE_ON_DISEASE = read.boolean("ROUTING_ESCALATE_ON_DISEASE", True)
+        # USD per million tokens, e.g. {"gpt-4o": [2.5, 10, 1.25]} (prompt, completion, optional cached prompt)
+        self.MODEL_PRICES = {model.lower(): tuple(prices) for model, prices in read.json("MODEL_PRICES", {}).items()}
+
+        # ChromaDB settings
+        self.CHROMADB_HOST = read.string("CHROMADB_HOST", "localhost")
+        self.CHROMADB_PORT = read.integer("CHROMADB_PORT", 8000, minimum=1, maximum=65535)
+
+        # Image processing settings
+        self.MAX_IMAGE_SIZE = read.integer("MAX_IMAGE_SIZE", 1024, minimum=64)
+        self.SUPPORTED_FORMATS = read.items("SUPPORTED_FORMATS", "jpg,jpeg,png,webp")
+        # Detail level of analyzed images unless a request or a routing pass sets one
+        self.IMAGE_DETAIL = read.choice("IMAGE_DETAIL", "auto", IMAGE_DETAILS)
+        # Photos of one plant that can be analyzed together in one model call
+        self.MAX_IMAGES_PER_REQUEST = read.integer("MAX_IMAGES_PER_REQUEST", 5, minimum=1)
+        # Format and quality clients should re-encode uploads to before sending
+        self.UPLOAD_PREFERRED_FORMAT = read.choice("UPLOAD_PREFERRED_FORMAT", "webp", ("webp", "jpeg", "png"))
+        self.UPLOAD_QUALITY = read.number("UPLOAD_QUALITY", 0.85, minimum=0, maximum=1)
+
+        # Per-request overrides (API form fields): image sizes between these bounds,
+        # models from this list and token caps below the analysis type's limit
+        self.MIN_REQUEST_IMAGE_SIZE = read.integer("MIN_REQUEST_IMAGE_SIZE", 256, minimum=64)
+        self.ALLOWED_MODELS = read.items(
+            "ALLOWED_MODELS", f"{self.OPENAI_MODEL},{self.ROUTING_FIRST_PASS_MODEL}"
+        )
+        # Completion token cap applied on top of the per-type limits (set per request)
+        self.REQUEST_MAX_TOKENS: Optional[int] = None
+
+        # Quality gate: reject blurry, badly exposed or plant-free images before analysis
+        self.QUALITY_GATE_ENABLED = read.boolean("QUALITY_GATE_ENABLED", True)
+        self.QUALITY_THUMBNAIL_SIZE = read.integer("QUALITY_THUMBNAIL_SIZE", 256, minimum=16)
+        # Laplacian variance of the thumbnail
+        self.QUALITY_MIN_SHARPNESS = read.number("QUALITY_MIN_SHARPNESS", 10.0, minimum=0)
+        # Mean brightness (0-255)
+        self.QUALITY_MIN_BRIGHTNESS = read.number("QUALITY_MIN_BRIGHTNESS", 30.0, minimum=0, maximum=255)
+        self.QUALITY_MAX_BRIGHTNESS = read.number("QUALITY_MAX_BRIGHTNESS", 235.0, minimum=0, maximum=255)
+        # Fraction of plant-coloured (saturated, not too dark) pixels, of any hue
+        self.QUALITY_MIN_PLANT_COVERAGE = read.number("QUALITY_MIN_PLANT_COVERAGE", 0.02, minimum=0, maximum=1)
+
+        # Lesion tile mode: full-resolution crops most likely to show lesions or pests,
+        # sent with a low-detail overview instead of one downscaled image
+        self.LESION_TILE_SIZE = read.integer("LESION_TILE_SIZE", 512, minimum=64)
+        self.LESION_TILE_OVERLAP = read.number("LESION_TILE_OVERLAP", 0.25, minimum=0, maximum=0.9)  # fraction of the tile size
+        self.LESION_TILE_TOP_K = read.integer("LESION_TILE_TOP_K", 4, minimum=1)
+        self.LESION_TILE_DETAIL = read.choice("LESION_TILE_DETAIL", "high", IMAGE_DETAILS)
+        self.LESION_OVERVIEW_SIZE = read.integer("LESION_OVERVIEW_SIZE", 512, minimum=64)
+
+        # Local health pre-screen (scikit-learn): records image features with each
+        # analysis and, once a model is trained, gives a provisional verdict
+        self.PRESCREEN_ENABLED = read.boolean("PRESCREEN_ENABLED", False)
+        self.PRESCREEN_MODEL_PATH = read.string("PRESCREEN_MODEL_PATH", "data/models/prescreen.joblib")
+        # Confident healthy verdicts: none, downgrade (first-pass model only) or
+        # skip (disease_detection answered without a model call)
+        self.PRESCREEN_ACTION = read.choice("PRESCREEN_ACTION", "downgrade", ("none", "downgrade", "skip"))
+        self.PRESCREEN_HEALTHY_CONFIDENCE = read.number("PRESCREEN_HEALTHY_CONFIDENCE", 0.9, minimum=0, maximum=1)
+
+        # Analysis settings
+        self.CONFIDENCE_THRESHOLD = read.number("CONFIDENCE_THRESHOLD", 0.7, minimum=0, maximum=1)
+        self.ENABLE_DISEASE_DETECTION = read.boolean("ENABLE_DISEASE_DETECTION", True)
+        self.ENABLE_GROWTH_ANALYSIS = read.boolean("ENABLE_GROWTH_ANALYSIS", True)
+
+        # API keys accepted in the X-API-Key header of analysis requests. Empty = any
+        # header value (or none) is accepted, so budgets only track usage per header
+        self.API_KEYS = read.items("API_KEYS", "")
+        # Daily usage budgets per API key (X-API-Key header); 0 = unlimited
+        self.DAILY_TOKEN_BUDGET = read.integer("DAILY_TOKEN_BUDGET", 0, minimum=0)
+        self.DAILY_COST_BUDGET_USD = read.number("DAILY_COST_BUDGET_USD", 0.0, minimum=0)
+        # Per-key overrides, e.g. {"field-app": {"tokens": 2000000, "cost_usd": 20}}
+        self.DAILY_BUDGETS = read.json("DAILY_BUDGETS", {})
+
+        # Result store settings
+        self.RESULT_STORE_PATH = read.string("RESULT_STORE_PATH", "data/results/results.db")
+        self.RESULT_STORE_BATCH_SIZE = read.integer("RESULT_STORE_BATCH_SIZE", 64, minimum=1)
+        self.RESULT_STORE_FLUSH_INTERVAL = read.number("RESULT_STORE_FLUSH_INTERVAL", 1.0, minimum=0)
+        self.EXPORT_DIR = read.string("EXPORT_DIR", "data/exports")
+
+        # Batch pipeline settings
+        self.PIPELINE_PREPROCESS_WORKERS = read.integer("PIPELINE_PREPROCESS_WORKERS", os.cpu_count() or 2, minimum=1)
+        self.PIPELINE_API_CONCURRENCY = read.integer("PIPELINE_API_CONCURRENCY", 8, minimum=1)
+        # Pending tasks allowed per stage before submitters wait (0 = twice the worker count)
+        self.PIPELINE_PREPROCESS_QUEUE = read.integer("PIPELINE_PREPROCESS_QUEUE", 0, minimum=0)
+        self.PIPELINE_API_QUEUE = read.integer("PIPELINE_API_QUEUE", 0, minimum=0)
+
+        # Health probe settings
+        self.HEALTH_PROBE_INTERVAL = read.number("HEALTH_PROBE_INTERVAL", 30.0, minimum=0)
+        self.HEALTH_PROBE_TTL = read.number("HEALTH_PROBE_TTL", 60.0, minimum=0)
+        self.HEALTH_CIRCUIT_FAILURES = read.integer("HEALTH_CIRCUIT_FAILURES", 3, minimum=1)
+        self.HEALTH_CIRCUIT_RESET = read.number("HEALTH_CIRCUIT_RESET", 60.0, minimum=0)
+
+        # Multi-worker settings
+        # SQLite file through which API workers share rate limits, health probes and analyses (empty = per process)
+        self.SHARED_STATE_PATH = read.string("SHARED_STATE_PATH", "")
+        # Seconds a successful analysis stays shared between workers (needs SHARED_STATE_PATH; 0 = only while in flight)
+        self.ANALYSIS_CACHE_TTL = read.number("ANALYSIS_CACHE_TTL", 0.0, minimum=0)
+        self.WORKER_WARMUP = read.boolean("WORKER_WARMUP", True)
+        self.API_HOST = read.string("API_HOST", "0.0.0.0")
+        self.API_PORT = read.integer("API_PORT", 5000, minimum=1, maximum=65535)
+        self.API_WORKERS = read.integer("API_WORKERS", os.cpu_count() or 1, minimum=1)
+
+        # Tracing settings (requires opentelemetry-sdk)
+        self.TRACING_EXPORTER = read.choice("TRACING_EXPORTER", "none", ("none", "console", "file", "otlp"))
+        self.TRACING_FILE = read.string("TRACING_FILE", "data/traces/spans.jsonl")
+        self.TRACING_SERVICE_NAME = read.string("TRACING_SERVICE_NAME", "plant-analysis-api")
+
+        # API response settings
+        self.JSON_RESPONSE_BACKEND = read.choice("JSON_RESPONSE_BACKEND", "orjson", ("orjson", "json"))
+        self.RESPONSE_COMPRESSION = read.choice("RESPONSE_COMPRESSION", "gzip", ("gzip", "brotli", "none"))
+        self.RESPONSE_COMPRESSION_MIN_SIZE = read.integer("RESPONSE_COMPRESSION_MIN_SIZE", 1024, minimum=0)
+
+    def settings(self) -> Dict[str, Any]:
+        """Current values of all settings."""
+        return {name: value for name, value in vars(self).items() if name.isupper()}
+
+    def reload(self) -> List[str]:
+        """
+        Re-read the process environment and CONFIG_FILE.
+
+        The new values are validated before any is applied, so a malformed file
+        leaves the running settings untouched.
+
+        Returns:
+            Names of the settings that changed
+
+        Raises:
+            ValueError: If the new settings are invalid
+        """
+        fresh = Config({"CONFIG_FILE": self.CONFIG_FILE, **_environment(self.CONFIG_FILE)})
+        changed = sorted(
+            name for name, value in fresh.settings().items()
+            if name != "REQUEST_MAX_TOKENS" and getattr(self, name, None) != value
+        )
+        # One dict update, so concurrent readers see either the old or the new value of a setting
+        vars(self).update({name: getattr(fresh, name) for name in changed})
+        return changed
+
+    def with_overrides(self,
+                       max_image_size: Optional[int] = None,
+                       detail: Optional[str] = None,
+                       model: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> "Config":
+        """
+        Copy of these settings with one request's performance knobs applied.
+
+        Sizes and token caps are clamped to the server's limits; details and
+        models outside the allowed values are rejected.
+
+        Args:
+            max_image_size: Longest side images are resized to
+            detail: Image detail level (low, high, auto)
+            model: Model from ALLOWED_MODELS
+            max_tokens: Completion token cap
+
+        Raises:
+            ValueError: If detail or model is not allowed
+        """
+        settings = copy.copy(self)
+        if max_image_size is not None:
+            size = max(int(max_image_size), self.MIN_REQUEST_IMAGE_SIZE)
+            settings.MAX_IMAGE_SIZE = min(size, self.MAX_IMAGE_SIZE)
+        if detail is not None:
+            detail = detail.lower()
+            if detail not in IMAGE_DETAILS:
+                raise ValueError(f"detail must be one of {', '.join(IMAGE_DETAILS)}")
+            settings.IMAGE_DETAIL = detail
+        if model is not None:
+            allowed = {name.lower(): name for name in self.ALLOWED_MODELS}
+            if model.lower() not in allowed:
+                raise ValueError(f"model must be one of {', '.join(self.ALLOWED_MODELS)}")
+            settings.OPENAI_MODEL = allowed[model.lower()]
+            # A chosen model is used as is, not routed through the first-pass model
+            settings.MODEL_ROUTING = "single"
+        if max_tokens is not None:
+            settings.REQUEST_MAX_TOKENS = max(1, min(int(max_tokens), self.REQUEST_MAX_TOKENS or int(max_tokens)))
+        return settings
+
+    def fingerprint(self) -> tuple:
+        """Settings that change an analysis result, for cache keys."""
+        return (self.OPENAI_MODEL, self.MODEL_ROUTING, self.IMAGE_DETAIL, self.MAX_IMAGE_SIZE,
+                self.REQUEST_MAX_TOKENS)
+
+    def max_tokens_for(self, analysis_type: str) -> int:
+        """Completion token limit of an analysis type; combined sections ("a+b") add up, capped at "complete"."""
+        if "+" in analysis_type:
+            total = sum(self.max_tokens_for(section) for section in analysis_type.split("+"))
+            limit = min(total, self.MAX_TOKENS_BY_TYPE.get("complete", total))
+        else:
+            limit = self.MAX_TOKENS_BY_TYPE.get(analysis_type, self.MAX_TOKENS)
+        return min(limit, self.REQUEST_MAX_TOKENS or limit)
+
     # Validation
-    @classmethod
-    def validate(cls):
+    def validate(self):
         """Validate configuration settings."""
-        if not cls.OPENAI_API_KEY:
+        if not self.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY is required. Please set it in your .env file.")
         return True
 
+
 # Create global config instance
 config = Config()
+
+_current_settings: ContextVar[Optional[Config]] = ContextVar("settings", default=None)
+
+
+def current_settings() -> Config:
+    """Settings of the request being handled, or the global config."""
+    return _current_settings.get() or config
+
+
+@contextlib.contextmanager
+def use_settings(settings: Optional[Config]) -> Iterator[Config]:
+    """Make ``settings`` (e.g. ``config.with_overrides(...)``) current for the enclosed code."""
+    token = _current_settings.set(settings)
+    try:
+        yield current_settings()
+    finally:
+        _current_settings.reset(token)
+
+
+def reload_config() -> List[str]:
+    """Reload the global config, logging what changed; invalid files are logged and ignored."""
+    try:
+        changed = config.reload()
+    except ValueError as e:
+        logger.error(f"Configuration not reloaded: {e}")
+        return []
+    if changed:
+        logger.info(f"Configuration reloaded: {', '.join(changed)} changed")
+        pending = [name for name in changed if name in RESTART_REQUIRED]
+        if pending:
+            logger.warning(f"Restart to apply {', '.join(pending)}")
+    return changed
+
+
+class ConfigWatcher:
+    """Reloads the global config whenever CONFIG_FILE changes."""
+
+    def __init__(self, interval: Optional[float] = None, path: Optional[str] = None):
+        """
+        Initialize the watcher.
+
+        Args:
+            interval: Seconds between checks of the file (defaults to CONFIG_RELOAD_INTERVAL)
+            path: File to watch (defaults to CONFIG_FILE)
+        """
+        self.interval = interval or config.CONFIG_RELOAD_INTERVAL or 5.0
+        self.path = path or config.CONFIG_FILE
+        self._mtime = self._modified()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _modified(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def check(self) -> List[str]:
+        """Reload if the file changed since the last check; returns the changed settings."""
+        mtime = self._modified()
+        if mtime == self._mtime:
+            return []
+        self._mtime = mtime
+        return reload_config()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        """Start watching in a background thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="config-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -4,31 +4,39 @@ Helper functions and utilities.
 import os
 import json
 import time
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
 from pathlib import Path
 
-def save_analysis_result(result: Dict[str, Any], output_dir: str = "data/results") -> str:
-    """Save analysis result to JSON file."""
-    # Create output directory if it doesn't exist
-    Path(output_dir).mkdir(parents=True, exist_ok=True)
-    
-    # Generate filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"plant_analysis_{timestamp}.json"
-    filepath = os.path.join(output_dir, filename)
+try:
+    from ..core.result_store import get_result_store
+    from .config import config
+except ImportError:
+    from src.core.result_store import get_result_store
+    from src.utils.config import config
+
+RESULT_STORE_FILENAME = Path(config.RESULT_STORE_PATH).name
+
+def save_analysis_result(result: Dict[str, Any], output_dir: Optional[str] = None) -> str:
+    """
+    Save analysis result to the result store and return its record ID.
+
+    Args:
+        result: Analysis result dictionary
+        output_dir: Directory holding the store database (defaults to RESULT_STORE_PATH)
+
+    Returns:
+        Record ID of the saved result
+    """
+    db_path = os.path.join(output_dir, RESULT_STORE_FILENAME) if output_dir else None
     
     # Add timestamp to result
     result["saved_at"] = datetime.now().isoformat()
     
-    # Save to file
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
-    
-    return filepath
+    return get_result_store(db_path).save(result)
 
 def load_analysis_result(filepath: str) -> Dict[str, Any]:
-    """Load analysis result from JSON file."""
+    """Load a legacy analysis result from a JSON file."""
     with open(filepath, 'r', encoding='utf-8') as f:
         return json.load(f)
 
@@ -208,37 +216,13 @@ def measure_execution_time(func):
 
 def create_analysis_summary(results: Dict[str, Any]) -> Dict[str, Any]:
     """Create a summary from multiple analysis results."""
-    summary = {
-        "total_analyses": len(results),
-        "successful_analyses": 0,
-        "failed_analyses": 0,
-        "analysis_types": {},
-        "common_plant_types": {},
-        "common_health_issues": [],
-        "timestamp": datetime.now().isoformat()
-    }
-    
-    for filepath, result in results.items():
-        if result.get("success", False):
-            summary["successful_analyses"] += 1
-            
-            # Count analysis types
-            analysis_type = result.get("analysis_type", "unknown")
-            summary["analysis_types"][analysis_type] = summary["analysis_types"].get(analysis_type, 0) + 1
-            
-            # Count plant types
-            plant_type = result.get("plant_type")
-            if plant_type:
-                summary["common_plant_types"][plant_type] = summary["common_plant_types"].get(plant_type, 0) + 1
-            
-            # Collect health issues
-            health_status = result.get("health_status", "")
-            if "bệnh" in health_status.lower() or "disease" in health_status.lower():
-                summary["common_health_issues"].append(health_status)
-        else:
-            summary["failed_analyses"] += 1
+    # Imported here so callers that never summarize don't pay for pandas
+    try:
+        from ..core.analytics import summarize_results
+    except ImportError:
+        from src.core.analytics import summarize_results
     
-    return summary
+    return summarize_results(results)
 
 def setup_project_directories():
     """Set up necessary project directories."""
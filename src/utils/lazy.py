@@ -0,0 +1,48 @@
+"""
+Deferred imports of heavy dependencies.
+
+OpenCV, NumPy, pandas, scikit-learn, the OpenAI SDK and the vector database
+client together take over a second to import, and most processes (``--info``,
+API workers before their first request, the pre-screen endpoint) only need
+some of them. ``lazy_import`` returns a placeholder module that imports the
+real one on first attribute access, so module-level ``np = lazy_import("numpy")``
+keeps the rest of the code unchanged. Annotations that name lazy modules are
+quoted, or they would trigger the import when the function is defined.
+"""
+import importlib
+import importlib.util
+import sys
+import threading
+import types
+from typing import Dict, Optional
+
+_modules: Dict[str, "LazyModule"] = {}
+_lock = threading.Lock()
+
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported when one of its attributes is first used."""
+
+    def __getattr__(self, attr: str):
+        # The import system's locks make concurrent first uses import it once
+        module = importlib.import_module(self.__name__)
+        # Later lookups hit the copied attributes directly and skip this hook
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+
+def lazy_import(name: str, package: Optional[str] = None) -> types.ModuleType:
+    """
+    Module ``name`` (relative to ``package`` if it starts with a dot), imported on first use.
+
+    Raises ImportError straight away if its top-level package isn't installed,
+    so optional dependencies keep their ``try``/``except ImportError`` fallback.
+    """
+    name = importlib.util.resolve_name(name, package)
+    module = sys.modules.get(name) or _modules.get(name)
+    if module is not None:
+        return module
+    if importlib.util.find_spec(name.partition(".")[0]) is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    with _lock:
+        return _modules.setdefault(name, LazyModule(name))
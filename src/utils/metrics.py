@@ -0,0 +1,187 @@
+"""
+Prometheus metrics for the analysis pipeline.
+
+Stage latencies are recorded with ``track_stage``, which also opens a trace
+span when tracing is enabled. The analysis type label comes from the
+surrounding ``analysis_context`` unless passed explicitly.
+Preprocessing runs in worker processes whose metrics would never be
+scraped, so workers collect their timings with ``collect_stage_timings``
+and return them for the parent to record with ``record_stage_timings``.
+
+prometheus_client is optional; without it every metric is a no-op.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+        ProcessCollector, generate_latest
+    )
+except ImportError:
+    CollectorRegistry = None
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+try:
+    from .tracing import span
+except ImportError:
+    from src.utils.tracing import span
+
+STAGES = (
+    "upload_read", "decode", "resize", "quality_check", "enhance", "background_removal", "prescreen",
+    "tile_ranking", "encode", "base64", "context_retrieval", "rate_limit_wait", "model_call", "serialization",
+)
+
+# Seconds; preprocessing stages are milliseconds, model calls tens of seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+_analysis_type: ContextVar[str] = ContextVar("analysis_type", default="unknown")
+_collected_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("collected_timings", default=None)
+
+
+class _NoopMetric:
+    """Stand-in for a metric when prometheus_client isn't installed."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, amount):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def is_available() -> bool:
+    """Whether prometheus_client is installed."""
+    return CollectorRegistry is not None
+
+
+if is_available():
+    # A dedicated registry keeps /metrics limited to this application
+    REGISTRY = CollectorRegistry()
+    ProcessCollector(registry=REGISTRY)
+
+    STAGE_LATENCY = Histogram(
+        "plant_analysis_stage_seconds", "Latency of each analysis stage",
+        ["stage", "analysis_type"], buckets=LATENCY_BUCKETS, registry=REGISTRY
+    )
+    ANALYSES = Counter(
+        "plant_analysis_requests_total", "Completed analyses by outcome",
+        ["analysis_type", "outcome"], registry=REGISTRY
+    )
+    TOKENS = Counter(
+        "plant_analysis_tokens_total", "Model tokens used",
+        ["analysis_type", "model", "kind"], registry=REGISTRY
+    )
+    COST = Counter(
+        "plant_analysis_cost_usd_total", "Estimated model cost in USD",
+        ["analysis_type", "model"], registry=REGISTRY
+    )
+    CACHE_REQUESTS = Counter(
+        "plant_analysis_cache_requests_total", "Cache lookups by result",
+        ["cache", "result"], registry=REGISTRY
+    )
+    IN_FLIGHT = Gauge(
+        "plant_analysis_in_flight", "Analyses currently being processed",
+        ["analysis_type"], registry=REGISTRY
+    )
+    QUEUE_DEPTH = Gauge(
+        "plant_analysis_stage_queue_depth", "Tasks queued or running per pipeline stage",
+        ["stage"], registry=REGISTRY
+    )
+    UPSTREAM_RETRIES = Counter(
+        "plant_analysis_upstream_retries_total", "Retried model calls by failure status",
+        ["reason"], registry=REGISTRY
+    )
+    QUALITY_REJECTIONS = Counter(
+        "plant_analysis_quality_rejections_total", "Images rejected by the local quality gate",
+        ["issue"], registry=REGISTRY
+    )
+    ROUTING_DECISIONS = Counter(
+        "plant_analysis_routing_decisions_total", "Tiered routing outcomes (first_pass or escalated)",
+        ["decision", "reason"], registry=REGISTRY
+    )
+else:
+    REGISTRY = None
+    STAGE_LATENCY = ANALYSES = TOKENS = CACHE_REQUESTS = IN_FLIGHT = QUEUE_DEPTH = _NoopMetric()
+    UPSTREAM_RETRIES = ROUTING_DECISIONS = QUALITY_REJECTIONS = COST = _NoopMetric()
+
+
+@contextmanager
+def analysis_context(analysis_type: str) -> Iterator[None]:
+    """Label stages tracked inside the block with an analysis type."""
+    token = _analysis_type.set(analysis_type or "unknown")
+    try:
+        yield
+    finally:
+        _analysis_type.reset(token)
+
+
+def observe_stage(stage: str, seconds: float, analysis_type: Optional[str] = None):
+    """Record a stage latency, or add it to the timings being collected."""
+    collected = _collected_timings.get()
+    if collected is not None:
+        collected[stage] = collected.get(stage, 0.0) + seconds
+        return
+    STAGE_LATENCY.labels(stage=stage, analysis_type=analysis_type or _analysis_type.get()).observe(seconds)
+
+
+@contextmanager
+def track_stage(stage: str, analysis_type: Optional[str] = None) -> Iterator[None]:
+    """Time the block as one pipeline stage (also recorded as a trace span)."""
+    start = time.perf_counter()
+    try:
+        with span(f"stage.{stage}", **{"analysis.type": analysis_type or _analysis_type.get()}):
+            yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, analysis_type)
+
+
+@contextmanager
+def collect_stage_timings() -> Iterator[Dict[str, float]]:
+    """Collect stage timings into a dict instead of recording them (for worker processes)."""
+    timings: Dict[str, float] = {}
+    token = _collected_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _collected_timings.reset(token)
+
+
+def record_stage_timings(timings: Optional[Dict[str, float]], analysis_type: Optional[str] = None):
+    """Record timings collected in another process."""
+    for stage, seconds in (timings or {}).items():
+        observe_stage(stage, seconds, analysis_type)
+
+
+def record_tokens(call: Dict[str, Any], analysis_type: str):
+    """Count the prompt, completion, cached and (estimated) image tokens and the cost of a model call."""
+    model = call.get("model") or "unknown"
+    for kind in ("prompt_tokens", "completion_tokens", "cached_tokens", "image_tokens"):
+        count = call.get(kind)
+        if isinstance(count, int) and count > 0:
+            TOKENS.labels(analysis_type=analysis_type, model=model, kind=kind.split("_")[0]).inc(count)
+    if call.get("cost_usd"):
+        COST.labels(analysis_type=analysis_type, model=model).inc(call["cost_usd"])
+
+
+def record_cache(cache: str, hit: bool):
+    """Count a cache hit or miss."""
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def render_latest() -> bytes:
+    """Render all metrics in the Prometheus text format."""
+    if not is_available():
+        raise ImportError("prometheus_client is required for metrics export")
+    return generate_latest(REGISTRY)
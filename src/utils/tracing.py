@@ -0,0 +1,162 @@
+"""
+Optional OpenTelemetry tracing for the analysis pipeline.
+
+Tracing is off unless TRACING_EXPORTER is set to "console", "file" or
+"otlp" and the OpenTelemetry SDK is installed. The file exporter writes one
+JSON span per line, so traces can be inspected offline. Spans are created
+with ``span``; ``bind_context`` carries the current trace into background
+tasks and worker threads.
+"""
+import contextvars
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+try:
+    from opentelemetry import trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor, ConsoleSpanExporter, SpanExporter, SpanExportResult
+    )
+except ImportError:
+    trace = None
+    SpanExporter = object
+
+try:
+    from .config import config
+except ImportError:
+    from src.utils.config import config
+
+TRACE_ID_HEADER = "X-Trace-Id"
+
+_provider = None
+_tracer = None
+
+
+def is_available() -> bool:
+    """Whether the OpenTelemetry SDK is installed."""
+    return trace is not None
+
+
+def is_enabled() -> bool:
+    """Whether spans are being recorded."""
+    return _tracer is not None
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Append finished spans to a file, one JSON object per line."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, spans) -> "SpanExportResult":
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+
+def _create_exporter(exporter: str, path: Optional[str]):
+    if exporter == "console":
+        return ConsoleSpanExporter()
+    if exporter == "file":
+        return JsonLinesSpanExporter(path or config.TRACING_FILE)
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter()
+    raise ValueError(f"Unknown tracing exporter: {exporter}")
+
+
+def setup_tracing(exporter: Optional[str] = None, path: Optional[str] = None) -> bool:
+    """
+    Configure tracing.
+
+    Args:
+        exporter: "console", "file", "otlp" or "none" (defaults to TRACING_EXPORTER)
+        path: Output file for the file exporter (defaults to TRACING_FILE)
+
+    Returns:
+        True if spans will be recorded
+    """
+    global _provider, _tracer
+    exporter = (exporter or config.TRACING_EXPORTER).lower()
+    shutdown_tracing()
+    if exporter == "none" or not is_available():
+        return False
+
+    # A private provider (not the global one) so tracing can be reconfigured
+    _provider = TracerProvider(resource=Resource.create({"service.name": config.TRACING_SERVICE_NAME}))
+    _provider.add_span_processor(BatchSpanProcessor(_create_exporter(exporter, path)))
+    _tracer = _provider.get_tracer("plant-analysis")
+    return True
+
+
+def flush_tracing():
+    """Export all finished spans now."""
+    if _provider is not None:
+        _provider.force_flush()
+
+
+def shutdown_tracing():
+    """Flush and stop tracing."""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+    _provider = None
+    _tracer = None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Record the block as a span (no-op when tracing is disabled)."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name) as current:
+        for key, value in attributes.items():
+            if value is not None:
+                current.set_attribute(key, value)
+        yield current
+
+
+def set_attributes(attributes: Dict[str, Any]):
+    """Set attributes on the current span."""
+    if _tracer is None:
+        return
+    current = trace.get_current_span()
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
+
+
+def current_trace_id() -> Optional[str]:
+    """Hex trace id of the current span, or None outside a recorded trace."""
+    if _tracer is None:
+        return None
+    span_context = trace.get_current_span().get_span_context()
+    if not span_context.is_valid:
+        return None
+    return format(span_context.trace_id, "032x")
+
+
+def bind_context(func: Callable) -> Callable:
+    """Wrap a function to run in the caller's context (current span included).
+
+    Background tasks and thread pools don't inherit the request's context,
+    so without this their spans would start unrelated traces.
+    """
+    ctx = contextvars.copy_context()
+
+    def bound(*args, **kwargs):
+        # A fresh copy per call, since one Context can't be entered concurrently
+        return ctx.copy().run(func, *args, **kwargs)
+
+    return bound
@@ -2,8 +2,10 @@
 Streamlit Web Application for Plant Analysis AI.
 """
 import streamlit as st
+import hashlib
 import sys
 from pathlib import Path
+from typing import Optional
 from PIL import Image
 import io
 
@@ -12,7 +14,7 @@ current_dir = Path(__file__).parent
 sys.path.insert(0, str(current_dir))
 sys.path.insert(0, str(current_dir.parent))
 
-from src.core.plant_analyzer import PlantAnalyzer
+from src.core.plant_analyzer import PlantAnalyzer, PlantAnalysisResult
 from src.utils.helpers import (
     save_analysis_result,
     format_analysis_for_display,
@@ -28,6 +30,57 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Memoized analyses kept across sessions
+RESULT_CACHE_ENTRIES = 256
+
+@st.cache_resource(show_spinner=False)
+def get_analyzer(api_key: Optional[str] = None, base_url: Optional[str] = None) -> PlantAnalyzer:
+    """Get an analyzer shared across reruns and sessions, one per API key and base URL."""
+    return PlantAnalyzer(api_key or None, base_url or None)
+
+class _UncachedResult(Exception):
+    """Carries a failed result out of the memoized analysis so it isn't cached."""
+
+    def __init__(self, result: PlantAnalysisResult):
+        super().__init__(result.error)
+        self.result = result
+
+@st.cache_data(show_spinner=False, max_entries=RESULT_CACHE_ENTRIES)
+def _memoized_analysis(
+    upload_digest: str,
+    analysis_type: str,
+    enhance_image: bool,
+    remove_background: bool,
+    base_url: Optional[str],
+    api_key_digest: str,
+    _analyzer: PlantAnalyzer,
+    _image: Image.Image
+) -> PlantAnalysisResult:
+    """
+    Analyze an upload; keyed on its digest and options (underscored arguments aren't hashed).
+
+    The cache is shared by all sessions, so the key also covers a digest of
+    the API key: a session with another (or a revoked) key never gets a
+    result paid for with someone else's.
+    """
+    result = _analyzer.analyze_plant_image(
+        image_path=_image,
+        analysis_type=analysis_type,
+        enhance_image=enhance_image,
+        remove_background=remove_background
+    )
+    if not result.success:
+        # Raising skips the cache, so a retry after fixing the API key isn't served a stale failure
+        raise _UncachedResult(result)
+    return result
+
+def load_upload(uploaded_file) -> tuple:
+    """Read an upload once, returning its digest and the decoded image."""
+    data = uploaded_file.getvalue()
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return hashlib.sha256(data).hexdigest(), image
+
 def main():
     """Main Streamlit application."""
     
@@ -63,10 +116,14 @@ def main():
             type="password",
             help="Để trống để sử dụng key từ file .env"
         )
+        base_url_input = st.text_input(
+            "Base URL (tùy chọn):",
+            help="Để trống để sử dụng OPENAI_BASE_URL từ file .env"
+        )
         
         # Test API connection
         if st.button("🧪 Kiểm tra kết nối API"):
-            test_api_connection(api_key_input)
+            test_api_connection(api_key_input, base_url_input)
         
         # Project info
         if st.button("ℹ️ Thông tin project"):
@@ -85,9 +142,9 @@ def main():
             help="Hỗ trợ định dạng: JPG, JPEG, PNG, WEBP"
         )
         
-        # Display uploaded image
+        # Display uploaded image (decoded once, reused for the analysis)
         if uploaded_file is not None:
-            image = Image.open(uploaded_file)
+            upload_digest, image = load_upload(uploaded_file)
             st.image(image, caption="Hình ảnh đã upload", use_column_width=True)
             
             # Image info
@@ -99,11 +156,13 @@ def main():
         if uploaded_file is not None:
             if st.button("🚀 Bắt đầu phân tích", type="primary"):
                 perform_analysis(
-                    uploaded_file, 
+                    upload_digest,
+                    image,
                     analysis_type, 
                     enhance_image, 
                     remove_background,
-                    api_key_input
+                    api_key_input,
+                    base_url_input
                 )
     
     with col2:
@@ -113,11 +172,11 @@ def main():
         if "analysis_result" not in st.session_state:
             st.info("Upload hình ảnh và nhấn 'Bắt đầu phân tích' để xem kết quả.")
 
-def test_api_connection(api_key: str = None):
+def test_api_connection(api_key: str = None, base_url: str = None):
     """Test OpenAI API connection."""
     with st.spinner("Đang kiểm tra kết nối..."):
         try:
-            analyzer = PlantAnalyzer(api_key if api_key else None)
+            analyzer = get_analyzer(api_key, base_url)
             result = analyzer.test_connection()
             
             if result["success"]:
@@ -152,24 +211,26 @@ def show_project_info():
     for analysis_type in info['supported_analysis_types']:
         st.write(f"- {analysis_type}")
 
-def perform_analysis(uploaded_file, analysis_type, enhance_image, remove_background, api_key):
-    """Perform plant analysis on uploaded image."""
+def perform_analysis(upload_digest, image, analysis_type, enhance_image, remove_background, api_key, base_url=None):
+    """Perform plant analysis on an uploaded image, reusing the result for an identical upload."""
     
     with st.spinner(f"Đang thực hiện {analysis_type}..."):
         try:
-            # Convert uploaded file to PIL Image
-            image = Image.open(uploaded_file)
-            
-            # Initialize analyzer
-            analyzer = PlantAnalyzer(api_key if api_key else None)
+            analyzer = get_analyzer(api_key, base_url)
             
-            # Perform analysis using PIL Image directly
-            result = analyzer.analyze_plant_image(
-                image_path=image,  # Pass PIL Image directly
-                analysis_type=analysis_type,
-                enhance_image=enhance_image,
-                remove_background=remove_background
-            )
+            try:
+                result = _memoized_analysis(
+                    upload_digest,
+                    analysis_type,
+                    enhance_image,
+                    remove_background,
+                    base_url or None,
+                    hashlib.sha256((api_key or "").encode("utf-8")).hexdigest(),
+                    analyzer,
+                    image
+                )
+            except _UncachedResult as failed:
+                result = failed.result
             
             # Store result in session state
             st.session_state.analysis_result = result
@@ -255,25 +316,5 @@ def display_analysis_results(result):
         st.error("❌ Phân tích thất bại!")
         st.error(f"🚫 Lỗi: {result.error}")
 
-def modify_openai_client():
-    """Modify the OpenAI client to work with uploaded images."""
-    # This is a patch to make the analyzer work with uploaded files
-    from core.openai_client import OpenAIClient
-    
-    original_analyze = OpenAIClient.analyze_plant_image
-    
-    def patched_analyze(self, image_path_or_pil, analysis_type="complete"):
-        if hasattr(image_path_or_pil, 'read'):  # It's a file-like object
-            # Convert to PIL Image
-            image = Image.open(image_path_or_pil)
-            return original_analyze(self, image, analysis_type)
-        else:
-            return original_analyze(self, image_path_or_pil, analysis_type)
-    
-    OpenAIClient.analyze_plant_image = patched_analyze
-
-# Apply the patch
-modify_openai_client()
-
 if __name__ == "__main__":
     main()
@@ -1,17 +1,40 @@
 """
 Tests for the plant analyzer core functionality.
 """
+import base64
+import io
+import shutil
+import tempfile
+import time
 import unittest
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
 # Add src to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
+from core import plant_analyzer as plant_analyzer_module
 from core.plant_analyzer import PlantAnalyzer, PlantAnalysisResult
-from core.image_processor import ImageProcessor
-from core.openai_client import OpenAIClient
+from core.shared_state import SharedState
+from core import stages as stages_module
+from core.image_processor import ImageProcessor, QualityCheckError
+from core import openai_client as openai_client_module
+from core.openai_client import OpenAIClient, normalize_sections, parse_triage
+
+def _leafy_image(size=(320, 240), seed=0, scale=1.0):
+    """Textured green image that passes the quality gate (scale < 1 darkens it)."""
+    rng = np.random.default_rng(seed)
+    pixels = np.stack([
+        rng.integers(20, 90, size[::-1]),
+        rng.integers(110, 210, size[::-1]),
+        rng.integers(20, 80, size[::-1]),
+    ], axis=-1) * scale
+    return Image.fromarray(pixels.astype(np.uint8))
 
 class TestPlantAnalyzer(unittest.TestCase):
     """Test cases for PlantAnalyzer class."""
@@ -41,6 +64,167 @@ class TestPlantAnalyzer(unittest.TestCase):
             
             expected_types = ["plant_identification", "disease_detection", "growth_analysis", "complete"]
             self.assertEqual(types, expected_types)
+    
+    def _analyzer_with_slow_client(self, calls):
+        with patch('core.plant_analyzer.config') as mock_config:
+            mock_config.validate.return_value = True
+            analyzer = PlantAnalyzer(self.mock_api_key)
+        
+        def analyze(image_path_or_pil, analysis_type, priority, prescreen=None):
+            calls.append(analysis_type)
+            time.sleep(0.2)
+            return {"success": True, "analysis": "Cây khỏe mạnh", "analysis_type": analysis_type,
+                    "usage": {"total_tokens": 1500, "calls": 1, "cost_usd": 0.004}}
+        
+        analyzer.openai_client = Mock()
+        analyzer.openai_client.analyze_plant_image.side_effect = analyze
+        return analyzer
+    
+    def test_concurrent_identical_analyses_share_one_call(self):
+        """Test identical analyses in flight at the same time make one model call."""
+        calls = []
+        analyzer = self._analyzer_with_slow_client(calls)
+        image_bytes = b"preprocessed-image"
+        
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(
+                lambda _: analyzer.analyze_preprocessed_image(image_bytes, "complete", image_info={}),
+                range(3)
+            ))
+        
+        self.assertEqual(calls, ["complete"])
+        self.assertTrue(all(result.success for result in results))
+        # Callers don't share the result object
+        self.assertIsNot(results[0].raw_response, results[1].raw_response)
+        # Only the request that made the call reports its usage
+        usages = sorted((result.usage for result in results), key=lambda usage: usage["calls"])
+        self.assertEqual([usage["calls"] for usage in usages], [0, 0, 1])
+        self.assertEqual([usage.get("shared") for usage in usages], [True, True, None])
+    
+    def test_different_parameters_are_not_coalesced(self):
+        """Test analyses of different types or images, or sequential ones, each call the model."""
+        calls = []
+        analyzer = self._analyzer_with_slow_client(calls)
+        
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            list(pool.map(
+                lambda args: analyzer.analyze_preprocessed_image(args[0], args[1], image_info={}),
+                [(b"image-a", "complete"), (b"image-a", "disease_detection"), (b"image-b", "complete")]
+            ))
+        analyzer.analyze_preprocessed_image(b"image-a", "complete", image_info={})
+        
+        self.assertEqual(len(calls), 4)
+    
+    def test_workers_share_cached_results(self):
+        """Test another worker's recent result is reused with shared state and a cache ttl."""
+        temp_dir = tempfile.mkdtemp()
+        state = SharedState(Path(temp_dir) / "state.db")
+        calls = []
+        try:
+            with patch.object(plant_analyzer_module, "get_shared_state", return_value=state), \
+                 patch.object(plant_analyzer_module.config, "ANALYSIS_CACHE_TTL", 60):
+                first = self._analyzer_with_slow_client(calls).analyze_preprocessed_image(
+                    b"image-a", "complete", image_info={}
+                )
+                second = self._analyzer_with_slow_client(calls).analyze_preprocessed_image(
+                    b"image-a", "complete", image_info={}
+                )
+        finally:
+            state.close()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        
+        self.assertEqual(calls, ["complete"])
+        self.assertEqual(second.raw_response["analysis"], first.raw_response["analysis"])
+        self.assertEqual((second.usage["cost_usd"], second.usage["shared"]), (0.0, True))
+    
+    def test_sections_use_one_model_call(self):
+        """Test a multi-section analysis makes one call and returns per-section results."""
+        with patch('core.plant_analyzer.config') as mock_config:
+            mock_config.validate.return_value = True
+            analyzer = PlantAnalyzer(self.mock_api_key)
+        analyzer.openai_client = Mock()
+        analyzer.openai_client.analyze_sections.return_value = {
+            "success": True,
+            "analysis": '```json\n{"plant_identification": {"scientific_name": "Solanum lycopersicum"}, '
+                        '"disease_detection": {"overall_health": "bệnh", "treatment": ["Cắt bỏ lá bệnh"]}}\n```',
+            "analysis_type": "plant_identification+disease_detection",
+            "sections": ["plant_identification", "disease_detection"]
+        }
+        
+        result = analyzer.analyze_preprocessed_image(
+            b"image", sections=["disease_detection", "plant_identification"], image_info={}
+        )
+        
+        analyzer.openai_client.analyze_sections.assert_called_once()
+        analyzer.openai_client.analyze_plant_image.assert_not_called()
+        self.assertEqual(
+            analyzer.openai_client.analyze_sections.call_args.kwargs["sections"],
+            ["plant_identification", "disease_detection"]
+        )
+        data = result.to_dict()
+        self.assertEqual(data["plant_type"], "Solanum lycopersicum")
+        self.assertEqual(data["health_status"], "bệnh")
+        self.assertEqual(data["recommendations"], ["Cắt bỏ lá bệnh"])
+        self.assertEqual(set(data["sections"]), {"plant_identification", "disease_detection"})
+    
+    def test_rejected_image_skips_model_call(self):
+        """Test an image failing the quality gate returns the report without calling the model."""
+        with patch('core.plant_analyzer.config') as mock_config:
+            mock_config.validate.return_value = True
+            analyzer = PlantAnalyzer(self.mock_api_key)
+        analyzer.openai_client = Mock()
+        
+        blurry = _leafy_image().filter(ImageFilter.GaussianBlur(8))
+        result = analyzer.analyze_plant_image(blurry, "disease_detection")
+        
+        analyzer.openai_client.analyze_plant_image.assert_not_called()
+        self.assertFalse(result.success)
+        data = result.to_dict()
+        self.assertIn("Ảnh bị mờ", data["error"])
+        self.assertEqual(data["quality"]["issues"], ["blurry"])
+    
+    def test_photos_of_one_plant_use_one_model_call(self):
+        """Test several photos are analyzed in one call, dropping those failing the quality gate."""
+        with patch('core.plant_analyzer.config') as mock_config:
+            mock_config.validate.return_value = True
+            analyzer = PlantAnalyzer(self.mock_api_key)
+        analyzer.openai_client = Mock()
+        analyzer.openai_client.analyze_plant_images.return_value = {
+            "success": True,
+            "analysis": '{"overall_health": "bệnh"}',
+            "analysis_type": "disease_detection",
+            "image_count": 2
+        }
+        
+        blurry = _leafy_image().filter(ImageFilter.GaussianBlur(8))
+        result = analyzer.analyze_plant_images(
+            [_leafy_image(seed=1), blurry, _leafy_image(seed=2)], "disease_detection"
+        )
+        
+        analyzer.openai_client.analyze_plant_images.assert_called_once()
+        call = analyzer.openai_client.analyze_plant_images.call_args
+        self.assertEqual(len(call.args[0]), 2)
+        self.assertEqual(call.kwargs["image_numbers"], [1, 3])
+        data = result.to_dict()
+        self.assertTrue(data["success"])
+        self.assertEqual(data["image_count"], 2)
+        self.assertEqual([rejected["image_number"] for rejected in data["rejected_images"]], [2])
+        self.assertEqual(data["rejected_images"][0]["quality"]["issues"], ["blurry"])
+    
+    def test_all_photos_rejected_skips_model_call(self):
+        """Test a multi-image analysis fails without a model call when no photo is usable."""
+        with patch('core.plant_analyzer.config') as mock_config:
+            mock_config.validate.return_value = True
+            analyzer = PlantAnalyzer(self.mock_api_key)
+        analyzer.openai_client = Mock()
+        
+        dark = _leafy_image(scale=0.1)
+        result = analyzer.analyze_plant_images([dark, dark])
+        
+        analyzer.openai_client.analyze_plant_images.assert_not_called()
+        self.assertFalse(result.success)
+        self.assertIn("Ảnh 2: Ảnh quá tối", result.error)
+        self.assertEqual(len(result.to_dict()["rejected_images"]), 2)
 
 class TestPlantAnalysisResult(unittest.TestCase):
     """Test cases for PlantAnalysisResult class."""
@@ -119,6 +303,96 @@ class TestImageProcessor(unittest.TestCase):
             self.assertIn("size", info)
             self.assertIn("mode", info)
             self.assertIn("format", info)
+    
+    def test_preprocess_accepts_decoded_image(self):
+        """Test preprocessing an already decoded PIL Image."""
+        image = _leafy_image((self.processor.max_size * 2, 100)).convert("RGBA")
+        processed = self.processor.preprocess_for_analysis(image, enhance=False)
+        
+        self.assertEqual(processed.mode, "RGB")
+        self.assertEqual(max(processed.size), self.processor.max_size)
+    
+    def test_quality_gate_accepts_plant_photo(self):
+        """Test a sharp, well-exposed green image passes the quality gate."""
+        quality = self.processor.check_quality(_leafy_image())
+        
+        self.assertEqual(quality["issues"], [])
+        self.assertGreater(quality["plant_coverage"], 0.5)
+    
+    def test_quality_gate_accepts_diseased_and_colourful_subjects(self):
+        """Test brown, yellow and red subjects count as plant, not as plant-free images."""
+        subjects = {
+            "brown": ((110, 60, 20), (160, 95, 45)),
+            "yellow": ((200, 170, 20), (245, 215, 60)),
+            "red": ((170, 10, 20), (230, 50, 60)),
+        }
+        for name, (low, high) in subjects.items():
+            with self.subTest(subject=name):
+                rng = np.random.default_rng(0)
+                pixels = np.stack([rng.integers(l, h, (240, 320)) for l, h in zip(low, high)], axis=-1)
+                quality = self.processor.check_quality(Image.fromarray(pixels.astype(np.uint8)))
+                
+                self.assertEqual(quality["issues"], [])
+                self.assertGreater(quality["plant_coverage"], 0.5)
+    
+    def test_quality_gate_rejects_unusable_images(self):
+        """Test blurry, dark and plant-free images are rejected with the reason."""
+        screenshot = Image.new("RGB", (640, 480), "white")
+        draw = ImageDraw.Draw(screenshot)
+        for y in range(20, 460, 24):
+            draw.text((20, y), "Lorem ipsum dolor sit amet, consectetur adipiscing elit", fill="black")
+        
+        cases = {
+            "blurry": Image.new("RGB", (320, 240), (40, 160, 40)),
+            "too_dark": _leafy_image(scale=0.12),
+            "no_vegetation": screenshot,
+        }
+        for issue, image in cases.items():
+            with self.subTest(issue=issue):
+                with self.assertRaises(QualityCheckError) as ctx:
+                    self.processor.preprocess_for_analysis(image)
+                self.assertIn(issue, ctx.exception.quality["issues"])
+    
+    def test_quality_gate_can_be_disabled(self):
+        """Test check_quality=False skips the gate."""
+        blurry = Image.new("RGB", (320, 240), (40, 160, 40))
+        
+        processed = self.processor.preprocess_for_analysis(blurry, enhance=False, check_quality=False)
+        
+        self.assertEqual(processed.size, (320, 240))
+    
+    def _leaf_with_lesions(self):
+        """2000x1500 leaf with small brown spots around (1600, 300) and soil along the bottom."""
+        image = _leafy_image((2000, 1500))
+        draw = ImageDraw.Draw(image)
+        for x, y in [(1550, 250), (1620, 330), (1700, 280), (1580, 400)]:
+            draw.ellipse([x, y, x + 20, y + 20], fill=(120, 70, 30))
+        draw.rectangle([0, 1350, 2000, 1500], fill=(110, 80, 50))
+        return image
+    
+    def test_rank_tiles_finds_lesions_not_soil(self):
+        """Test overlapping tiles cover the image and the lesion tile ranks first."""
+        tiles = self.processor.rank_tiles(self._leaf_with_lesions(), tile_size=512, overlap=0.25)
+        
+        self.assertEqual(max(tile["box"][2] for tile in tiles), 2000)
+        self.assertEqual(max(tile["box"][3] for tile in tiles), 1500)
+        left, top, right, bottom = tiles[0]["box"]
+        self.assertTrue(left <= 1600 < right and top <= 300 < bottom)
+        self.assertGreater(tiles[0]["score"], 0)
+        # Tiles with only healthy leaf or soil don't score
+        self.assertEqual(tiles[-1]["score"], 0)
+    
+    def test_prepare_lesion_views(self):
+        """Test lesion views are full-resolution top tiles plus a small overview."""
+        overview, tiles, tile_info = self.processor.prepare_lesion_views(
+            self._leaf_with_lesions(), enhance=False, top_k=2
+        )
+        
+        self.assertEqual(max(overview.size), 512)
+        self.assertEqual([tile.size for tile in tiles], [(512, 512), (512, 512)])
+        self.assertEqual([info["tile"] for info in tile_info], [1, 2])
+        self.assertGreaterEqual(tile_info[0]["score"], tile_info[1]["score"])
+        self.assertEqual(len(tile_info[0]["center"]), 2)
 
 class TestOpenAIClient(unittest.TestCase):
     """Test cases for OpenAIClient class."""
@@ -133,7 +407,7 @@ class TestOpenAIClient(unittest.TestCase):
         client = OpenAIClient(self.mock_api_key)
         
         self.assertIsInstance(client, OpenAIClient)
-        mock_openai.assert_called_once_with(api_key=self.mock_api_key)
+        mock_openai.assert_called_once_with(api_key=self.mock_api_key, max_retries=0)
     
     def test_prompt_generation(self):
         """Test prompt generation methods."""
@@ -156,6 +430,203 @@ class TestOpenAIClient(unittest.TestCase):
             self.assertIn("bệnh", disease_prompt.lower())
             self.assertIn("sinh trưởng", growth_prompt.lower())
             self.assertIn("toàn diện", complete_prompt.lower())
+    
+    def test_sections_prompt_contains_only_requested_sections(self):
+        """Test the combined prompt covers exactly the requested sections."""
+        with patch('core.openai_client.openai.OpenAI'):
+            client = OpenAIClient(self.mock_api_key)
+        
+        prompt = client._get_sections_prompt(["plant_identification", "growth_analysis"])
+        
+        self.assertIn('"plant_identification"', prompt)
+        self.assertIn('"growth_analysis"', prompt)
+        self.assertNotIn('"disease_detection"', prompt)
+        self.assertIn("JSON", prompt)
+    
+    def _completion(self, content, prompt_tokens=1000, completion_tokens=200):
+        response = Mock()
+        response.choices = [Mock(message=Mock(content=content))]
+        response.usage = Mock(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                              total_tokens=prompt_tokens + completion_tokens,
+                              prompt_tokens_details=None)
+        return response
+    
+    def _routed_analysis(self, *replies):
+        """Run a tiered analysis where the model returns ``replies`` in order."""
+        with patch('core.openai_client.openai.OpenAI'):
+            client = OpenAIClient(self.mock_api_key)
+        client.client.chat.completions.create.side_effect = [self._completion(reply) for reply in replies]
+        client._get_chromadb_context = Mock(return_value=[])
+        
+        settings = openai_client_module.config
+        with patch.object(settings, "MODEL_ROUTING", "tiered"), \
+                patch.object(settings, "OPENAI_MODEL", "gpt-4o"), \
+                patch.object(settings, "ROUTING_FIRST_PASS_MODEL", "gpt-4o-mini"), \
+                patch.object(settings, "CONFIDENCE_THRESHOLD", 0.7), \
+                patch.object(settings, "ROUTING_ESCALATE_ON_DISEASE", True):
+            result = client.analyze_plant_image(b"image", "complete")
+        return result, client.client.chat.completions.create.call_args_list
+    
+    def test_routing_keeps_confident_first_pass(self):
+        """Test a confident, healthy first pass isn't escalated."""
+        result, calls = self._routed_analysis('{"confidence": 0.9, "disease_detected": false}')
+        
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(calls[0].kwargs["model"], "gpt-4o-mini")
+        self.assertEqual(calls[0].kwargs["messages"][0]["content"][1]["image_url"]["detail"], "low")
+        self.assertEqual(result["model_used"], "gpt-4o-mini")
+        self.assertEqual(result["routing"]["decision"], "first_pass")
+        self.assertAlmostEqual(result["routing"]["cost_usd"], (1000 * 0.15 + 200 * 0.60) / 1_000_000)
+    
+    def test_routing_escalates_low_confidence(self):
+        """Test a first pass below CONFIDENCE_THRESHOLD is redone with the full model."""
+        result, calls = self._routed_analysis(
+            '```json\n{"confidence": 55, "disease_detected": false}\n```', '{"plant_type": "Cà chua"}'
+        )
+        
+        self.assertEqual([call.kwargs["model"] for call in calls], ["gpt-4o-mini", "gpt-4o"])
+        self.assertEqual(result["model_used"], "gpt-4o")
+        self.assertEqual(result["analysis"], '{"plant_type": "Cà chua"}')
+        self.assertEqual(result["routing"]["reason"], "low_confidence")
+        self.assertEqual(len(result["routing"]["passes"]), 2)
+    
+    def test_routing_escalates_detected_disease(self):
+        """Test a confident first pass that finds disease is still escalated."""
+        result, calls = self._routed_analysis(
+            '{"confidence": 0.95, "disease_detected": true}', '{"health_status": "bệnh"}'
+        )
+        
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(result["routing"]["decision"], "escalated")
+        self.assertEqual(result["routing"]["reason"], "disease_detected")
+    
+    def test_usage_and_max_tokens_per_analysis_type(self):
+        """Test a result reports the tokens and cost of its calls, and max_tokens follows the analysis type."""
+        result, calls = self._routed_analysis(
+            '{"confidence": 0.4, "disease_detected": false}', '{"health_status": "khỏe mạnh"}'
+        )
+        
+        self.assertEqual(calls[0].kwargs["max_tokens"], openai_client_module.config.max_tokens_for("complete"))
+        usage = result["usage"]
+        self.assertEqual(usage["calls"], 2)
+        self.assertEqual(usage["total_tokens"], 2400)
+        self.assertAlmostEqual(usage["cost_usd"], result["routing"]["cost_usd"])
+        
+        settings = openai_client_module.config
+        with patch.object(settings, "MAX_TOKENS_BY_TYPE", {"plant_identification": 300, "growth_analysis": 500}):
+            self.assertEqual(settings.max_tokens_for("plant_identification"), 300)
+            self.assertEqual(settings.max_tokens_for("growth_analysis+plant_identification"), 800)
+            self.assertEqual(settings.max_tokens_for("unknown"), settings.MAX_TOKENS)
+    
+    def test_image_tokens_follow_detail_and_size(self):
+        """Test image token counts use the model's tiling of the image rather than a flat estimate."""
+        def encoded(size):
+            buffer = io.BytesIO()
+            Image.new("RGB", size).save(buffer, format="JPEG")
+            return base64.b64encode(buffer.getvalue()).decode("ascii")
+        
+        self.assertEqual(openai_client_module.image_tokens(encoded((1024, 768))), 765)
+        self.assertEqual(openai_client_module.image_tokens(encoded((4000, 3000))), 765)
+        self.assertEqual(openai_client_module.image_tokens(encoded((512, 512))), 255)
+        self.assertEqual(openai_client_module.image_tokens(encoded((1024, 768)), "low"), 85)
+        self.assertEqual(openai_client_module.image_tokens("not-an-image"), openai_client_module.IMAGE_TOKEN_ESTIMATE)
+    
+    def test_request_settings_reach_model_call(self):
+        """Test a client given request settings uses their model, image detail and token cap."""
+        settings = openai_client_module.config
+        with patch.object(settings, "ALLOWED_MODELS", ["gpt-4o", "gpt-4o-mini"]), \
+                patch.object(settings, "MODEL_ROUTING", "tiered"):
+            request = settings.with_overrides(detail="low", model="gpt-4o-mini", max_tokens=200)
+        with patch('core.openai_client.openai.OpenAI'):
+            client = OpenAIClient(self.mock_api_key, settings=request)
+        client.client.chat.completions.create.return_value = self._completion('{"plant_type": "Cà chua"}')
+        client._get_chromadb_context = Mock(return_value=[])
+        
+        result = client.analyze_plant_image(b"image", "complete")
+        
+        kwargs = client.client.chat.completions.create.call_args.kwargs
+        self.assertEqual(kwargs["model"], "gpt-4o-mini")
+        self.assertEqual(kwargs["max_tokens"], 200)
+        self.assertEqual(kwargs["messages"][0]["content"][1]["image_url"]["detail"], "low")
+        self.assertEqual(result["routing"]["decision"], "direct")
+        self.assertEqual(ImageProcessor(settings=settings.with_overrides(max_image_size=1)).max_size,
+                         min(settings.MIN_REQUEST_IMAGE_SIZE, settings.MAX_IMAGE_SIZE))
+    
+    def test_preencoded_images_are_not_timed_as_encode_again(self):
+        """Test base64 of worker-encoded bytes is its own stage, so encoding is counted once per request."""
+        with patch('core.openai_client.openai.OpenAI'):
+            client = OpenAIClient(self.mock_api_key)
+        client.client.chat.completions.create.return_value = self._completion('{"overall_health": "bệnh"}')
+        client._get_chromadb_context = Mock(return_value=[])
+        
+        with patch.object(openai_client_module.config, "MODEL_ROUTING", "direct"):
+            with stages_module.collect_stage_timings() as from_bytes:
+                client.analyze_plant_image(b"image", "disease_detection")
+            with stages_module.collect_stage_timings() as from_image:
+                client.analyze_plant_image(Image.new("RGB", (8, 8)), "disease_detection")
+        
+        self.assertIn("base64", from_bytes)
+        self.assertNotIn("encode", from_bytes)
+        self.assertIn("encode", from_image)
+    
+    def test_multi_image_request_sends_one_completion(self):
+        """Test several photos go out as image parts of one request with a single prompt."""
+        with patch('core.openai_client.openai.OpenAI'):
+            client = OpenAIClient(self.mock_api_key)
+        client.client.chat.completions.create.return_value = self._completion('{"overall_health": "bệnh"}')
+        client._get_chromadb_context = Mock(return_value=[])
+        
+        with patch.object(openai_client_module.config, "MODEL_ROUTING", "direct"):
+            result = client.analyze_plant_images(
+                [b"leaf", b"whole", b"underside"], "disease_detection", image_numbers=[1, 2, 4]
+            )
+        
+        client.client.chat.completions.create.assert_called_once()
+        content = client.client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        self.assertEqual([part["type"] for part in content], ["text", "image_url", "image_url", "image_url"])
+        self.assertIn("ảnh số 1, 2, 4", content[0]["text"])
+        client._get_chromadb_context.assert_called_once()
+        self.assertTrue(result["success"])
+        self.assertEqual(result["image_count"], 3)
+    
+    def test_lesion_tiles_request(self):
+        """Test lesion tile mode sends a low-detail overview and located tiles with the disease prompt."""
+        with patch('core.openai_client.openai.OpenAI'):
+            client = OpenAIClient(self.mock_api_key)
+        client.client.chat.completions.create.return_value = self._completion('{"overall_health": "bệnh"}')
+        client._get_chromadb_context = Mock(return_value=[])
+        tile_info = [
+            {"tile": 1, "box": [1536, 0, 2048, 512], "center": [0.9, 0.17], "score": 0.02},
+            {"tile": 2, "box": [0, 1024, 512, 1536], "center": [0.13, 0.83], "score": 0.01},
+        ]
+        
+        settings = openai_client_module.config
+        with patch.object(settings, "MODEL_ROUTING", "direct"), patch.object(settings, "LESION_TILE_DETAIL", "high"):
+            result = client.analyze_lesion_tiles(b"overview", [b"tile-1", b"tile-2"], tile_info)
+        
+        content = client.client.chat.completions.create.call_args.kwargs["messages"][0]["content"]
+        self.assertEqual([part["image_url"]["detail"] for part in content[1:]], ["low", "high", "high"])
+        self.assertIn("90% chiều ngang, 17% chiều dọc", content[0]["text"])
+        self.assertIn("bệnh", content[0]["text"])
+        self.assertEqual(result["analysis_type"], "disease_detection")
+        self.assertEqual(result["lesion_tiles"], tile_info)
+    
+    def test_parse_triage(self):
+        """Test reading the first pass's confidence and disease flag."""
+        self.assertEqual(parse_triage('{"confidence": 0.8, "disease_detected": false}'), (0.8, False))
+        self.assertEqual(parse_triage('Kết quả: {"confidence": "85", "disease_detected": "true"}'), (0.85, True))
+        self.assertEqual(parse_triage("Không có JSON"), (None, None))
+    
+    def test_normalize_sections(self):
+        """Test section validation, de-duplication and ordering."""
+        self.assertEqual(
+            normalize_sections(["growth_analysis", " plant_identification", "growth_analysis"]),
+            ["plant_identification", "growth_analysis"]
+        )
+        with self.assertRaises(ValueError):
+            normalize_sections(["soil_analysis"])
+        with self.assertRaises(ValueError):
+            normalize_sections([""])
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,16 +1,25 @@
 """
 Tests for the FastAPI application.
 """
+import json
+import shutil
+import tempfile
+import time
 import unittest
 import sys
 from pathlib import Path
+import numpy as np
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from unittest.mock import patch, Mock
 
 # Add src to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
 
-from api.main import app
+from api.main import app, upstream_prober, metrics, tracing, BudgetExceededError
+from api import responses as responses_module
+from api.responses import CompressionMiddleware, FastJSONResponse, dumps
+from core.health import UpstreamProber, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
 
 class TestAPI(unittest.TestCase):
     """Test cases for FastAPI application."""
@@ -18,6 +27,8 @@ class TestAPI(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures."""
         self.client = TestClient(app)
+        # Health results are cached between requests
+        upstream_prober.reset()
     
     def test_root_endpoint(self):
         """Test root endpoint."""
@@ -38,6 +49,8 @@ class TestAPI(unittest.TestCase):
         self.assertIn("project_name", data)
         self.assertIn("version", data)
         self.assertIn("supported_analysis_types", data)
+        self.assertIn("max_image_size", data["upload"])
+        self.assertTrue(data["upload"]["preferred_format"].startswith("image/"))
     
     @patch('api.main.analyzer')
     def test_health_endpoint_healthy(self, mock_analyzer):
@@ -64,6 +77,48 @@ class TestAPI(unittest.TestCase):
         data = response.json()
         self.assertEqual(data["status"], "degraded")
     
+    @patch('api.main.analyzer')
+    def test_readiness_uses_cached_probe(self, mock_analyzer):
+        """Test repeated readiness checks don't re-probe OpenAI within the TTL."""
+        mock_analyzer.test_connection.return_value = {"success": True}
+        
+        for _ in range(3):
+            response = self.client.get("/health/ready")
+            self.assertEqual(response.status_code, 200)
+        
+        self.assertEqual(mock_analyzer.test_connection.call_count, 1)
+    
+    def test_liveness_endpoint(self):
+        """Test liveness doesn't depend on the analyzer or upstreams."""
+        with patch('api.main.analyzer', None):
+            response = self.client.get("/health/live")
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], "alive")
+    
+    @patch('api.main.analyzer')
+    def test_health_details_endpoint(self, mock_analyzer):
+        """Test diagnostics report the last probe latency."""
+        mock_analyzer.test_connection.return_value = {"success": True}
+        self.client.get("/health/ready")
+        
+        response = self.client.get("/health/details")
+        
+        self.assertEqual(response.status_code, 200)
+        upstream = response.json()["upstream"]
+        self.assertTrue(upstream["healthy"])
+        self.assertIsNotNone(upstream["last_latency_ms"])
+    
+    @unittest.skipUnless(metrics.is_available(), "prometheus_client not installed")
+    def test_metrics_endpoint(self):
+        """Test the Prometheus endpoint exposes stage latency histograms."""
+        metrics.observe_stage("model_call", 1.5, "complete")
+        
+        response = self.client.get("/metrics")
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('plant_analysis_stage_seconds_count{analysis_type="complete",stage="model_call"}', response.text)
+    
     def test_analysis_types_endpoint(self):
         """Test analysis types endpoint.""" 
         with patch('api.main.analyzer') as mock_analyzer:
@@ -131,6 +186,276 @@ class TestAnalysisEndpoints(unittest.TestCase):
         self.assertEqual(response.status_code, 400)
         data = response.json()
         self.assertIn("File must be an image", data["detail"])
+    
+    @patch('api.main.analyzer')
+    def test_analyze_sections_rejects_unknown_section(self, mock_analyzer):
+        """Test the multi-section endpoint validates section names."""
+        files = {"file": ("plant.jpg", b"fake-image", "image/jpeg")}
+        
+        response = self.client.post(
+            "/analyze/sections", files=files, data={"sections": "plant_identification,soil"}
+        )
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("soil", response.json()["detail"])
+    
+    @patch('api.main.analyzer')
+    def test_analyze_multi_validates_files(self, mock_analyzer):
+        """Test the multi-image endpoint limits the photo count and checks every file."""
+        too_many = [("files", (f"plant{i}.jpg", b"fake-image", "image/jpeg")) for i in range(20)]
+        mixed = [
+            ("files", ("leaf.jpg", b"fake-image", "image/jpeg")),
+            ("files", ("notes.txt", b"not an image", "text/plain")),
+        ]
+        
+        response = self.client.post("/analyze/multi", files=too_many)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("images per request", response.json()["detail"])
+        
+        response = self.client.post("/analyze/multi", files=mixed)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("File must be an image", response.json()["detail"])
+    
+    @patch('api.main.analyzer')
+    def test_analyze_refused_when_budget_exhausted(self, mock_analyzer):
+        """Test an API key over its daily budget gets 429 before its upload is analyzed."""
+        files = {"file": ("plant.jpg", b"fake-image", "image/jpeg")}
+        
+        with patch('api.main.check_budget', side_effect=BudgetExceededError("field-team", {})) as check:
+            response = self.client.post("/analyze/disease", files=files, headers={"X-API-Key": "field-team"})
+        
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Retry-After", response.headers)
+        check.assert_called_once_with("field-team")
+        mock_analyzer.analyze_plant_image.assert_not_called()
+    
+    @patch('api.main.analyzer')
+    def test_analyze_rejects_disallowed_overrides(self, mock_analyzer):
+        """Test invalid per-request overrides get 400 before the upload is analyzed."""
+        files = {"file": ("plant.jpg", b"fake-image", "image/jpeg")}
+        
+        for overrides in ({"detail": "ultra"}, {"model": "not-an-allowed-model"}):
+            with self.subTest(overrides=overrides):
+                response = self.client.post("/analyze/disease", files=files, data=overrides)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(overrides)), response.json()["detail"])
+        mock_analyzer.analyze_preprocessed_image.assert_not_called()
+        
+        overrides = self.client.get("/info").json()["overrides"]
+        self.assertEqual(overrides["detail"], ["low", "high", "auto"])
+        self.assertLessEqual(overrides["max_image_size"]["min"], overrides["max_image_size"]["max"])
+    
+    @patch('api.main.analyzer')
+    def test_unknown_api_keys_are_refused(self, mock_analyzer):
+        """Test only keys listed in API_KEYS may analyze once it is set."""
+        from api.main import config
+        files = {"file": ("plant.jpg", b"fake-image", "image/jpeg")}
+        
+        with patch.object(config, "API_KEYS", ["field-team"]), \
+                patch('api.main.check_budget', side_effect=BudgetExceededError("field-team", {})):
+            missing = self.client.post("/analyze/disease", files=files)
+            unknown = self.client.post("/analyze/disease", files=files, headers={"X-API-Key": "fresh-key"})
+            known = self.client.post("/analyze/disease", files=files, headers={"X-API-Key": "field-team"})
+            usage = self.client.get("/usage", headers={"X-API-Key": "fresh-key"})
+            export = self.client.post("/records/export", headers={"X-API-Key": "fresh-key"})
+        
+        self.assertEqual(
+            (missing.status_code, unknown.status_code, usage.status_code, export.status_code),
+            (401, 401, 401, 401)
+        )
+        # A listed key gets as far as its budget check
+        self.assertEqual(known.status_code, 429)
+        mock_analyzer.analyze_preprocessed_image.assert_not_called()
+    
+    def test_usage_reports_caller_key(self):
+        """Test the usage endpoint reports on the caller's API key, or the anonymous key without one."""
+        with patch('api.main.budget_status', side_effect=lambda key: {"key": key}):
+            keyed = self.client.get("/usage", headers={"X-API-Key": "field-team"})
+            anonymous = self.client.get("/usage")
+        
+        self.assertEqual(keyed.json(), {"key": "field-team"})
+        self.assertEqual(anonymous.json(), {"key": "anonymous"})
+    
+    def test_prescreen_unavailable_without_model(self):
+        """Test the pre-screen endpoint answers 503 until a model is trained."""
+        files = {"file": ("plant.jpg", b"fake-image", "image/jpeg")}
+        
+        with patch('api.main.get_prescreen_model', return_value=None):
+            response = self.client.post("/prescreen", files=files)
+        
+        self.assertEqual(response.status_code, 503)
+    
+    def test_prescreen_returns_provisional_verdict(self):
+        """Test the pre-screen endpoint decodes the upload and returns the model's verdict."""
+        import io
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new("RGB", (2000, 1500), (40, 160, 40)).save(buffer, format="JPEG")
+        model = Mock()
+        model.predict.return_value = {"health_class": "healthy", "confidence": 0.93}
+        
+        with patch('api.main.get_prescreen_model', return_value=model):
+            response = self.client.post("/prescreen", files={"file": ("plant.jpg", buffer.getvalue(), "image/jpeg")})
+            invalid = self.client.post("/prescreen", files={"file": ("plant.jpg", b"fake-image", "image/jpeg")})
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"provisional": True, "health_class": "healthy", "confidence": 0.93})
+        # The model sees the image as analysis prepares it
+        self.assertLessEqual(max(model.predict.call_args.args[0].size), 1024)
+        self.assertEqual(invalid.status_code, 400)
+
+class TestUpstreamProber(unittest.TestCase):
+    """Test cases for the cached upstream prober."""
+
+    def test_circuit_opens_after_repeated_failures(self):
+        """Test the circuit opens and probing pauses until the reset timeout."""
+        probe = Mock(return_value={"success": False, "error": "timeout"})
+        prober = UpstreamProber(probe, ttl=0.001, failure_threshold=2, reset_timeout=60)
+
+        prober.check(force=True)
+        prober.check(force=True)
+        status = prober.check()
+
+        self.assertEqual(status["circuit"], CIRCUIT_OPEN)
+        self.assertFalse(status["healthy"])
+        self.assertEqual(probe.call_count, 2)
+
+    def test_half_open_trial_closes_circuit(self):
+        """Test a successful trial probe after the reset timeout closes the circuit."""
+        probe = Mock(return_value={"success": False, "error": "timeout"})
+        prober = UpstreamProber(probe, ttl=60, failure_threshold=1, reset_timeout=0.001)
+        prober.check(force=True)
+
+        probe.return_value = {"success": True}
+        time.sleep(0.01)
+        self.assertEqual(prober.status()["circuit"], CIRCUIT_HALF_OPEN)
+        status = prober.check()
+
+        self.assertTrue(status["healthy"])
+        self.assertEqual(status["consecutive_failures"], 0)
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for stage timing collection."""
+
+    def test_collected_timings_are_not_recorded(self):
+        """Test timings collected for another process are summed per stage."""
+        with metrics.collect_stage_timings() as timings:
+            with metrics.track_stage("resize"):
+                pass
+            metrics.observe_stage("resize", 0.5)
+
+        self.assertEqual(list(timings), ["resize"])
+        self.assertGreaterEqual(timings["resize"], 0.5)
+
+@unittest.skipUnless(tracing.is_available(), "opentelemetry-sdk not installed")
+class TestTracing(unittest.TestCase):
+    """Test cases for request tracing with the file exporter."""
+
+    def setUp(self):
+        """Write spans to a temporary file."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.span_file = str(Path(self.temp_dir) / "spans.jsonl")
+        tracing.setup_tracing("file", self.span_file)
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        """Disable tracing and remove the span file."""
+        tracing.shutdown_tracing()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_trace_id_header_matches_exported_spans(self):
+        """Test the response's trace id identifies the request and its stage spans."""
+        response = self.client.get("/health/live")
+        trace_id = response.headers.get(tracing.TRACE_ID_HEADER)
+        with metrics.track_stage("decode", "complete"):
+            pass
+        tracing.flush_tracing()
+
+        with open(self.span_file, encoding="utf-8") as f:
+            spans = [json.loads(line) for line in f]
+
+        self.assertRegex(trace_id, r"^[0-9a-f]{32}$")
+        request_span = next(span for span in spans if span["name"] == "GET /health/live")
+        self.assertEqual(request_span["context"]["trace_id"], f"0x{trace_id}")
+        self.assertIn("stage.decode", [span["name"] for span in spans])
+
+class TestResponses(unittest.TestCase):
+    """Test cases for response encoding and compression."""
+
+    def test_dumps_handles_tuples_and_vietnamese(self):
+        """Test that tuples and non-ASCII text serialize without escaping."""
+        body = dumps({"size": (800, 600), "health_status": "Bệnh đốm lá"}, backend="json")
+
+        self.assertEqual(body.decode("utf-8"), '{"size":[800,600],"health_status":"Bệnh đốm lá"}')
+
+    def test_fast_json_response_render(self):
+        """Test FastJSONResponse renders to compact JSON bytes."""
+        response = FastJSONResponse({"success": True})
+
+        self.assertIn(b'"success":true', response.body)
+        self.assertEqual(response.media_type, "application/json")
+
+    def test_dumps_writes_non_finite_floats_as_null(self):
+        """Test both backends write NaN and infinities as null instead of failing."""
+        content = {"score": float("nan"), "bounds": (1.5, float("inf")), "mean": np.float64("nan")}
+
+        for backend in ("json", "orjson"):
+            with self.subTest(backend=backend):
+                self.assertEqual(json.loads(dumps(content, backend=backend)),
+                                 {"score": None, "bounds": [1.5, None], "mean": None})
+
+    def _compressed_client(self, preferred="gzip"):
+        compressed_app = FastAPI()
+        compressed_app.add_middleware(
+            CompressionMiddleware,
+            minimum_size=responses_module.config.RESPONSE_COMPRESSION_MIN_SIZE,
+            preferred=preferred
+        )
+        compressed_app.get("/large")(lambda: {"records": ["Bệnh đốm lá"] * 500})
+        compressed_app.get("/small")(lambda: {"success": True})
+        return TestClient(compressed_app)
+
+    def test_compression_negotiates_encoding(self):
+        """Test large responses use brotli when preferred and accepted, gzip otherwise."""
+        cases = [
+            ("gzip", "gzip, deflate, br", "gzip"),
+            ("brotli", "gzip, deflate, br", "br"),
+            ("brotli", "gzip", "gzip"),
+        ]
+        for preferred, accept_encoding, expected in cases:
+            with self.subTest(preferred=preferred, accept_encoding=accept_encoding):
+                response = self._compressed_client(preferred).get(
+                    "/large", headers={"Accept-Encoding": accept_encoding}
+                )
+
+                self.assertEqual(response.headers["content-encoding"], expected)
+                self.assertIn("Accept-Encoding", response.headers["vary"])
+                self.assertEqual(len(response.json()["records"]), 500)
+
+        with patch.object(responses_module, "brotli", None):
+            response = self._compressed_client("brotli").get("/large", headers={"Accept-Encoding": "br, gzip"})
+        self.assertEqual(response.headers["content-encoding"], "gzip")
+
+    def test_compression_passes_small_and_unaccepted_responses_through(self):
+        """Test responses below the minimum size, or for clients without gzip/br, are sent as-is."""
+        client = self._compressed_client()
+
+        small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+        identity = client.get("/large", headers={"Accept-Encoding": "identity"})
+
+        for response in (small, identity):
+            self.assertNotIn("content-encoding", response.headers)
+            self.assertNotIn("vary", response.headers)
+        self.assertEqual(small.json(), {"success": True})
+        self.assertEqual(len(identity.json()["records"]), 500)
+
+    def test_app_compresses_with_configured_minimum_size(self):
+        """Test the API installs the middleware with RESPONSE_COMPRESSION_MIN_SIZE."""
+        # The app imports the middleware through the src package
+        middleware = [m for m in app.user_middleware if m.cls.__name__ == "CompressionMiddleware"]
+
+        self.assertEqual(len(middleware), 1)
+        self.assertEqual(middleware[0].kwargs["minimum_size"], responses_module.config.RESPONSE_COMPRESSION_MIN_SIZE)
 
 if __name__ == "__main__":
     unittest.main()
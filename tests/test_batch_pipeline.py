@@ -0,0 +1,173 @@
+"""
+Tests for the directory-scan batch pipeline.
+"""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import Mock
+
+import numpy as np
+from PIL import Image
+
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from core.batch_pipeline import BatchAnalysisPipeline, iter_image_files
+from core.plant_analyzer import PlantAnalysisResult
+from core import stages as stages_module
+from core.stages import AnalysisStages, Stage, preprocess_image_file
+
+class TestBatchAnalysisPipeline(unittest.TestCase):
+    """Test cases for BatchAnalysisPipeline class."""
+
+    def setUp(self):
+        """Create a directory of small test images."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.image_dir = self.temp_dir / "survey"
+        self.image_dir.mkdir()
+        for i in range(4):
+            # Textured green, so the images pass the quality gate
+            pixels = np.random.default_rng(i).integers(0, 60, (48, 64, 3)) + (20, 130, 20)
+            Image.fromarray(pixels.astype(np.uint8)).save(self.image_dir / f"plant_{i}.jpg")
+        (self.image_dir / "notes.txt").write_text("not an image")
+
+        self.analyzer = Mock()
+        self.analyzer.analyze_preprocessed_image.side_effect = lambda image, analysis_type, image_info, priority=None, sections=None, image_features=None: (
+            PlantAnalysisResult({
+                "success": True,
+                "analysis": "Cây khỏe mạnh",
+                "analysis_type": analysis_type,
+                "model_used": "test-model"
+            })
+        )
+        self.output_path = str(self.temp_dir / "scan.jsonl")
+
+    def tearDown(self):
+        """Remove temporary files."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _pipeline(self):
+        return BatchAnalysisPipeline(
+            self.analyzer,
+            output_path=self.output_path,
+            preprocess_workers=2,
+            api_workers=2
+        )
+
+    def test_iter_image_files_filters_formats(self):
+        """Test only supported image files are discovered."""
+        files = list(iter_image_files(str(self.image_dir)))
+
+        self.assertEqual(len(files), 4)
+        self.assertTrue(all(f.endswith(".jpg") for f in files))
+
+    def test_run_writes_jsonl_and_resumes(self):
+        """Test results go to JSONL and a second run skips checkpointed images."""
+        stats = self._pipeline().run(iter_image_files(str(self.image_dir)))
+
+        self.assertEqual(stats["succeeded"], 4)
+        with open(self.output_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(len(records), 4)
+        self.assertIn("image_path", records[0])
+
+        resumed = self._pipeline().run(iter_image_files(str(self.image_dir)))
+
+        self.assertEqual(resumed["skipped"], 4)
+        self.assertEqual(resumed["completed"], 0)
+        self.assertEqual(self.analyzer.analyze_preprocessed_image.call_count, 4)
+
+    def test_resume_counts_this_runs_inputs_and_normalizes_paths(self):
+        """Test skipped counts only this run's checkpointed inputs, however their paths are written."""
+        files = sorted(iter_image_files(str(self.image_dir)))
+        self._pipeline().run(files[:3])
+
+        relative = [os.path.relpath(path) for path in files[1:]]
+        resumed = self._pipeline().run(relative)
+
+        self.assertEqual(resumed["skipped"], 2)
+        self.assertEqual(resumed["total"], 1)
+        self.assertEqual(self.analyzer.analyze_preprocessed_image.call_count, 4)
+
+class TestStages(unittest.TestCase):
+    """Test cases for the bounded analysis stages."""
+
+    def test_submit_blocks_when_stage_full(self):
+        """Test submitting to a full stage waits until a task finishes."""
+        release = threading.Event()
+        stage = Stage("test", ThreadPoolExecutor(max_workers=1), max_pending=2)
+        try:
+            stage.submit(release.wait)
+            stage.submit(release.wait)
+            self.assertEqual(stage.pending, 2)
+
+            third = threading.Thread(target=stage.submit, args=(lambda: None,))
+            third.start()
+            third.join(timeout=0.2)
+            self.assertTrue(third.is_alive())
+
+            release.set()
+            third.join(timeout=5)
+            self.assertFalse(third.is_alive())
+        finally:
+            release.set()
+            stage.shutdown()
+
+    def test_run_limits_concurrency(self):
+        """Test async runs never exceed the stage's pending bound."""
+        stage = Stage("test", ThreadPoolExecutor(max_workers=4), max_pending=2)
+        peak = []
+
+        def task():
+            peak.append(stage.pending)
+            return True
+
+        async def run_all():
+            return await asyncio.gather(*[stage.run(task) for _ in range(6)])
+
+        try:
+            self.assertEqual(asyncio.run(run_all()), [True] * 6)
+            self.assertLessEqual(max(peak), 2)
+            self.assertEqual(stage.pending, 0)
+        finally:
+            stage.shutdown()
+
+    def test_analyze_reports_preprocessing_failure(self):
+        """Test a preprocessing error becomes a failed result without a model call."""
+        analyzer = Mock()
+        stages = AnalysisStages(preprocess_workers=1, api_workers=1)
+        try:
+            result = asyncio.run(stages.analyze(analyzer, "/nonexistent/plant.jpg"))
+        finally:
+            stages.shutdown()
+
+        self.assertFalse(result.success)
+        self.assertIn("Preprocessing failed", result.error)
+        analyzer.analyze_preprocessed_image.assert_not_called()
+
+    def test_worker_applies_submitter_settings(self):
+        """Test preprocessing workers use the settings passed by the submitter, not their own."""
+        temp_dir = Path(tempfile.mkdtemp())
+        try:
+            path = temp_dir / "plant.png"
+            pixels = np.random.default_rng(0).integers(0, 60, (600, 800, 3)) + (20, 130, 20)
+            Image.fromarray(pixels.astype(np.uint8)).save(path)
+            request = stages_module.config.with_overrides(max_image_size=300)
+
+            payload = preprocess_image_file(str(path), False, False, request)
+            default = preprocess_image_file(str(path), False, False)
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self.assertEqual(max(payload["image_info"]["size"]), max(300, request.MIN_REQUEST_IMAGE_SIZE))
+        self.assertEqual(max(default["image_info"]["size"]), min(800, stages_module.config.MAX_IMAGE_SIZE))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests for settings validation, hot reload and per-request overrides.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils import config as config_module
+from utils.config import Config, ConfigWatcher, current_settings, use_settings
+
+class TestConfig(unittest.TestCase):
+    """Test cases for Config."""
+
+    def setUp(self):
+        """Set up a settings file in a temporary directory."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = Path(self.temp_dir) / "settings.env"
+        self.path.write_text("MAX_IMAGE_SIZE=1024\nTEMPERATURE=0.3\n", encoding="utf-8")
+        # Only the file counts, not variables of the test process
+        self.process_env = patch.object(config_module, "_PROCESS_ENV", {})
+        self.process_env.start()
+
+    def tearDown(self):
+        """Remove temporary files."""
+        self.process_env.stop()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _settings(self, **env) -> Config:
+        return Config({"CONFIG_FILE": str(self.path), "MAX_IMAGE_SIZE": "1024", **env})
+
+    def test_invalid_values_name_the_variable(self):
+        """Test malformed or out-of-range values are rejected with the variable's name."""
+        for env, message in [
+            ({"MAX_IMAGE_SIZE": "large"}, "MAX_IMAGE_SIZE must be an integer"),
+            ({"TEMPERATURE": "3"}, "TEMPERATURE must be at most 2"),
+            ({"IMAGE_DETAIL": "medium"}, "IMAGE_DETAIL must be one of low, high, auto"),
+            ({"QUALITY_GATE_ENABLED": "yes"}, "QUALITY_GATE_ENABLED must be true or false"),
+            ({"MAX_TOKENS_BY_TYPE": "[400]"}, "MAX_TOKENS_BY_TYPE must be a JSON dict"),
+        ]:
+            with self.subTest(env=env):
+                with self.assertRaises(ValueError) as raised:
+                    self._settings(**env)
+                self.assertIn(message, str(raised.exception))
+
+    def test_overrides_are_clamped_to_server_limits(self):
+        """Test request overrides stay within the server's limits and leave the base settings alone."""
+        settings = self._settings(MIN_REQUEST_IMAGE_SIZE="256", OPENAI_MODEL="gpt-4o",
+                                  ALLOWED_MODELS="gpt-4o,gpt-4o-mini", MODEL_ROUTING="tiered")
+
+        larger = settings.with_overrides(max_image_size=4096, max_tokens=100000)
+        self.assertEqual(larger.MAX_IMAGE_SIZE, 1024)
+        self.assertEqual(larger.max_tokens_for("complete"), settings.max_tokens_for("complete"))
+
+        cheaper = settings.with_overrides(max_image_size=64, detail="LOW", model="GPT-4o-mini", max_tokens=300)
+        self.assertEqual(cheaper.MAX_IMAGE_SIZE, 256)
+        self.assertEqual(cheaper.IMAGE_DETAIL, "low")
+        self.assertEqual((cheaper.OPENAI_MODEL, cheaper.MODEL_ROUTING), ("gpt-4o-mini", "single"))
+        self.assertEqual(cheaper.max_tokens_for("plant_identification"), 300)
+        self.assertNotEqual(cheaper.fingerprint(), settings.fingerprint())
+        self.assertEqual((settings.MAX_IMAGE_SIZE, settings.OPENAI_MODEL), (1024, "gpt-4o"))
+
+        for overrides in ({"detail": "ultra"}, {"model": "gpt-4.5"}):
+            with self.subTest(overrides=overrides), self.assertRaises(ValueError):
+                settings.with_overrides(**overrides)
+
+    def test_reload_applies_file_changes(self):
+        """Test a reload picks up the file and reports what changed."""
+        settings = self._settings()
+        self.path.write_text("MAX_IMAGE_SIZE=768\nTEMPERATURE=0.1\n", encoding="utf-8")
+
+        self.assertEqual(settings.reload(), ["MAX_IMAGE_SIZE", "TEMPERATURE"])
+        self.assertEqual((settings.MAX_IMAGE_SIZE, settings.TEMPERATURE), (768, 0.1))
+        self.assertEqual(settings.reload(), [])
+
+    def test_invalid_reload_keeps_running_settings(self):
+        """Test a malformed file is rejected as a whole, without applying its valid values."""
+        settings = self._settings()
+        self.path.write_text("MAX_IMAGE_SIZE=768\nTEMPERATURE=warm\n", encoding="utf-8")
+
+        with self.assertRaises(ValueError):
+            settings.reload()
+        self.assertEqual(settings.MAX_IMAGE_SIZE, 1024)
+
+        with patch.object(config_module, "config", settings):
+            self.assertEqual(config_module.reload_config(), [])
+
+    def test_watcher_reloads_when_file_changes(self):
+        """Test the watcher reloads the global settings only after the file is modified."""
+        settings = self._settings()
+        with patch.object(config_module, "config", settings):
+            watcher = ConfigWatcher(interval=1, path=str(self.path))
+            self.assertEqual(watcher.check(), [])
+
+            self.path.write_text("MAX_IMAGE_SIZE=512\n", encoding="utf-8")
+            os.utime(self.path, (0, 0))
+            self.assertEqual(watcher.check(), ["MAX_IMAGE_SIZE"])
+            self.assertEqual(settings.MAX_IMAGE_SIZE, 512)
+
+    def test_use_settings_scopes_current_settings(self):
+        """Test request settings are current only inside use_settings."""
+        request = self._settings().with_overrides(detail="low")
+
+        with use_settings(request):
+            self.assertIs(current_settings(), request)
+        self.assertIs(current_settings(), config_module.config)
+
+
+if __name__ == "__main__":
+    unittest.main()
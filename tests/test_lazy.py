@@ -0,0 +1,56 @@
+"""
+Tests for deferred imports of heavy dependencies.
+"""
+import json
+import subprocess
+import unittest
+import sys
+from pathlib import Path
+
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from utils import lazy as lazy_module
+from utils.lazy import LazyModule, lazy_import
+
+ROOT = Path(__file__).parent.parent
+
+class TestLazyImport(unittest.TestCase):
+    """Test cases for lazy_import."""
+
+    def test_missing_package_raises_import_error(self):
+        """Test optional dependencies can still fall back when they aren't installed."""
+        with self.assertRaises(ImportError):
+            lazy_import("not_an_installed_package")
+
+    def test_module_is_imported_on_first_use(self):
+        """Test the placeholder imports the module on first attribute access and is shared."""
+        name = "xml.dom.minidom"
+        sys.modules.pop(name, None)
+        lazy_module._modules.pop(name, None)
+
+        module = lazy_import(name)
+
+        self.assertIsInstance(module, LazyModule)
+        self.assertNotIn(name, sys.modules)
+        self.assertIs(lazy_import(name), module)
+        document = module.parseString("<leaf/>")
+        self.assertIn(name, sys.modules)
+        self.assertEqual(document.documentElement.tagName, "leaf")
+        self.assertIs(module.Document, sys.modules[name].Document)
+
+    def test_entry_modules_defer_heavy_dependencies(self):
+        """Test importing the analyzer and the API imports neither OpenCV, NumPy, scikit-learn nor OpenAI."""
+        code = (
+            "import sys, json; import src.core.plant_analyzer, src.api.main; "
+            "print(json.dumps([m for m in ('cv2', 'numpy', 'sklearn', 'openai', 'pandas') if m in sys.modules]))"
+        )
+        completed = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True
+        )
+
+        self.assertEqual(json.loads(completed.stdout.strip().splitlines()[-1]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+"""
+Tests for the local health pre-screen.
+"""
+import json
+import shutil
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from core import prescreen as prescreen_module
+from core import openai_client as openai_client_module
+from core.openai_client import OpenAIClient
+from core.plant_analyzer import PlantAnalysisResult
+from core.prescreen import (
+    FEATURE_NAMES, PreScreenModel, extract_features, load_jsonl_training_data, load_store_training_data,
+    prescreen_action
+)
+from core.result_store import ResultStore
+
+
+def _leaf_image(seed, lesions):
+    """Textured green leaf on soil, with large brown lesions if ``lesions``."""
+    rng = np.random.default_rng(seed)
+    pixels = np.stack([
+        rng.integers(20, 90, (240, 320)),
+        rng.integers(110, 210, (240, 320)),
+        rng.integers(20, 80, (240, 320)),
+    ], axis=-1).astype(np.uint8)
+    image = Image.fromarray(pixels)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 200, 320, 240), fill=(96, 72, 48))
+    for _ in range(int(rng.integers(6, 10)) if lesions else 0):
+        x, y, r = rng.integers(20, 300), rng.integers(20, 180), rng.integers(6, 14)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=(110, 70, 25))
+    return image
+
+
+def _training_set(count=8):
+    features, labels = [], []
+    for seed in range(count):
+        for label, lesions in (("healthy", False), ("diseased", True)):
+            features.append(extract_features(_leaf_image(seed, lesions)))
+            labels.append(label)
+    return features, labels
+
+
+class TestPreScreenModel(unittest.TestCase):
+    """Test cases for feature extraction and the pre-screen classifier."""
+
+    def setUp(self):
+        """Create a temporary directory for saved models."""
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        """Remove temporary files."""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_extract_features_shape(self):
+        """Test features have one finite value per name for any image mode and size."""
+        for image in (_leaf_image(0, True), Image.new("L", (40, 30), 128), Image.new("RGB", (3000, 2000), "black")):
+            features = extract_features(image)
+            self.assertEqual(features.shape, (len(FEATURE_NAMES),))
+            self.assertTrue(np.isfinite(features).all())
+
+    def test_train_predict_and_reload(self):
+        """Test a trained model separates healthy from spotted leaves and survives a save/load."""
+        features, labels = _training_set()
+        model = PreScreenModel.train(features, labels)
+
+        self.assertEqual(model.metadata["class_counts"], {"diseased": 8, "healthy": 8})
+        healthy = model.predict(_leaf_image(100, lesions=False))
+        diseased = model.predict(_leaf_image(100, lesions=True))
+        self.assertEqual(healthy["health_class"], "healthy")
+        self.assertEqual(diseased["health_class"], "diseased")
+        self.assertAlmostEqual(sum(healthy["probabilities"].values()), 1.0, places=3)
+
+        path = str(self.temp_dir / "prescreen.joblib")
+        model.save(path)
+        reloaded = PreScreenModel.load(path)
+        self.assertEqual(reloaded.predict_features(features[0]), model.predict_features(features[0]))
+
+        with patch.object(prescreen_module, "FEATURE_VERSION", prescreen_module.FEATURE_VERSION + 1):
+            with self.assertRaises(ValueError):
+                PreScreenModel.load(path)
+
+    def test_train_needs_two_classes(self):
+        """Test training on a single health class is refused."""
+        features, _ = _training_set(2)
+        with self.assertRaises(ValueError):
+            PreScreenModel.train(features, ["healthy"] * len(features))
+
+    def test_store_training_data(self):
+        """Test stored results with recorded features become labelled samples."""
+        store = ResultStore(str(self.temp_dir / "results.db"), batch_size=10, flush_interval=0)
+        try:
+            recorded = {"feature_version": prescreen_module.FEATURE_VERSION,
+                        "features": [0.5] * len(FEATURE_NAMES)}
+            store.save({"success": True, "health_status": "Khỏe mạnh", "prescreen": recorded})
+            store.save({"success": True, "health_status": "Bị bệnh đốm lá", "prescreen": recorded})
+            # Unusable: no verdict, no features, or features of another version
+            store.save({"success": True, "health_status": None, "prescreen": recorded})
+            store.save({"success": True, "health_status": "Khỏe mạnh"})
+            store.save({"success": True, "health_status": "Khỏe mạnh",
+                        "prescreen": {**recorded, "feature_version": -1}})
+
+            features, labels = load_store_training_data(store)
+        finally:
+            store.close()
+
+        self.assertEqual(sorted(labels), ["diseased", "healthy"])
+        self.assertEqual(len(features), 2)
+
+    def test_skipped_results_are_not_training_data(self):
+        """Test results the pre-screen answered itself aren't learned from again."""
+        skipped = OpenAIClient._prescreen_result(Mock(), {"confidence": 0.97}, "disease_detection")
+        record = PlantAnalysisResult(skipped).to_dict()
+        record["health_status"] = "Khỏe mạnh"
+        recorded = {"feature_version": prescreen_module.FEATURE_VERSION, "features": [0.5] * len(FEATURE_NAMES)}
+
+        store = ResultStore(str(self.temp_dir / "results.db"), batch_size=10, flush_interval=0)
+        try:
+            store.save({**record, "prescreen": recorded})
+            store.save({"success": True, "health_status": "Khỏe mạnh", "routing": {"decision": "prescreen_skipped"},
+                        "prescreen": recorded})
+            self.assertEqual(load_store_training_data(store), ([], []))
+        finally:
+            store.close()
+
+        image_path = self.temp_dir / "leaf.png"
+        _leaf_image(0, lesions=False).save(image_path)
+        jsonl = self.temp_dir / "scan.jsonl"
+        jsonl.write_text(json.dumps({**record, "image_path": str(image_path)}, ensure_ascii=False) + "\n",
+                         encoding="utf-8")
+        self.assertEqual(load_jsonl_training_data([str(jsonl)]), ([], []))
+
+
+class TestPreScreenRouting(unittest.TestCase):
+    """Test cases for routing on a confident healthy pre-screen verdict."""
+
+    HEALTHY = {"health_class": "healthy", "confidence": 0.97, "latency_ms": 4.2}
+
+    def _completion(self, content):
+        response = Mock()
+        response.choices = [Mock(message=Mock(content=content))]
+        response.usage = Mock(prompt_tokens=500, completion_tokens=100, total_tokens=600, prompt_tokens_details=None)
+        return response
+
+    def _analyze(self, action, analysis_type, prescreen, *replies):
+        with patch('core.openai_client.openai.OpenAI'):
+            client = OpenAIClient("test-api-key")
+        client.client.chat.completions.create.side_effect = [self._completion(reply) for reply in replies]
+        client._get_chromadb_context = Mock(return_value=[])
+
+        settings = openai_client_module.config
+        with patch.object(settings, "PRESCREEN_ACTION", action), \
+                patch.object(settings, "PRESCREEN_HEALTHY_CONFIDENCE", 0.9), \
+                patch.object(settings, "MODEL_ROUTING", "single"), \
+                patch.object(settings, "OPENAI_MODEL", "gpt-4o"), \
+                patch.object(settings, "ROUTING_FIRST_PASS_MODEL", "gpt-4o-mini"):
+            result = client.analyze_plant_image(b"image", analysis_type, prescreen=prescreen)
+        models = [call.kwargs["model"] for call in client.client.chat.completions.create.call_args_list]
+        return result, models
+
+    def test_prescreen_action(self):
+        """Test only confident healthy verdicts change routing."""
+        settings = prescreen_module.config
+        with patch.object(settings, "PRESCREEN_ACTION", "skip"), \
+                patch.object(settings, "PRESCREEN_HEALTHY_CONFIDENCE", 0.9):
+            self.assertEqual(prescreen_action(self.HEALTHY, "disease_detection"), "skip")
+            self.assertEqual(prescreen_action(self.HEALTHY, "complete"), "downgrade")
+            self.assertIsNone(prescreen_action({**self.HEALTHY, "confidence": 0.6}, "disease_detection"))
+            self.assertIsNone(prescreen_action({**self.HEALTHY, "health_class": "diseased"}, "complete"))
+            self.assertIsNone(prescreen_action(None, "complete"))
+
+    def test_skip_answers_without_model_call(self):
+        """Test "skip" answers disease detection from the pre-screen alone."""
+        result, models = self._analyze("skip", "disease_detection", self.HEALTHY)
+
+        self.assertEqual(models, [])
+        self.assertEqual(result["routing"]["decision"], "prescreen_skipped")
+        self.assertEqual(PlantAnalysisResult(result).get_health_status(), "khỏe mạnh")
+
+    def test_downgrade_uses_first_pass_model(self):
+        """Test "downgrade" keeps a first-pass answer without a confidence, and escalates on disease."""
+        result, models = self._analyze("downgrade", "complete", self.HEALTHY, '{"summary": "ok"}')
+        self.assertEqual(models, ["gpt-4o-mini"])
+        self.assertEqual(result["routing"]["decision"], "first_pass")
+
+        result, models = self._analyze(
+            "downgrade", "complete", self.HEALTHY, '{"disease_detected": true}', '{"summary": "bệnh"}'
+        )
+        self.assertEqual(models, ["gpt-4o-mini", "gpt-4o"])
+        self.assertEqual(result["routing"]["reason"], "disease_detected")
+
+    def test_unconfident_verdict_is_not_routed(self):
+        """Test an uncertain verdict leaves routing unchanged."""
+        result, models = self._analyze(
+            "skip", "disease_detection", {**self.HEALTHY, "confidence": 0.5}, '{"summary": "ok"}'
+        )
+
+        self.assertEqual(models, ["gpt-4o"])
+        self.assertEqual(result["routing"]["decision"], "direct")
+
+
+if __name__ == "__main__":
+    unittest.main()
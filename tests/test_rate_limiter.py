@@ -0,0 +1,153 @@
+"""
+Tests for the OpenAI request scheduler.
+"""
+import threading
+import time
+import unittest
+import sys
+from email.utils import formatdate
+from pathlib import Path
+
+import httpx
+import openai
+
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from core.rate_limiter import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, RequestScheduler, TokenBucket, parse_retry_after
+)
+
+
+def _api_error(error_class, status: int, headers=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return error_class("Upstream error", response=response, body=None)
+
+
+class TestTokenBucket(unittest.TestCase):
+    """Test cases for TokenBucket class."""
+
+    def test_wait_time_after_draining(self):
+        """Test an empty bucket reports the time to refill the requested amount."""
+        bucket = TokenBucket(per_minute=60)
+        now = bucket.updated
+        self.assertEqual(bucket.wait_time(60, now), 0.0)
+        bucket.take(60)
+        self.assertAlmostEqual(bucket.wait_time(2, now), 2.0, places=3)
+
+    def test_oversized_requests_wait_for_a_full_bucket(self):
+        """Test requests larger than the capacity don't wait forever."""
+        bucket = TokenBucket(per_minute=60)
+        self.assertEqual(bucket.wait_time(500, bucket.updated), 0.0)
+
+
+class TestRequestScheduler(unittest.TestCase):
+    """Test cases for RequestScheduler class."""
+
+    def _scheduler(self, **kwargs):
+        options = {"requests_per_minute": 0, "tokens_per_minute": 0, "max_retries": 3,
+                   "backoff_base": 0.001, "backoff_max": 1.0}
+        options.update(kwargs)
+        return RequestScheduler(**options)
+
+    def test_request_limit_delays_excess_requests(self):
+        """Test requests beyond the budget wait for the bucket to refill."""
+        scheduler = self._scheduler(requests_per_minute=1200)  # 20 per second
+        scheduler.requests.tokens = 0
+
+        waited = scheduler.acquire()
+
+        self.assertGreaterEqual(waited, 0.04)
+
+    def test_token_limit_and_settle(self):
+        """Test estimated tokens are charged up front and corrected afterwards."""
+        scheduler = self._scheduler(tokens_per_minute=6000)
+        scheduler.acquire(tokens=2000)
+        self.assertAlmostEqual(scheduler.tokens.tokens, 4000, delta=5)
+
+        scheduler.settle(2000, 500)
+
+        self.assertAlmostEqual(scheduler.tokens.tokens, 5500, delta=5)
+
+    def test_interactive_requests_go_first(self):
+        """Test a waiting interactive request is released before an earlier batch one."""
+        scheduler = self._scheduler()
+        scheduler.pause(0.2)
+        order = []
+
+        def request(name, priority):
+            scheduler.acquire(priority=priority)
+            order.append(name)
+
+        batch = threading.Thread(target=request, args=("batch", PRIORITY_BATCH))
+        interactive = threading.Thread(target=request, args=("interactive", PRIORITY_INTERACTIVE))
+        batch.start()
+        time.sleep(0.05)
+        interactive.start()
+        batch.join(2)
+        interactive.join(2)
+
+        self.assertEqual(order, ["interactive", "batch"])
+        self.assertEqual(scheduler.stats()["waiting"], 0)
+
+    def test_rate_limit_honours_retry_after(self):
+        """Test a 429 is retried after the server's Retry-After delay."""
+        scheduler = self._scheduler()
+        calls = []
+
+        def flaky():
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                raise _api_error(openai.RateLimitError, 429, {"retry-after-ms": "100"})
+            return "ok"
+
+        self.assertEqual(scheduler.call(flaky), "ok")
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(calls[1] - calls[0], 0.09)
+
+    def test_client_errors_are_not_retried(self):
+        """Test non-transient errors are raised immediately."""
+        scheduler = self._scheduler()
+        calls = []
+
+        def bad_request():
+            calls.append(1)
+            raise _api_error(openai.BadRequestError, 400)
+
+        with self.assertRaises(openai.BadRequestError):
+            scheduler.call(bad_request)
+        self.assertEqual(len(calls), 1)
+
+    def test_gives_up_after_max_retries(self):
+        """Test persistent server errors are retried max_retries times, then raised."""
+        scheduler = self._scheduler(max_retries=2)
+        calls = []
+
+        def failing():
+            calls.append(1)
+            raise _api_error(openai.InternalServerError, 503)
+
+        with self.assertRaises(openai.InternalServerError):
+            scheduler.call(failing)
+        self.assertEqual(len(calls), 3)
+
+    def test_long_retry_after_is_not_waited_out(self):
+        """Test a Retry-After beyond backoff_max fails instead of holding the caller."""
+        scheduler = self._scheduler(backoff_max=1.0)
+        error = _api_error(openai.RateLimitError, 429, {"retry-after": "120"})
+
+        self.assertIsNone(scheduler.retry_delay(error, 0))
+
+    def test_parse_retry_after(self):
+        """Test Retry-After header formats."""
+        self.assertEqual(parse_retry_after({"retry-after-ms": "250"}), 0.25)
+        self.assertEqual(parse_retry_after({"retry-after": "3"}), 3.0)
+        http_date = parse_retry_after({"retry-after": formatdate(time.time() + 10, usegmt=True)})
+        self.assertTrue(8 <= http_date <= 10)
+        self.assertIsNone(parse_retry_after({}))
+        self.assertIsNone(parse_retry_after({"retry-after": "soon"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
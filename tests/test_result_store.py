@@ -0,0 +1,270 @@
+"""
+Tests for the SQLite result store.
+"""
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from core.result_store import ResultStore, api_key_hash, migrate_json_results
+from core.exporter import export_results_snapshot, export_results_to_parquet, pa
+from core.analytics import AnalyticsEngine, summarize_results
+
+class TestResultStore(unittest.TestCase):
+    """Test cases for ResultStore class."""
+
+    def setUp(self):
+        """Set up a store in a temporary directory."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ResultStore(
+            str(Path(self.temp_dir) / "results.db"),
+            batch_size=10,
+            flush_interval=0
+        )
+
+    def tearDown(self):
+        """Close the store and remove temporary files."""
+        self.store.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _result(self, plant_type="Cà chua", health_status="Khỏe mạnh"):
+        return {
+            "success": True,
+            "analysis_type": "complete",
+            "plant_type": plant_type,
+            "health_status": health_status,
+            "recommendations": ["Tưới nước đều đặn"]
+        }
+
+    def test_save_returns_unique_ids(self):
+        """Test that saves in the same second get distinct record IDs."""
+        ids = {self.store.save(self._result()) for _ in range(5)}
+
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(self.store.count(), 5)
+
+    def test_get_by_id(self):
+        """Test looking up a buffered result by ID."""
+        record_id = self.store.save(self._result())
+
+        record = self.store.get(record_id)
+
+        self.assertEqual(record["id"], record_id)
+        self.assertEqual(record["plant_type"], "Cà chua")
+        self.assertIsNone(self.store.get("missing"))
+
+    def test_query_filters(self):
+        """Test indexed lookup by plant type, health status and time range."""
+        now = datetime.now()
+        self.store.save(self._result("Lúa", "Bệnh đạo ôn"), created_at=(now - timedelta(days=3)).timestamp())
+        self.store.save(self._result("Lúa"), created_at=now.timestamp())
+        self.store.save(self._result("Cà chua"), created_at=now.timestamp())
+
+        self.assertEqual(len(self.store.query(plant_type="Lúa")), 2)
+        self.assertEqual(len(self.store.query(health_status="Bệnh đạo ôn")), 1)
+        self.assertEqual(len(self.store.query(start=now - timedelta(days=1))), 2)
+        self.assertEqual(len(self.store.query(plant_type="Lúa", end=now - timedelta(days=1))), 1)
+
+    def test_iter_batches(self):
+        """Test iterating all results in bounded batches."""
+        self.store.save_many([self._result() for _ in range(25)])
+
+        batches = list(self.store.iter_batches(batch_size=10))
+
+        self.assertEqual([len(batch) for batch in batches], [10, 10, 5])
+        self.assertEqual(len({r["id"] for batch in batches for r in batch}), 25)
+
+    def test_migrate_json_results_is_idempotent(self):
+        """Test importing legacy JSON files twice does not duplicate records."""
+        legacy_dir = Path(self.temp_dir) / "legacy"
+        legacy_dir.mkdir()
+        for i in range(3):
+            result = self._result()
+            result["saved_at"] = datetime.now().isoformat()
+            with open(legacy_dir / f"plant_analysis_2024010{i}_120000.json", "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+
+        first = migrate_json_results(str(legacy_dir), store=self.store)
+        migrate_json_results(str(legacy_dir), store=self.store)
+
+        self.assertEqual(first, {"total": 3, "migrated": 3, "failed": 0})
+        self.assertEqual(self.store.count(), 3)
+
+@unittest.skipIf(pa is None, "pyarrow not installed")
+class TestParquetExport(unittest.TestCase):
+    """Test cases for Parquet export of stored results."""
+
+    def setUp(self):
+        """Set up a store with results of two analysis types."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ResultStore(str(Path(self.temp_dir) / "results.db"), flush_interval=0)
+        for analysis_type in ["complete", "disease_detection", "complete"]:
+            self.store.save({
+                "success": True,
+                "analysis_type": analysis_type,
+                "plant_type": "Lúa",
+                "health_status": "Bệnh đạo ôn",
+                "recommendations": ["Phun thuốc đặc trị"],
+                "image_info": {"size": [1024, 768], "mode": "RGB"},
+                "saved_at": "2024-01-31T12:00:00"
+            })
+
+    def tearDown(self):
+        """Close the store and remove temporary files."""
+        self.store.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_export_partitions_by_date_and_type(self):
+        """Test results are written to date/analysis_type partitions."""
+        output_dir = Path(self.temp_dir) / "export"
+
+        manifest = export_results_to_parquet(str(output_dir), store=self.store, batch_size=2)
+
+        self.assertEqual(manifest["rows"], 3)
+        self.assertTrue((output_dir / "date=2024-01-31" / "analysis_type=complete").is_dir())
+        self.assertTrue((output_dir / "date=2024-01-31" / "analysis_type=disease_detection").is_dir())
+
+    def test_snapshot_replaces_previous_export(self):
+        """Test each snapshot replaces the last one and reports paths relative to the export directory."""
+        export_dir = Path(self.temp_dir) / "exports"
+
+        export_results_snapshot(str(export_dir), store=self.store)
+        manifest = export_results_snapshot(str(export_dir), store=self.store, analysis_type="complete")
+
+        self.assertEqual(manifest["rows"], 2)
+        self.assertEqual(manifest["output_dir"], "records")
+        self.assertTrue(all(path.startswith("records/date=2024-01-31/analysis_type=complete/") for path in manifest["files"]))
+        self.assertEqual(sorted(path.relative_to(export_dir).as_posix() for path in export_dir.rglob("*.parquet")),
+                         manifest["files"])
+        self.assertEqual([path.name for path in export_dir.iterdir()], ["records"])
+
+class TestAnalytics(unittest.TestCase):
+    """Test cases for incremental aggregates and analytics."""
+
+    def setUp(self):
+        """Set up a store in a temporary directory."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ResultStore(str(Path(self.temp_dir) / "results.db"), flush_interval=0)
+
+    def tearDown(self):
+        """Close the store and remove temporary files."""
+        self.store.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_statistics_from_aggregates(self):
+        """Test counts, disease ranking and prevalence by region and tag."""
+        self.store.save({
+            "success": True, "analysis_type": "disease_detection", "plant_type": "Lúa",
+            "health_status": "Bệnh đạo ôn", "request_metadata": {"region": "Cần Thơ", "tags": ["vụ hè"]}
+        })
+        self.store.save({
+            "success": True, "analysis_type": "disease_detection", "plant_type": "Lúa",
+            "health_status": "Khỏe mạnh, không có bệnh", "request_metadata": {"region": "Cần Thơ"}
+        })
+        self.store.save({"success": False, "analysis_type": "complete", "error": "timeout"})
+        # Duplicate ID is ignored and must not be counted twice
+        self.store.save({"success": True, "plant_type": "Lúa", "health_status": "Khỏe mạnh"}, record_id="dup")
+        self.store.save({"success": True, "plant_type": "Lúa", "health_status": "Khỏe mạnh"}, record_id="dup")
+
+        stats = AnalyticsEngine(self.store).get_statistics()
+
+        self.assertEqual(stats["total_analyses"], 4)
+        self.assertEqual(stats["failed_analyses"], 1)
+        self.assertEqual(stats["health_classes"]["healthy"], 2)
+        self.assertEqual(stats["top_diseases"], {"Bệnh đạo ôn": 1})
+        self.assertEqual(stats["prevalence_by_region"][0]["prevalence"], 0.5)
+        self.assertEqual(stats["prevalence_by_tag"][0]["tag"], "vụ hè")
+
+    def test_failed_results_are_left_out_of_tag_prevalence(self):
+        """Test tag prevalence counts successful analyses only, like region prevalence."""
+        metadata = {"region": "Cần Thơ", "tags": ["vụ hè"]}
+        self.store.save({"success": True, "health_status": "Bệnh đạo ôn", "request_metadata": metadata})
+        self.store.save({"success": True, "health_status": "Khỏe mạnh", "request_metadata": metadata})
+        self.store.save({"success": False, "error": "timeout", "request_metadata": metadata})
+
+        stats = AnalyticsEngine(self.store).get_statistics()
+
+        self.assertEqual(stats["prevalence_by_tag"][0]["total"], 2)
+        self.assertEqual(stats["prevalence_by_tag"][0]["prevalence"], 0.5)
+        self.assertEqual(stats["prevalence_by_tag"][0]["prevalence"], stats["prevalence_by_region"][0]["prevalence"])
+
+    def test_tag_aggregates_without_success_are_rebuilt(self):
+        """Test a store created before tag aggregates had a success key is migrated on open."""
+        self.store.save({"success": False, "error": "timeout", "request_metadata": {"tags": ["vụ hè"]}})
+        self.store.close()
+        conn = sqlite3.connect(self.store.db_path)
+        conn.executescript(
+            "DROP TRIGGER trg_tags_aggregate; DROP TABLE tag_aggregates; "
+            "CREATE TABLE tag_aggregates (day TEXT NOT NULL, tag TEXT NOT NULL, health_class TEXT NOT NULL, "
+            "count INTEGER NOT NULL, PRIMARY KEY (day, tag, health_class));"
+        )
+        conn.close()
+
+        self.store = ResultStore(self.store.db_path, flush_interval=0)
+
+        self.assertEqual([row["success"] for row in self.store.read_tag_aggregates()], [0])
+
+    def test_usage_accumulates_per_key_and_day(self):
+        """Test model calls add up per API key and day, and other keys and days stay separate."""
+        call = {"prompt_tokens": 900, "completion_tokens": 200, "cached_tokens": 100,
+                "image_tokens": 765, "cost_usd": 0.004}
+        self.store.record_usage("field-team", "disease_detection", "gpt-4o", call)
+        self.store.record_usage("field-team", "disease_detection", "gpt-4o", call)
+        self.store.record_usage("field-team", "complete", "gpt-4o-mini", {"prompt_tokens": 50, "cost_usd": 0.001})
+        self.store.record_usage("other", "complete", "gpt-4o", call)
+        self.store.record_usage("field-team", "complete", "gpt-4o", call, at=datetime.now() - timedelta(days=1))
+
+        totals = self.store.usage_totals("field-team")
+
+        self.assertEqual(totals["calls"], 3)
+        self.assertEqual(totals["prompt_tokens"], 1850)
+        self.assertEqual(totals["total_tokens"], 2250)
+        self.assertEqual(totals["cached_tokens"], 200)
+        self.assertAlmostEqual(totals["cost_usd"], 0.009)
+        rows = self.store.read_usage_aggregates(start=datetime.now())
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(self.store.usage_totals("nobody")["calls"], 0)
+
+    def test_usage_is_stored_under_key_hashes(self):
+        """Test API keys are stored hashed, including usage recorded under plain keys before."""
+        self.store.record_usage("field-team", "complete", "gpt-4o", {"prompt_tokens": 50})
+        self.store.close()
+        conn = sqlite3.connect(self.store.db_path)
+        conn.executescript(
+            "ALTER TABLE usage_aggregates RENAME COLUMN key_hash TO api_key; "
+            "UPDATE usage_aggregates SET api_key = 'field-team';"
+        )
+        conn.close()
+
+        self.store = ResultStore(self.store.db_path, flush_interval=0)
+        self.store.record_usage("field-team", "complete", "gpt-4o", {"prompt_tokens": 50})
+
+        self.assertEqual(self.store.usage_totals("field-team")["prompt_tokens"], 100)
+        self.assertEqual([row["key_hash"] for row in self.store.read_usage_aggregates()], [api_key_hash("field-team")])
+        self.store.close()
+        with open(self.store.db_path, "rb") as f:
+            self.assertNotIn(b"field-team", f.read())
+
+    def test_summarize_results(self):
+        """Test summary of a result mapping, including missing health status."""
+        summary = summarize_results({
+            "a.jpg": {"success": True, "analysis_type": "complete", "plant_type": "Lúa", "health_status": "Bị bệnh"},
+            "b.jpg": {"success": True, "analysis_type": "complete", "health_status": None},
+            "c.jpg": {"success": False}
+        })
+
+        self.assertEqual(summary["successful_analyses"], 2)
+        self.assertEqual(summary["failed_analyses"], 1)
+        self.assertEqual(summary["analysis_types"], {"complete": 2})
+        self.assertEqual(summary["common_plant_types"], {"Lúa": 1})
+        self.assertEqual(summary["common_health_issues"], ["Bị bệnh"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Tests for state shared across API workers and the multi-worker launcher.
+"""
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from api import serve as serve_module
+from core.health import UpstreamProber
+from core.rate_limiter import RequestScheduler
+from core.shared_state import SharedState
+
+class TestSharedState(unittest.TestCase):
+    """Test cases for SharedState."""
+
+    def setUp(self):
+        """Open two handles on one database, as two workers would."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = Path(self.temp_dir) / "state.db"
+        self.first = SharedState(self.path)
+        self.second = SharedState(self.path)
+
+    def tearDown(self):
+        """Close the handles and remove temporary files."""
+        self.first.close()
+        self.second.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_entries_expire_and_leases_are_exclusive(self):
+        """Test entries are visible to other handles until they expire, and only one lease is granted."""
+        self.first.set("probe", {"success": True}, ttl=60)
+        self.first.set("old", 1, ttl=-1)
+        self.assertEqual(self.second.get("probe"), {"success": True})
+        self.assertIsNone(self.second.get("old"))
+
+        self.assertTrue(self.first.claim("running:a", ttl=60))
+        self.assertFalse(self.second.claim("running:a", ttl=60))
+        self.first.delete("running:a")
+        self.assertTrue(self.second.claim("running:a", ttl=60))
+
+    def test_buckets_are_shared(self):
+        """Test tokens taken through one handle are missing for the other."""
+        self.first.bucket_add("requests", -60, rate=1.0, capacity=60)
+
+        self.assertAlmostEqual(self.second.bucket_wait("requests", 2, rate=1.0, capacity=60), 2.0, delta=0.1)
+        self.second.bucket_add("requests", 30, rate=1.0, capacity=60)
+        self.assertEqual(self.first.bucket_wait("requests", 2, rate=1.0, capacity=60), 0.0)
+
+    def test_coalesce_runs_once_across_handles(self):
+        """Test a call waiting on another handle's analysis gets its result instead of running again."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_analysis():
+            started.set()
+            release.wait(5)
+            return {"success": True, "plant": "lúa"}
+
+        results = {}
+        leader = threading.Thread(
+            target=lambda: results.update(leader=self.first.coalesce("key", slow_analysis, ttl=0))
+        )
+        leader.start()
+        started.wait(5)
+        follower = Mock(return_value={"success": True})
+        waiter = threading.Thread(
+            target=lambda: results.update(waiter=self.second.coalesce("key", follower, ttl=0))
+        )
+        waiter.start()
+        time.sleep(0.2)
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+
+        self.assertEqual(results["leader"], ({"success": True, "plant": "lúa"}, False))
+        self.assertEqual(results["waiter"], ({"success": True, "plant": "lúa"}, True))
+        follower.assert_not_called()
+
+        # Without a cache ttl, later calls run again
+        self.assertFalse(self.second.coalesce("key", follower, ttl=0)[1])
+        follower.assert_called_once()
+
+    def test_only_successful_results_are_cached(self):
+        """Test a failed analysis is retried by the next call, a successful one is served for the ttl."""
+        failing = Mock(return_value={"success": False, "error": "timeout"})
+        succeeding = Mock(return_value={"success": True})
+
+        self.assertEqual(self.first.coalesce("key", failing, ttl=60), ({"success": False, "error": "timeout"}, False))
+        self.assertEqual(self.second.coalesce("key", succeeding, ttl=60), ({"success": True}, False))
+        self.assertEqual(self.first.coalesce("key", failing, ttl=60), ({"success": True}, True))
+        failing.assert_called_once()
+
+class TestSharedScheduling(unittest.TestCase):
+    """Test cases for rate limits and health probes shared between workers."""
+
+    def setUp(self):
+        """Set up a shared state database in a temporary directory."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = Path(self.temp_dir) / "state.db"
+        self.first = SharedState(self.path)
+        self.second = SharedState(self.path)
+
+    def tearDown(self):
+        """Close the handles and remove temporary files."""
+        self.first.close()
+        self.second.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_schedulers_share_limits_and_pauses(self):
+        """Test requests and Retry-After pauses of one worker count against the other."""
+        first = RequestScheduler(requests_per_minute=60, tokens_per_minute=0, shared_state=self.first)
+        second = RequestScheduler(requests_per_minute=60, tokens_per_minute=0, shared_state=self.second)
+
+        for _ in range(60):
+            first.acquire()
+        stats = second.stats()
+        self.assertTrue(stats["shared"])
+        self.assertLess(stats["available_requests"], 1)
+
+        first.pause(2)
+        self.assertGreater(second.stats()["paused_for_seconds"], 1)
+
+    def test_prober_adopts_recent_shared_result(self):
+        """Test a worker reuses another worker's recent probe instead of probing the upstream."""
+        probe = Mock(return_value={"success": True})
+        other_probe = Mock(return_value={"success": False, "error": "unused"})
+        first = UpstreamProber(probe, interval=30, ttl=60, shared_state=self.first)
+        second = UpstreamProber(other_probe, interval=30, ttl=60, shared_state=self.second)
+
+        first.check()
+        status = second.check()
+
+        self.assertTrue(status["healthy"])
+        self.assertEqual(status["probe_count"], 0)
+        other_probe.assert_not_called()
+
+        # A forced check still probes
+        second.check(force=True)
+        other_probe.assert_called_once()
+
+class TestLauncher(unittest.TestCase):
+    """Test cases for the multi-worker launcher."""
+
+    def test_worker_environment(self):
+        """Test several workers get shared state and a share of the cores, unless configured."""
+        with patch.object(serve_module.config, "SHARED_STATE_PATH", ""), \
+             patch.object(serve_module, "dotenv_values", return_value={}), \
+             patch.object(serve_module.os, "cpu_count", return_value=8):
+            self.assertEqual(serve_module.worker_environment(1, {}), {})
+            self.assertEqual(
+                serve_module.worker_environment(4, {}),
+                {"SHARED_STATE_PATH": serve_module.DEFAULT_SHARED_STATE_PATH, "PIPELINE_PREPROCESS_WORKERS": "2"}
+            )
+            env = {"SHARED_STATE_PATH": "/tmp/state.db", "PIPELINE_PREPROCESS_WORKERS": "1"}
+            self.assertEqual(serve_module.worker_environment(4, env), env)
+
+    def test_gunicorn_command_uses_uvicorn_workers(self):
+        """Test the gunicorn command line runs the app with uvicorn workers and without preloading."""
+        command = serve_module.gunicorn_command("0.0.0.0", 5000, 4, "info")
+
+        self.assertIn("uvicorn.workers.UvicornWorker", command)
+        self.assertEqual(command[command.index("--workers") + 1], "4")
+        self.assertEqual(command[command.index("--bind") + 1], "0.0.0.0:5000")
+        self.assertNotIn("--preload", command)
+
+
+if __name__ == "__main__":
+    unittest.main()
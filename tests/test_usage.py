@@ -0,0 +1,93 @@
+"""
+Tests for per-request token and cost accounting and daily budgets.
+"""
+import shutil
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+# Add src to Python path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from core import usage as usage_module
+from core.result_store import ResultStore
+from core.usage import (
+    BudgetExceededError, budget_for, budget_status, check_budget, current_usage_key,
+    record_call, summarize_usage, usage_key
+)
+
+class TestUsage(unittest.TestCase):
+    """Test cases for usage accounting and budgets."""
+
+    def setUp(self):
+        """Set up a store in a temporary directory."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = ResultStore(str(Path(self.temp_dir) / "results.db"), flush_interval=0)
+        self.settings = usage_module.config
+
+    def tearDown(self):
+        """Close the store and remove temporary files."""
+        self.store.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _call(self, prompt_tokens=700, completion_tokens=300, cost_usd=0.002):
+        return {"model": "gpt-4o", "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "cached_tokens": 0, "image_tokens": 255, "cost_usd": cost_usd}
+
+    def test_budget_defaults_and_per_key_overrides(self):
+        """Test keys get the default budget unless DAILY_BUDGETS overrides it (0 = unlimited)."""
+        with patch.object(self.settings, "DAILY_TOKEN_BUDGET", 5000), \
+                patch.object(self.settings, "DAILY_COST_BUDGET_USD", 0.0), \
+                patch.object(self.settings, "DAILY_BUDGETS", {"partner": {"tokens": 0, "cost_usd": 2.5}}):
+            self.assertEqual(budget_for("field-team"), {"tokens": 5000, "cost_usd": None})
+            self.assertEqual(budget_for("partner"), {"tokens": None, "cost_usd": 2.5})
+
+    def test_budget_exhausted_after_crossing_call(self):
+        """Test a key is refused once today's tokens reach its budget, and other keys are not."""
+        with patch.object(self.settings, "DAILY_TOKEN_BUDGET", 1500), \
+                patch.object(self.settings, "DAILY_BUDGETS", {}):
+            with usage_key("field-team"):
+                record_call(self._call(), "disease_detection", store=self.store)
+                check_budget(store=self.store)
+                record_call(self._call(), "disease_detection", store=self.store)
+                with self.assertRaises(BudgetExceededError) as raised:
+                    check_budget(store=self.store)
+            check_budget("other", store=self.store)
+
+        self.assertNotIn("field-team", str(raised.exception))
+        status = raised.exception.status
+        self.assertTrue(status["exhausted"])
+        self.assertEqual(status["usage"]["total_tokens"], 2000)
+        self.assertEqual(status["remaining"]["tokens"], 0)
+        self.assertIsNone(status["remaining"]["cost_usd"])
+
+    def test_calls_outside_a_usage_key_are_not_stored(self):
+        """Test CLI and pipeline calls only reach the metrics, and keyless requests count as anonymous."""
+        store = Mock()
+        record_call(self._call(), "complete", store=store)
+        store.record_usage.assert_not_called()
+        self.assertIsNone(current_usage_key())
+
+        with usage_key(None):
+            record_call(self._call(), "complete", store=self.store)
+        self.assertEqual(budget_status("anonymous", self.store)["usage"]["calls"], 1)
+
+    def test_summarize_usage_skips_failed_passes(self):
+        """Test request totals leave out first passes that failed before returning usage."""
+        summary = summarize_usage([
+            {"model": "gpt-4o-mini", "error": "timeout"},
+            self._call(500, 100, 0.001),
+            self._call(900, 200, None),
+        ])
+
+        self.assertEqual(summary["calls"], 2)
+        self.assertEqual(summary["total_tokens"], 1700)
+        self.assertEqual(summary["image_tokens"], 510)
+        self.assertEqual(summary["cost_usd"], 0.001)
+        self.assertEqual(summarize_usage([])["cost_usd"], 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()